@@ -0,0 +1,288 @@
+"""Command line calibration of the CPU runtime profile of the model.
+
+Usage (from the backend directory)::
+
+    python -m benchmarks.calibrate --model models/model.Q4_K_M.gguf
+    python -m benchmarks.calibrate --model models/model.Q4_K_M.gguf \\
+        --model models/model.Q5_K_M.gguf --workers 2 --mlock
+
+The chosen profile is written to ``runtime_profile.json`` (or
+``--output``) and read by the model loader at startup; the measured
+trials are printed as JSON.
+"""
+import argparse
+import functools
+import json
+import logging
+import random
+import time
+from dataclasses import asdict, replace
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from src.chunking import DEFAULT_CONTEXT_SHARE
+from src.llm_model import (
+    LLM_WORKERS,
+    LOG_FORMAT,
+    N_CTX,
+    RUNTIME_PROFILE_PATH,
+    load_llm_model
+)
+from src.prompts import CHUNK_MAX_TOKENS
+from src.runtime_profile import (
+    DEFAULT_N_BATCH,
+    RuntimeProfile,
+    available_cpus,
+    save_profile
+)
+
+from .synthetic_pdf import patent_sentences
+
+# Размеры пакета вычисления промпта, из которых выбирается лучший
+BATCH_SIZES = (128, 256, 512, 1024, 2048)
+
+# Типичный чанк для оценки времени обработки: промпт на долю контекста
+# и ответ максимальной длины; промпт такой длины используется и для
+# замеров, чтобы проверялись все размеры пакета из BATCH_SIZES
+_CHUNK_OUTPUT_TOKENS = CHUNK_MAX_TOKENS
+_CHUNK_PROMPT_TOKENS = int(N_CTX * DEFAULT_CONTEXT_SHARE) - CHUNK_MAX_TOKENS
+
+# Замер одного профиля: (путь к модели, профиль) -> скорости в токенах/с
+Measure = Callable[[str, RuntimeProfile], Dict[str, float]]
+
+logger = logging.getLogger(__name__)
+
+
+def thread_candidates(cpus: int) -> List[int]:
+    """
+    Возвращает варианты числа потоков для ``cpus`` доступных CPU.
+
+    Кроме всех CPU проверяются 3/4, половина (физические ядра при
+    гиперпоточности) и четверть.
+    """
+    return sorted({
+        max(1, value)
+        for value in (cpus, cpus - 1, cpus * 3 // 4, cpus // 2, cpus // 4)
+    })
+
+
+def chunk_seconds(measurement: Dict[str, float]) -> float:
+    """Оценивает время обработки типичного чанка по скоростям замера."""
+    return round(
+        _CHUNK_PROMPT_TOKENS / measurement["prompt_tps"]
+        + _CHUNK_OUTPUT_TOKENS / measurement["generation_tps"],
+        3
+    )
+
+
+def _sample_tokens(llm: Any, count: int) -> List[int]:
+    """Возвращает ``count`` токенов текста, похожего на патент."""
+    rng = random.Random(0)
+    tokens: List[int] = []
+    while len(tokens) < count:
+        text = " ".join(patent_sentences(rng, 12, alloy_share=1 / 3))
+        tokens.extend(llm.tokenize(text.encode("utf-8"), add_bos=False))
+    return tokens[:count]
+
+
+def measure_runtime(
+    model_path: str,
+    runtime: RuntimeProfile,
+    prompt_tokens: int = _CHUNK_PROMPT_TOKENS,
+    generation_tokens: int = 32
+) -> Dict[str, float]:
+    """
+    Замеряет скорость вычисления промпта и генерации с профилем.
+
+    Промпт вычисляется одним вызовом ``eval`` (пакетами по ``n_batch``
+    токенов на ``n_threads_batch`` потоках), генерация имитируется
+    вычислением токенов по одному, как при декодировании (на
+    ``n_threads`` потоках).
+
+    :param model_path: Путь к модели
+    :param runtime: Проверяемый профиль
+    :param prompt_tokens: Длина промпта в токенах
+    :param generation_tokens: Число генерируемых токенов
+    :return: Словарь ``prompt_tps`` и ``generation_tps``
+    """
+    llm, _ = load_llm_model(model_path, runtime)
+    try:
+        tokens = _sample_tokens(llm, prompt_tokens + generation_tokens)
+        llm.reset()
+        start_time = time.perf_counter()
+        llm.eval(tokens[:prompt_tokens])
+        prompt_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        for token in tokens[prompt_tokens:]:
+            llm.eval([token])
+        generation_time = time.perf_counter() - start_time
+    finally:
+        llm.close()
+    return {
+        "prompt_tps": round(prompt_tokens / prompt_time, 2),
+        "generation_tps": round(generation_tokens / generation_time, 2),
+    }
+
+
+def _trial(
+    measure: Measure,
+    trials: List[Dict[str, Any]],
+    model_path: str,
+    runtime: RuntimeProfile
+) -> Dict[str, float]:
+    """Замеряет профиль и добавляет результат в ``trials``."""
+    measurement = measure(model_path, runtime)
+    measurement["chunk_seconds"] = chunk_seconds(measurement)
+    trials.append({
+        "model_path": model_path,
+        "n_threads": runtime.n_threads,
+        "n_threads_batch": runtime.n_threads_batch,
+        "n_batch": runtime.n_batch,
+        "use_mlock": runtime.use_mlock,
+        **measurement,
+    })
+    logger.info("[LLM] Калибровка %s: %s", runtime, measurement)
+    return measurement
+
+
+def _calibrate_model(
+    run: Measure,
+    model_path: str,
+    cpus: int,
+    prompt_tokens: int,
+    mlock: bool
+) -> RuntimeProfile:
+    """
+    Подбирает профиль одной модели покоординатным поиском.
+
+    Сначала общее число потоков: лучшее по генерации становится
+    ``n_threads``, лучшее по промпту — ``n_threads_batch``. Затем с
+    ними подбирается ``n_batch`` (не больше длины промпта замера) и,
+    при ``mlock``, проверяется закрепление весов в памяти.
+    """
+    by_threads = {
+        threads: run(
+            model_path, RuntimeProfile(threads, threads, DEFAULT_N_BATCH)
+        )
+        for threads in thread_candidates(cpus)
+    }
+    best = RuntimeProfile(
+        n_threads=max(
+            by_threads, key=lambda t: by_threads[t]["generation_tps"]
+        ),
+        n_threads_batch=max(
+            by_threads, key=lambda t: by_threads[t]["prompt_tps"]
+        ),
+        model_path=model_path
+    )
+    measurement = run(model_path, best)
+    for n_batch in BATCH_SIZES:
+        if n_batch == best.n_batch or n_batch > prompt_tokens:
+            continue
+        candidate = replace(best, n_batch=n_batch)
+        result = run(model_path, candidate)
+        if result["prompt_tps"] > measurement["prompt_tps"]:
+            best, measurement = candidate, result
+    if mlock:
+        candidate = replace(best, use_mlock=True)
+        result = run(model_path, candidate)
+        if result["chunk_seconds"] < measurement["chunk_seconds"]:
+            best, measurement = candidate, result
+    return replace(best, measurements=measurement)
+
+
+def calibrate(  # pylint: disable=too-many-arguments
+    model_paths: Sequence[str],
+    cpus: int,
+    workers: int = 1,
+    *,
+    prompt_tokens: int = _CHUNK_PROMPT_TOKENS,
+    mlock: bool = False,
+    measure: Optional[Measure] = None
+) -> Dict[str, Any]:
+    """
+    Подбирает профиль модели по замерам на текущем хосте.
+
+    Каждому из ``workers`` экземпляров модели достается
+    ``cpus // workers`` CPU; замер выполняется на одном экземпляре.
+    Если передано несколько вариантов квантования, выбирается вариант
+    с наименьшим оценочным временем типичного чанка.
+
+    :param model_paths: Пути к вариантам модели
+    :param cpus: Число доступных CPU
+    :param workers: Число экземпляров модели (пул процессов)
+    :param prompt_tokens: Длина промпта замера в токенах
+    :param mlock: Проверить закрепление весов в памяти
+    :param measure: Функция замера (по умолчанию ``measure_runtime``)
+    :return: Словарь ``profile`` (выбранный профиль) и ``trials``
+        (все замеры)
+    """
+    if measure is None:
+        def measure(path: str, runtime: RuntimeProfile) -> Dict[str, float]:
+            return measure_runtime(path, runtime, prompt_tokens)
+    trials: List[Dict[str, Any]] = []
+    run = functools.partial(_trial, measure, trials)
+    budget = max(1, cpus // max(1, workers))
+    profiles = [
+        _calibrate_model(run, path, budget, prompt_tokens, mlock)
+        for path in model_paths
+    ]
+    best = min(
+        profiles, key=lambda profile: profile.measurements["chunk_seconds"]
+    )
+    best = replace(
+        best,
+        workers=max(1, workers),
+        model_path=best.model_path if len(model_paths) > 1 else "",
+        measurements={**best.measurements, "cpus": cpus}
+    )
+    return {"profile": best, "trials": trials}
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        description="Калибровка потоков и пакета модели на текущем хосте"
+    )
+    parser.add_argument("--model", action="append", required=True,
+                        help="путь к GGUF модели; несколько --model "
+                             "сравнивают варианты квантования")
+    parser.add_argument("--workers", type=int, default=LLM_WORKERS,
+                        help="число процессов с моделью")
+    parser.add_argument("--cpus", type=int, default=available_cpus(),
+                        help="число CPU (по умолчанию с учетом cgroup)")
+    parser.add_argument("--prompt-tokens", type=int,
+                        default=_CHUNK_PROMPT_TOKENS,
+                        help="длина промпта замера в токенах (по "
+                             "умолчанию как у типичного чанка)")
+    parser.add_argument("--mlock", action="store_true",
+                        help="проверить закрепление весов в памяти")
+    parser.add_argument("--output", default=RUNTIME_PROFILE_PATH,
+                        help="файл профиля")
+    parser.add_argument("--log-level", default="INFO",
+                        help="уровень логов в stderr")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Подбирает профиль, сохраняет его и выводит замеры в JSON.
+
+    :param argv: Аргументы командной строки (по умолчанию ``sys.argv``)
+    :return: Результат калибровки
+    """
+    args = _parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format=LOG_FORMAT)
+    result = calibrate(
+        args.model, args.cpus, args.workers,
+        prompt_tokens=args.prompt_tokens, mlock=args.mlock
+    )
+    save_profile(result["profile"], args.output)
+    print(json.dumps(
+        {"profile": asdict(result["profile"]), "trials": result["trials"]},
+        ensure_ascii=False, indent=2
+    ))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""Command line benchmark of the patent processing pipeline.
+
+Usage (from the backend directory)::
+
+    python -m benchmarks.run --pages 50 --token-latency 0.002
+    python -m benchmarks.run --pages 50 --model models/model.gguf
+
+The result is printed (or written with ``--output``) as JSON so that
+runs can be compared; pipeline logs (``--log-level``) go to stderr.
+"""
+import argparse
+import contextlib
+import functools
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from llama_cpp import Llama
+
+from src.llm_model import (
+    LOG_FORMAT,
+    RUNTIME_PROFILE_PATH,
+    LlamaModelManager,
+    LlmWorkerPool
+)
+from src.pdf_pages import extract_text_from_pdf
+from src.pdf_text_extractor import ExtractionSettings, run_pipeline
+from src.properties import parse_properties
+from src.runtime_profile import available_cpus, load_profile
+from src.sections import section_kinds
+
+from .stub_llama import StubLlama
+from .synthetic_pdf import write_synthetic_pdf
+
+# Поля отчета обработки, которые попадают в результат бенчмарка
+_REPORT_FIELDS = (
+    "chunking", "chunk_token_budget", "sections", "sections_skipped",
+    "chunks_skipped", "fast_path",
+    "prefix_cache", "speculative", "early_stop", "merge",
+)
+
+
+def peak_rss_mb() -> float:
+    """
+    Возвращает пиковый RSS процесса и его дочерних процессов в МБ.
+
+    Для дочерних процессов ``getrusage`` возвращает максимум по
+    завершенным процессам (пул извлечения текста и пул моделей).
+    """
+    peak = sum(
+        resource.getrusage(who).ru_maxrss
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    )
+    # В Linux ru_maxrss в килобайтах, в macOS — в байтах
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / scale, 1)
+
+
+@contextlib.contextmanager
+def _stage(stages: Dict[str, Any], name: str) -> Iterator[None]:
+    """
+    Замеряет время этапа и прирост пикового RSS за время этапа.
+
+    Пиковый RSS процесса не уменьшается, поэтому для этапа записывается
+    разность пиков после и до него, а не накопленное значение.
+    """
+    start_time = time.perf_counter()
+    start_peak = peak_rss_mb()
+    yield
+    stages[name] = {
+        "time": round(time.perf_counter() - start_time, 3),
+        "peak_rss_delta_mb": round(peak_rss_mb() - start_peak, 1),
+    }
+
+
+def run_benchmark(  # pylint: disable=too-many-arguments
+    pdf_path: str,
+    llm: Llama,
+    settings: ExtractionSettings,
+    pdf_workers: int = 1,
+    pool: Optional[LlmWorkerPool] = None
+) -> Dict[str, Any]:
+    """
+    Прогоняет PDF через все этапы обработки с замером времени.
+
+    Этапы: ``extract_text`` (текст PDF) и этапы ``run_pipeline``:
+    ``chunking`` (разбиение, быстрый путь без LLM и фильтр
+    релевантности), ``chunks`` (ответы модели по чанкам) и ``merge``
+    (сборка финального ответа).
+
+    :param pdf_path: Путь к PDF файлу
+    :param llm: Модель (настоящая или ``StubLlama``)
+    :param settings: Параметры обработки
+    :param pdf_workers: Число процессов извлечения текста
+    :param pool: Пул процессов с моделями (опционально)
+    :return: Результат бенчмарка
+    """
+    stages: Dict[str, Any] = {}
+    report: Dict[str, Any] = {}
+
+    with _stage(stages, "extract_text"):
+        text, metadata = extract_text_from_pdf(
+            pdf_path, pdf_workers, tables=settings.fast_path
+        )
+
+    output = run_pipeline(
+        text, llm, settings, report, pool,
+        on_stage=functools.partial(_stage, stages)
+    )
+
+    chunk_time = stages.get("chunks", {}).get("time", 0)
+    result = {
+        "pages": metadata["pages"],
+        "chars": len(text),
+        "chunks": report["chunks"],
+        "passages_folded": report["dedup"]["passages_folded"],
+        "chunks_per_second": round(
+            len(report.get("chunk_stats", [])) / chunk_time, 3
+        ) if chunk_time > 0 else None,
+        "properties": len(parse_properties(output)),
+        "total_time": round(sum(s["time"] for s in stages.values()), 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+    }
+    result.update(
+        (name, report[name]) for name in _REPORT_FIELDS if name in report
+    )
+    return result
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        description="Бенчмарк обработки патента на синтетическом PDF"
+    )
+    parser.add_argument("--pages", type=int, default=20,
+                        help="число страниц синтетического PDF")
+    parser.add_argument("--table-density", type=float, default=0.2,
+                        help="доля страниц с таблицей составов")
+    parser.add_argument("--alloy-share", type=float, default=0.1,
+                        help="доля абзацев с информацией о сплавах")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="начальное значение генератора PDF")
+    parser.add_argument("--pdf-workers", type=int, default=1,
+                        help="число процессов извлечения текста")
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="задержка заглушки на генерируемый токен, с")
+    parser.add_argument("--prompt-latency", type=float, default=0.0,
+                        help="задержка заглушки на токен промпта, с")
+    parser.add_argument("--n-ctx", type=int, default=4096,
+                        help="размер контекста заглушки")
+    parser.add_argument("--model",
+                        help="путь к GGUF модели вместо заглушки")
+    parser.add_argument("--llm-workers", type=int, default=1,
+                        help="число процессов с моделью (только --model)")
+    parser.add_argument("--profile", default=RUNTIME_PROFILE_PATH,
+                        help="профиль калибровки модели (только --model)")
+    parser.add_argument("--structured", action="store_true",
+                        help="структурированный вывод (JSON и грамматика)")
+    parser.add_argument("--no-prefix-cache", action="store_true",
+                        help="отключить кэш префикса промпта")
+    parser.add_argument("--no-fast-path", action="store_true",
+                        help="отключить разбор составов без LLM")
+    parser.add_argument("--no-sections", action="store_true",
+                        help="не делить текст на разделы патента")
+    parser.add_argument("--section-order", default="",
+                        help="разделы, обрабатываемые первыми "
+                             "(например examples,claims)")
+    parser.add_argument("--skip-sections", default="",
+                        help="разделы, которые не обрабатываются "
+                             "(например background)")
+    parser.add_argument("--property-budget", type=int, default=0,
+                        help="остановка после набора числа свойств")
+    parser.add_argument("--log-level", default="WARNING",
+                        help="уровень логов конвейера в stderr")
+    parser.add_argument("--output",
+                        help="файл для JSON результата (по умолчанию stdout)")
+    args = parser.parse_args(argv)
+    if args.llm_workers > 1 and not args.model:
+        parser.error("--llm-workers требует --model")
+    try:
+        section_kinds(args.section_order)
+        section_kinds(args.skip_sections)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def _run_with_model(
+    args: argparse.Namespace,
+    pdf_path: str,
+    settings: ExtractionSettings
+) -> Dict[str, Any]:
+    """Запускает бенчмарк с настоящей моделью или заглушкой."""
+    if not args.model:
+        llm = StubLlama(args.token_latency, args.prompt_latency, args.n_ctx)
+        return run_benchmark(pdf_path, llm, settings, args.pdf_workers)
+
+    manager = LlamaModelManager(
+        args.model, workers=args.llm_workers,
+        profile=load_profile(args.profile)
+    )
+    load_start = time.perf_counter()
+    try:
+        with manager.acquire(args.model) as llm:
+            load_time = round(time.perf_counter() - load_start, 3)
+            result = run_benchmark(
+                pdf_path, llm, settings, args.pdf_workers, manager.pool
+            )
+    finally:
+        manager.unload()
+    result["stages"] = {
+        "load_model": {"time": load_time}, **result["stages"]
+    }
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Генерирует синтетический PDF, прогоняет бенчмарк и выводит JSON.
+
+    :param argv: Аргументы командной строки (по умолчанию ``sys.argv``)
+    :return: Результат бенчмарка
+    """
+    args = _parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format=LOG_FORMAT)
+    settings = ExtractionSettings(
+        prefix_cache=not args.no_prefix_cache,
+        fast_path=not args.no_fast_path,
+        structured_output=args.structured,
+        sections=not args.no_sections,
+        section_order=section_kinds(args.section_order),
+        skip_sections=section_kinds(args.skip_sections),
+        property_budget=args.property_budget
+    )
+    with tempfile.TemporaryDirectory(prefix="patent-bench-") as directory:
+        pdf_path = os.path.join(directory, "synthetic.pdf")
+        write_synthetic_pdf(
+            pdf_path, args.pages, table_density=args.table_density,
+            alloy_share=args.alloy_share, seed=args.seed
+        )
+        result = _run_with_model(args, pdf_path, settings)
+
+    result = {
+        "config": vars(args),
+        "model": args.model or "stub",
+        "python": platform.python_version(),
+        "cpu_count": available_cpus(),
+        **result,
+    }
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+    return result
+
+
+if __name__ == "__main__":
+    main()
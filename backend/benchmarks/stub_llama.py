@@ -0,0 +1,174 @@
+"""Module with a deterministic Llama stand-in for benchmarks."""
+import json
+import re
+import time
+from typing import Any, Dict, Iterator, List, Sequence, Union
+
+from src.properties import NO_ALLOY_INFO, parse_properties
+
+_TOKEN = re.compile(r"\w+|[^\w\s]|\s+")
+
+_COMPOSITION = re.compile(r"\b([A-Z][a-z]?)\s+(\d+(?:\.\d+)?)\s*wt%")
+_HARDNESS = re.compile(r"hardness\s+of\s+(\d+)\s*HB", re.IGNORECASE)
+_STRENGTH = re.compile(
+    r"tensile\s+strength\s+of\s+(\d+)\s*MPa", re.IGNORECASE
+)
+
+
+def _find_properties(text: str) -> List[Dict[str, str]]:
+    """Находит в тексте содержание элементов, твердость и прочность."""
+    items = [
+        {"property": f"{element} content", "value": value, "unit": "wt%"}
+        for element, value in _COMPOSITION.findall(text)
+    ]
+    items += [
+        {"property": "Hardness", "value": value, "unit": "HB"}
+        for value in _HARDNESS.findall(text)
+    ]
+    items += [
+        {"property": "Tensile strength", "value": value, "unit": "MPa"}
+        for value in _STRENGTH.findall(text)
+    ]
+    return items
+
+
+class StubLlama:  # pylint: disable=too-many-instance-attributes
+    """
+    Заглушка ``llama_cpp.Llama`` с настраиваемой задержкой.
+
+    Поддерживает методы, которые использует конвейер: ``tokenize``,
+    ``detokenize``, ``n_ctx``, вызов модели (в том числе с
+    ``stream=True`` и ``grammar``), а также ``reset``/``eval``/
+    ``save_state``/``load_state`` для кэша префикса промпта. Ответ
+    детерминированно строится из составов и свойств в тексте промпта.
+    Время вычисления промпта и генерации имитируется задержками
+    ``prompt_latency`` и ``token_latency`` на токен; как и llama-cpp,
+    заглушка вычисляет только часть промпта после общего префикса с
+    уже вычисленными токенами.
+    """
+
+    def __init__(
+        self,
+        token_latency: float = 0.0,
+        prompt_latency: float = 0.0,
+        n_ctx: int = 4096
+    ):
+        self.token_latency = token_latency
+        self.prompt_latency = prompt_latency
+        self._n_ctx = n_ctx
+        self._vocab: Dict[str, int] = {}
+        self._pieces: List[str] = []
+        self.input_ids: List[int] = []
+        self.n_tokens = 0
+        self.generated_tokens = 0
+
+    def n_ctx(self) -> int:
+        """Размер контекста модели."""
+        return self._n_ctx
+
+    def _token_id(self, piece: str) -> int:
+        """Возвращает идентификатор токена, добавляя его в словарь."""
+        if piece not in self._vocab:
+            self._vocab[piece] = len(self._pieces)
+            self._pieces.append(piece)
+        return self._vocab[piece]
+
+    def tokenize(self, text: bytes, add_bos: bool = True) -> List[int]:
+        """Разбивает текст на слова, знаки и пробелы."""
+        tokens = [self._token_id("<s>")] if add_bos else []
+        tokens.extend(
+            self._token_id(piece)
+            for piece in _TOKEN.findall(text.decode("utf-8"))
+        )
+        return tokens
+
+    def detokenize(self, tokens: Sequence[int]) -> bytes:
+        """Собирает текст из токенов."""
+        return "".join(
+            self._pieces[token] for token in tokens
+            if self._pieces[token] != "<s>"
+        ).encode("utf-8")
+
+    def reset(self) -> None:
+        """Очищает вычисленные токены."""
+        self.input_ids, self.n_tokens = [], 0
+
+    def eval(self, tokens: Sequence[int]) -> None:
+        """Вычисляет токены с задержкой ``prompt_latency`` на токен."""
+        time.sleep(self.prompt_latency * len(tokens))
+        self.input_ids = self.input_ids[:self.n_tokens] + list(tokens)
+        self.n_tokens = len(self.input_ids)
+
+    def save_state(self) -> List[int]:
+        """Возвращает состояние (вычисленные токены)."""
+        return list(self.input_ids)
+
+    def load_state(self, state: List[int]) -> None:
+        """Восстанавливает состояние."""
+        self.input_ids, self.n_tokens = list(state), len(state)
+
+    def _evaluate_prompt(self, prompt: List[int]) -> None:
+        """Вычисляет промпт, переиспользуя общий префикс токенов."""
+        common = 0
+        for cached, token in zip(self.input_ids[:self.n_tokens], prompt):
+            if cached != token:
+                break
+            common += 1
+        self.n_tokens = common
+        self.eval(prompt[common:])
+
+    @staticmethod
+    def _answer(text: str, structured: bool) -> str:
+        """
+        Строит ответ модели по тексту промпта.
+
+        Для промпта сборки возвращаются свойства из сводок, для промпта
+        чанка — составы и свойства, найденные в тексте.
+        """
+        _, found, body = text.rpartition("Summaries:\n")
+        if found:
+            items = parse_properties(body)
+        else:
+            items = _find_properties(text.rpartition("Text:\n")[2])
+        if structured:
+            return json.dumps(items, separators=(",", ":"))
+        if not items:
+            return NO_ALLOY_INFO
+        return "\n".join(
+            f"{item['property']}: {item['value']} {item['unit']}".strip()
+            for item in items
+        )
+
+    def __call__(
+        self,
+        prompt: Union[str, List[int]],
+        stream: bool = False,
+        max_tokens: int = 16,
+        **kwargs: Any
+    ) -> Any:
+        if isinstance(prompt, str):
+            prompt = self.tokenize(prompt.encode("utf-8"))
+        prompt = list(prompt)
+        self._evaluate_prompt(prompt)
+        text = self.detokenize(prompt).decode("utf-8")
+        answer = self._answer(text, kwargs.get("grammar") is not None)
+        pieces = [
+            self._pieces[token]
+            for token in self.tokenize(answer.encode("utf-8"), False)
+        ][:max_tokens]
+        if stream:
+            return self._stream(pieces)
+        for _ in pieces:
+            self._generate_token()
+        return {"choices": [{"text": "".join(pieces)}]}
+
+    def _generate_token(self) -> None:
+        """Имитирует генерацию одного токена."""
+        time.sleep(self.token_latency)
+        self.generated_tokens += 1
+
+    def _stream(self, pieces: List[str]) -> Iterator[Dict[str, Any]]:
+        """Выдает ответ по одному токену."""
+        for piece in pieces:
+            self._generate_token()
+            yield {"choices": [{"text": piece}]}
@@ -0,0 +1,246 @@
+"""Module for generating deterministic synthetic patent PDFs."""
+import random
+from typing import List, Tuple
+
+# Размер страницы Letter в пунктах, поля и межстрочный интервал
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 54
+LEADING = 13
+FONT_SIZE = 10
+LINE_CHARS = 95
+
+_FILLER_WORDS = (
+    "the invention relates to a method apparatus embodiment wherein said "
+    "member comprises further according claim figure shown process device "
+    "first second layer surface portion provided configured example "
+    "preferably least one plurality respective described above below"
+).split()
+
+_ELEMENTS = ("C", "Cr", "Ni", "Mo", "Mn", "Si", "Ti", "Al", "Co", "W")
+
+_TABLE_COLUMNS = ("Alloy", "C", "Cr", "Ni", "Mo", "Hardness HB")
+
+# Заголовки разделов и доля документа, с которой начинается раздел
+_SECTIONS = (
+    ("BACKGROUND OF THE INVENTION", 0.0),
+    ("DETAILED DESCRIPTION", 0.25),
+    ("EXAMPLES", 0.6),
+    ("What is claimed is:", 0.9),
+)
+
+
+def _escape(text: str) -> str:
+    """Экранирует строку для текстового оператора PDF."""
+    return (
+        text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    )
+
+
+def _filler_sentence(rng: random.Random) -> str:
+    """Возвращает предложение шаблонного текста патента."""
+    words = rng.choices(_FILLER_WORDS, k=rng.randint(8, 18))
+    return " ".join(words).capitalize() + "."
+
+
+def _alloy_sentence(rng: random.Random) -> str:
+    """Возвращает предложение с составом и свойствами сплава."""
+    elements = rng.sample(_ELEMENTS, 3)
+    parts = ", ".join(
+        f"{element} {rng.uniform(0.1, 25):.2f} wt%" for element in elements
+    )
+    return (
+        f"The steel contains {parts}, the balance being Fe. "
+        f"The alloy is annealed at {rng.randint(800, 1200)} C and has a "
+        f"hardness of {rng.randint(150, 600)} HB and a tensile strength "
+        f"of {rng.randint(400, 1800)} MPa."
+    )
+
+
+def patent_sentences(
+    rng: random.Random,
+    count: int,
+    alloy_share: float = 0.1
+) -> List[str]:
+    """
+    Возвращает предложения текста, похожего на патент.
+
+    :param rng: Генератор случайных чисел
+    :param count: Число предложений
+    :param alloy_share: Доля предложений с составом и свойствами сплава
+    :return: Список предложений
+    """
+    return [
+        _alloy_sentence(rng) if rng.random() < alloy_share
+        else _filler_sentence(rng)
+        for _ in range(count)
+    ]
+
+
+def _wrap(paragraph: str) -> List[str]:
+    """Разбивает абзац на строки по ``LINE_CHARS`` символов."""
+    lines: List[str] = []
+    current = ""
+    for word in paragraph.split():
+        if current and len(current) + 1 + len(word) > LINE_CHARS:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _text_ops(lines: List[str], top: float) -> str:
+    """Возвращает операторы PDF для вывода строк текста с позиции top."""
+    ops = [f"BT /F1 {FONT_SIZE} Tf {LEADING} TL {MARGIN} {top:.1f} Td"]
+    for line in lines:
+        ops.append(f"({_escape(line)}) Tj T*")
+    ops.append("ET")
+    return "\n".join(ops)
+
+
+def _table_ops(rng: random.Random, rows: int, top: float) -> Tuple[str, float]:
+    """
+    Возвращает операторы PDF таблицы составов с линиями сетки.
+
+    :return: Кортеж (операторы, нижняя граница таблицы)
+    """
+    cell_width = (PAGE_WIDTH - 2 * MARGIN) / len(_TABLE_COLUMNS)
+    row_height = LEADING + 5
+    cells = [list(_TABLE_COLUMNS)]
+    for i in range(rows):
+        cells.append(
+            [f"A{i + 1}"]
+            + [f"{rng.uniform(0.01, 25):.2f}" for _ in range(4)]
+            + [str(rng.randint(150, 600))]
+        )
+    bottom = top - row_height * len(cells)
+    ops = ["0.5 w"]
+    for i in range(len(cells) + 1):
+        y = top - i * row_height
+        ops.append(f"{MARGIN} {y:.1f} m {PAGE_WIDTH - MARGIN} {y:.1f} l S")
+    for j in range(len(_TABLE_COLUMNS) + 1):
+        x = MARGIN + j * cell_width
+        ops.append(f"{x:.1f} {top:.1f} m {x:.1f} {bottom:.1f} l S")
+    for i, row in enumerate(cells):
+        y = top - (i + 1) * row_height + 5
+        for j, value in enumerate(row):
+            x = MARGIN + j * cell_width + 3
+            ops.append(
+                f"BT /F1 {FONT_SIZE} Tf {x:.1f} {y:.1f} Td "
+                f"({_escape(value)}) Tj ET"
+            )
+    return "\n".join(ops), bottom
+
+
+def _page_heading(page: int, pages: int) -> str:
+    """Возвращает заголовок раздела, который начинается на странице."""
+    for heading, start in _SECTIONS:
+        if int(start * pages) == page:
+            return heading
+    return ""
+
+
+def _page_content(
+    rng: random.Random,
+    alloy_share: float,
+    with_table: bool,
+    heading: str = ""
+) -> str:
+    """Возвращает поток содержимого одной страницы."""
+    top = PAGE_HEIGHT - MARGIN
+    ops: List[str] = []
+    if with_table:
+        table, bottom = _table_ops(rng, rng.randint(3, 8), top)
+        ops.append(table)
+        top = bottom - 2 * LEADING
+    lines: List[str] = [heading, ""] if heading else []
+    max_lines = int((top - MARGIN) // LEADING)
+    while len(lines) < max_lines:
+        sentences = patent_sentences(rng, rng.randint(3, 6), alloy_share)
+        lines.extend(_wrap(" ".join(sentences)))
+        lines.append("")
+    ops.append(_text_ops(lines[:max_lines], top))
+    return "\n".join(ops)
+
+
+def synthetic_pdf_bytes(
+    pages: int,
+    table_density: float = 0.2,
+    alloy_share: float = 0.1,
+    seed: int = 0
+) -> bytes:
+    """
+    Создает детерминированный PDF, похожий на текст патента.
+
+    Страницы заполнены шаблонным текстом; доля ``alloy_share``
+    предложений содержит составы и свойства сплавов, а на доле
+    ``table_density`` страниц есть таблица составов с линиями сетки.
+    Текст разделен заголовками разделов патента (``_SECTIONS``).
+    При одинаковых параметрах результат совпадает побайтно.
+
+    :param pages: Количество страниц
+    :param table_density: Доля страниц с таблицей (от 0 до 1)
+    :param alloy_share: Доля предложений с информацией о сплавах
+    :param seed: Зерно генератора случайных чисел
+    :return: Содержимое PDF файла
+    """
+    rng = random.Random(seed)
+    font_ref = 3 + 2 * pages
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids ["
+        + " ".join(f"{3 + 2 * i} 0 R" for i in range(pages))
+        + f"] /Count {pages} >>",
+    ]
+    for i in range(pages):
+        content = _page_content(
+            rng, alloy_share, rng.random() < table_density,
+            _page_heading(i, pages)
+        ).encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R "
+            f"/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_ref} 0 R >> >> >>"
+        )
+        objects.append(
+            f"<< /Length {len(content)} >>\nstream\n"
+            + content.decode("latin-1")
+            + "\nendstream"
+        )
+    objects.append(
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+        "/Encoding /WinAnsiEncoding >>"
+    )
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode()
+    output += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+    return bytes(output)
+
+
+def write_synthetic_pdf(path: str, pages: int, **options) -> str:
+    """
+    Записывает синтетический PDF в файл.
+
+    :param path: Путь к файлу
+    :param pages: Количество страниц
+    :param options: Параметры ``synthetic_pdf_bytes``
+    :return: Путь к файлу
+    """
+    with open(path, "wb") as f:
+        f.write(synthetic_pdf_bytes(pages, **options))
+    return path
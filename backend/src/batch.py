@@ -0,0 +1,193 @@
+"""Module for processing a batch of patents through one shared pipeline."""
+import logging
+import queue
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .jobs import JobError
+
+# Число файлов, текст которых извлекается заранее, пока LLM занята
+BATCH_PREFETCH = 2
+
+# Результат обработки одного файла пакета
+FileResult = Dict[str, Any]
+
+logger = logging.getLogger(__name__)
+
+
+def file_failure(filename: str, error: BaseException) -> FileResult:
+    """
+    Формирует результат файла пакета, обработка которого не удалась.
+
+    Код ошибки берется из ``JobError``; ``ValueError`` (неверный формат
+    файла) дает 400, остальные ошибки — 500.
+
+    :param filename: Имя файла
+    :param error: Исключение обработки
+    :return: Результат со статусом ``failed``
+    """
+    if isinstance(error, JobError):
+        error_code = error.status_code
+    elif isinstance(error, ValueError):
+        error_code = 400
+    else:
+        error_code = 500
+    return {
+        "filename": filename,
+        "status": "failed",
+        "error": str(error),
+        "error_code": error_code,
+    }
+
+
+class _BatchResults:
+    """
+    Результаты файлов пакета, заполняемые из разных потоков.
+
+    ``cancelled`` — первая отмена задачи, полученная на любом этапе;
+    после нее новые файлы не обрабатываются.
+    """
+
+    def __init__(
+        self,
+        count: int,
+        on_result: Optional[Callable[[int, FileResult], None]]
+    ):
+        self.results: List[Optional[FileResult]] = [None] * count
+        self.on_result = on_result
+        self.cancelled: Optional[CancelledError] = None
+        self._lock = threading.Lock()
+
+    def cancel(self, error: CancelledError) -> None:
+        """Запоминает отмену задачи, чтобы остановить конвейер."""
+        with self._lock:
+            if self.cancelled is None:
+                self.cancelled = error
+
+    def finish(self, index: int, result: FileResult) -> None:
+        """Сохраняет результат файла и сообщает о нем."""
+        with self._lock:
+            self.results[index] = result
+        if self.on_result is not None:
+            self.on_result(index, result)
+
+    def ordered(self) -> List[FileResult]:
+        """Возвращает готовые результаты в порядке файлов."""
+        with self._lock:
+            return [result for result in self.results if result is not None]
+
+
+def run_pipeline(  # pylint: disable=too-many-arguments
+    filenames: Sequence[str],
+    extract: Callable[[int], Any],
+    process: Callable[[int, Any], FileResult],
+    *,
+    on_result: Optional[Callable[[int, FileResult], None]] = None,
+    workers: int = 1,
+    prefetch: int = BATCH_PREFETCH
+) -> List[FileResult]:
+    """
+    Обрабатывает файлы пакета конвейером из двух этапов.
+
+    Отдельный поток по порядку выполняет ``extract(i)`` (извлечение
+    текста) и опережает обработку LLM не более чем на ``prefetch``
+    файлов, так что текст следующего файла готовится, пока модель
+    обрабатывает текущий. ``process(i, extracted)`` выполняется в
+    ``workers`` потоках: с пулом процессов модели чанки нескольких
+    файлов одновременно распределяются по всем процессам пула. Ошибка
+    одного файла не останавливает пакет и попадает в его результат, а
+    ``CancelledError`` на любом этапе останавливает конвейер: следующие
+    файлы не обрабатываются и в результат не попадают.
+
+    :param filenames: Имена файлов пакета
+    :param extract: Первый этап для файла с номером ``i``
+    :param process: Второй этап с результатом первого
+    :param on_result: Вызывается с результатом каждого файла по мере
+        готовности (из разных потоков)
+    :param workers: Количество файлов, одновременно обрабатываемых LLM
+    :param prefetch: Количество файлов, извлекаемых заранее
+    :return: Результаты в порядке файлов
+    :raises CancelledError: Если этап файла сообщил об отмене задачи
+    """
+    results = _BatchResults(len(filenames), on_result)
+    extracted: "queue.Queue[Optional[Tuple[int, Any]]]" = queue.Queue(
+        maxsize=max(1, prefetch)
+    )
+    extractor = threading.Thread(
+        target=_extract_all,
+        args=(filenames, extract, extracted, results),
+        name="batch-extract",
+        daemon=True
+    )
+    extractor.start()
+
+    slots = threading.BoundedSemaphore(max(1, workers))
+    with ThreadPoolExecutor(
+        max_workers=max(1, workers), thread_name_prefix="batch-llm"
+    ) as executor:
+        while True:
+            item = extracted.get()
+            if item is None:
+                break
+            index, data = item
+            if results.cancelled is not None:
+                continue
+            # Не берем следующий файл, пока все потоки LLM заняты, чтобы
+            # извлеченный текст не накапливался в памяти
+            slots.acquire()  # pylint: disable=consider-using-with
+            future = executor.submit(process, index, data)
+            future.add_done_callback(
+                _on_processed(index, filenames[index], results, slots)
+            )
+    extractor.join()
+    if results.cancelled is not None:
+        raise results.cancelled
+    return results.ordered()
+
+
+def _extract_all(
+    filenames: Sequence[str],
+    extract: Callable[[int], Any],
+    extracted: "queue.Queue[Optional[Tuple[int, Any]]]",
+    results: _BatchResults
+) -> None:
+    """Выполняет первый этап для всех файлов и передает их дальше."""
+    try:
+        for index, filename in enumerate(filenames):
+            if results.cancelled is not None:
+                return
+            try:
+                data = extract(index)
+            except CancelledError as e:
+                results.cancel(e)
+                return
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.warning("[PDF] Файл %s пакета не обработан: %s",
+                               filename, e)
+                results.finish(index, file_failure(filename, e))
+                continue
+            extracted.put((index, data))
+    finally:
+        extracted.put(None)
+
+
+def _on_processed(
+    index: int,
+    filename: str,
+    results: _BatchResults,
+    slots: threading.BoundedSemaphore
+) -> Callable[[Future], None]:
+    """Создает обработчик завершения второго этапа для файла пакета."""
+    def done(future: Future) -> None:
+        try:
+            results.finish(index, future.result())
+        except CancelledError as e:
+            results.cancel(e)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("[LLM] Файл %s пакета не обработан: %s",
+                           filename, e)
+            results.finish(index, file_failure(filename, e))
+        finally:
+            slots.release()
+    return done
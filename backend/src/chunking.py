@@ -0,0 +1,195 @@
+"""Module for splitting patent text into chunks for the LLM."""
+import re
+from typing import Callable, List, Tuple
+
+from llama_cpp import Llama
+
+# Параметры разбиения текста на чанки по умолчанию
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_CHUNK_OVERLAP = 0
+
+# Доля контекста модели, заполняемая одним запросом при разбиении
+# текста на чанки по токенам
+DEFAULT_CONTEXT_SHARE = 0.9
+
+# Уровни разбиения текста при упаковке в чанки по токенам:
+# абзацы, затем предложения, затем слова
+_SPLIT_LEVELS: Tuple[Tuple["re.Pattern[str]", str], ...] = (
+    (re.compile(r"\n\s*\n"), "\n\n"),
+    (re.compile(r"(?<=[.!?;])\s+"), " "),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def split_text_into_chunks(
+    text: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    overlap: int = DEFAULT_CHUNK_OVERLAP
+) -> List[str]:
+    """
+    Разбивает текст на чанки заданного размера.
+
+    :param text: Текст для разбиения
+    :param chunk_size: Размер чанка в символах
+    :param overlap: Перекрытие между чанками в символах
+    :return: Список текстовых чанков
+    """
+    if not text or not text.strip():
+        return []
+
+    if len(text) <= chunk_size:
+        return [text]
+
+    chunks = []
+    start = 0
+
+    while start < len(text):
+        end = start + chunk_size
+        chunk = text[start:end]
+        if chunk.strip():
+            chunks.append(chunk)
+
+        if end >= len(text):
+            break
+        start = end - overlap
+
+    return chunks
+
+
+def _split_to_token_budget(
+    text: str,
+    count_tokens: Callable[[str], int],
+    max_tokens: int,
+    level: int = 0
+) -> List[str]:
+    """
+    Рекурсивно делит текст на части не длиннее ``max_tokens`` токенов.
+
+    Сначала текст делится по абзацам, части упаковываются жадно; части,
+    которые не помещаются целиком, делятся по предложениям, затем по
+    словам. Слово длиннее бюджета делится пополам по символам.
+    """
+    if count_tokens(text) <= max_tokens:
+        return [text]
+
+    if level >= len(_SPLIT_LEVELS):
+        middle = len(text) // 2
+        return [
+            part
+            for half in (text[:middle], text[middle:])
+            for part in _split_to_token_budget(
+                half, count_tokens, max_tokens, level
+            )
+        ]
+
+    pattern, separator = _SPLIT_LEVELS[level]
+    pieces = [piece for piece in pattern.split(text) if piece.strip()]
+    if len(pieces) <= 1:
+        return _split_to_token_budget(
+            text, count_tokens, max_tokens, level + 1
+        )
+
+    parts: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = count_tokens(piece)
+        if piece_tokens > max_tokens:
+            if current:
+                parts.append(separator.join(current))
+                current, current_tokens = [], 0
+            parts.extend(_split_to_token_budget(
+                piece, count_tokens, max_tokens, level + 1
+            ))
+            continue
+        if current and current_tokens + piece_tokens > max_tokens:
+            parts.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        # +1 — запас на токен разделителя перед следующей частью
+        current_tokens += piece_tokens + 1
+    if current:
+        parts.append(separator.join(current))
+    return parts
+
+
+def split_text_into_token_chunks(
+    text: str,
+    count_tokens: Callable[[str], int],
+    max_tokens: int
+) -> List[Tuple[str, int]]:
+    """
+    Разбивает текст на чанки по бюджету токенов на границах абзацев.
+
+    Чанки заполняются абзацами (при необходимости — предложениями и
+    словами), пока не будет достигнут ``max_tokens``; текст не
+    обрезается и не разрывается посреди слова.
+
+    :param text: Текст для разбиения
+    :param count_tokens: Функция подсчета токенов в строке
+    :param max_tokens: Максимальное число токенов в чанке
+    :return: Список пар (текст чанка, число токенов в чанке)
+    """
+    if not text or not text.strip():
+        return []
+    if max_tokens <= 0:
+        raise ValueError(
+            f"Бюджет токенов на чанк должен быть положительным: {max_tokens}"
+        )
+
+    chunks = _split_to_token_budget(text.strip(), count_tokens, max_tokens)
+    return [(chunk, count_tokens(chunk)) for chunk in chunks]
+
+
+def count_llm_tokens(llm: Llama, text: str) -> int:
+    """Возвращает число токенов текста по токенизатору модели."""
+    return len(llm.tokenize(text.encode("utf-8"), add_bos=False))
+
+
+def chunk_token_budget(
+    llm: Llama,
+    prompt_template: str,
+    max_tokens: int,
+    context_share: float = DEFAULT_CONTEXT_SHARE
+) -> int:
+    """
+    Вычисляет число токенов текста, помещающихся в один запрос к модели.
+
+    Из доли контекста ``context_share`` вычитаются токены шаблона промпта
+    и токены, зарезервированные под ответ модели.
+
+    :param llm: Загруженная модель LLM
+    :param prompt_template: Шаблон промпта, к которому добавляется текст
+    :param max_tokens: Число токенов, резервируемых под ответ
+    :param context_share: Доля контекста модели, используемая запросом
+    :return: Бюджет токенов на текст одного чанка
+    """
+    context_tokens = int(llm.n_ctx() * context_share)
+    template_tokens = count_llm_tokens(llm, prompt_template)
+    return context_tokens - template_tokens - max_tokens
+
+
+def pack_lines(
+    lines: List[str],
+    count_tokens: Callable[[str], int],
+    max_tokens: int
+) -> List[List[str]]:
+    """
+    Жадно упаковывает строки в группы не длиннее ``max_tokens`` токенов.
+
+    Строка длиннее бюджета образует отдельную группу.
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for line in lines:
+        # +1 — токен перевода строки между строками группы
+        line_tokens = count_tokens(line) + 1
+        if current and current_tokens + line_tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        groups.append(current)
+    return groups
@@ -0,0 +1,229 @@
+"""Module for folding near-duplicate passages of patent text."""
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+# Порог сходства (коэффициент Жаккара по шинглам), начиная с которого
+# фрагмент считается повтором; 0 отключает дедупликацию
+DEFAULT_DEDUP_THRESHOLD = 0.8
+
+# Длина шингла в словах и минимальная длина фрагмента для сравнения
+SHINGLE_SIZE = 3
+MIN_PASSAGE_WORDS = 8
+
+# Число хеш-функций MinHash и число полос LSH (по 4 значения в полосе)
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240917)
+_HASH_A: npt.NDArray[np.int64] = _rng.integers(
+    1, _PRIME, NUM_PERMUTATIONS, dtype=np.int64
+)
+_HASH_B: npt.NDArray[np.int64] = _rng.integers(
+    0, _PRIME, NUM_PERMUTATIONS, dtype=np.int64
+)
+
+_WORD = re.compile(r"\w+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+_PARAGRAPH = re.compile(r"(\n\s*\n)")
+_SENTENCE = re.compile(r"((?<=[.!?;])\s+)")
+
+# Фрагмент для сравнения: шинглы и числа в порядке появления
+_Passage = Tuple[Set[int], Tuple[str, ...]]
+
+
+def _passage(text: str) -> Optional[_Passage]:
+    """Возвращает шинглы и числа фрагмента или None, если он короткий."""
+    words = _WORD.findall(text.lower())
+    if len(words) < MIN_PASSAGE_WORDS:
+        return None
+    shingles = {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode("utf-8"))
+        & _PRIME
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+    return shingles, tuple(_NUMBER.findall(text))
+
+
+def _signature(shingles: Set[int]) -> npt.NDArray[np.int64]:
+    """Вычисляет подпись MinHash множества шинглов."""
+    values = np.fromiter(shingles, dtype=np.int64, count=len(shingles))
+    hashed = (_HASH_A[:, None] * values[None, :] + _HASH_B[:, None]) % _PRIME
+    return hashed.min(axis=1)
+
+
+def _jaccard(first: Set[int], second: Set[int]) -> float:
+    """Коэффициент Жаккара двух множеств шинглов."""
+    return len(first & second) / len(first | second)
+
+
+def _best_match(
+    passage: _Passage,
+    candidates: Dict[int, _Passage],
+    threshold: float
+) -> Optional[Tuple[int, float]]:
+    """Выбирает самого похожего кандидата с теми же числами."""
+    best_index, best_similarity = -1, 0.0
+    for j in sorted(candidates):
+        if candidates[j][1] != passage[1]:
+            continue
+        similarity = _jaccard(passage[0], candidates[j][0])
+        if similarity >= threshold and similarity > best_similarity:
+            best_index, best_similarity = j, similarity
+    if best_index < 0:
+        return None
+    return best_index, round(best_similarity, 3)
+
+
+def find_near_duplicates(
+    texts: Sequence[str],
+    threshold: float = DEFAULT_DEDUP_THRESHOLD
+) -> List[Optional[Tuple[int, float]]]:
+    """
+    Находит фрагменты, почти совпадающие с одним из предыдущих.
+
+    Кандидаты отбираются по LSH над подписями MinHash (шинглы по
+    ``SHINGLE_SIZE`` слов), сходство кандидатов проверяется точным
+    коэффициентом Жаккара. Повтором считается только фрагмент с теми же
+    числами в том же порядке: составы разных примеров, отличающиеся
+    значениями, не объединяются. Фрагменты короче
+    ``MIN_PASSAGE_WORDS`` слов не сравниваются.
+
+    :param texts: Фрагменты текста в порядке следования
+    :param threshold: Минимальный коэффициент Жаккара для повтора
+    :return: Для каждого фрагмента None или пара (индекс первого
+        вхождения, сходство)
+    """
+    duplicates: List[Optional[Tuple[int, float]]] = [None] * len(texts)
+    if threshold <= 0:
+        return duplicates
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    passages: Dict[int, _Passage] = {}
+    for i, text in enumerate(texts):
+        passage = _passage(text)
+        if passage is None:
+            continue
+        signature = _signature(passage[0])
+        keys = [
+            (band, signature[band * rows:(band + 1) * rows].tobytes())
+            for band in range(LSH_BANDS)
+        ]
+        duplicates[i] = _best_match(
+            passage,
+            {j: passages[j] for key in keys for j in buckets.get(key, ())},
+            threshold
+        )
+        if duplicates[i] is not None:
+            continue
+        passages[i] = passage
+        for key in keys:
+            buckets.setdefault(key, []).append(i)
+    return duplicates
+
+
+def fold_duplicate_passages(
+    text: str,
+    threshold: float = DEFAULT_DEDUP_THRESHOLD
+) -> Tuple[str, List[Dict[str, object]]]:
+    """
+    Удаляет из текста повторы предложений, сохраняя первое вхождение.
+
+    Текст делится на абзацы и предложения; пробелы между оставшимися
+    предложениями и абзацами не меняются, абзацы, все предложения
+    которых оказались повторами, удаляются целиком.
+
+    :param text: Текст патента
+    :param threshold: Порог сходства (0 — текст не меняется)
+    :return: Кортеж (текст без повторов, список объединенных фрагментов
+        ``{passage, into, similarity, text}`` с номерами предложений
+        с 1)
+    """
+    texts, folded = fold_duplicate_texts([text], threshold)
+    return texts[0], folded
+
+
+def fold_duplicate_texts(
+    texts: Sequence[str],
+    threshold: float = DEFAULT_DEDUP_THRESHOLD
+) -> Tuple[List[str], List[Dict[str, object]]]:
+    """
+    Удаляет повторы предложений из нескольких текстов сразу.
+
+    Предложения сравниваются во всех текстах в порядке их следования,
+    поэтому остается вхождение из первого текста, в котором оно
+    встретилось (см. ``fold_duplicate_passages``).
+
+    :param texts: Тексты (например, разделы патента в порядке обработки)
+    :param threshold: Порог сходства (0 — тексты не меняются)
+    :return: Кортеж (тексты без повторов, список объединенных
+        фрагментов с номерами предложений с 1 по всем текстам)
+    """
+    if threshold <= 0 or not any(texts):
+        return list(texts), []
+    # Абзацы и разделители между ними (пустые строки), а в абзацах —
+    # предложения на четных местах, пробелы — на нечетных
+    splits = [_PARAGRAPH.split(text) for text in texts]
+    parts = [
+        [_SENTENCE.split(paragraph) for paragraph in split[::2]]
+        for split in splits
+    ]
+    sentences = [
+        sentence for paragraphs in parts for paragraph in paragraphs
+        for sentence in paragraph[::2]
+    ]
+    duplicates = find_near_duplicates(sentences, threshold)
+
+    folded: List[Dict[str, object]] = []
+    result: List[str] = []
+    index = 0
+    for text, split, paragraphs in zip(texts, splits, parts):
+        kept_paragraphs: List[str] = []
+        text_folded = len(folded)
+        for j, paragraph in enumerate(paragraphs):
+            kept = _fold_paragraph(paragraph, duplicates, index, folded)
+            index += (len(paragraph) + 1) // 2
+            if kept.strip():
+                if kept_paragraphs:
+                    kept_paragraphs.append(split[2 * j - 1])
+                kept_paragraphs.append(kept)
+        result.append(
+            "".join(kept_paragraphs) if len(folded) > text_folded else text
+        )
+    return result, folded
+
+
+def _fold_paragraph(
+    paragraph: List[str],
+    duplicates: List[Optional[Tuple[int, float]]],
+    index: int,
+    folded: List[Dict[str, object]]
+) -> str:
+    """
+    Собирает абзац без повторов и дописывает их в ``folded``.
+
+    :param paragraph: Предложения абзаца и пробелы между ними
+    :param duplicates: Результат ``find_near_duplicates`` по всем
+        предложениям
+    :param index: Номер первого предложения абзаца в ``duplicates``
+    :return: Текст абзаца из оставшихся предложений
+    """
+    kept: List[str] = []
+    for k in range(0, len(paragraph), 2):
+        duplicate = duplicates[index + k // 2]
+        if duplicate is None:
+            if kept:
+                kept.append(paragraph[k - 1])
+            kept.append(paragraph[k])
+            continue
+        folded.append({
+            "passage": index + k // 2 + 1,
+            "into": duplicate[0] + 1,
+            "similarity": duplicate[1],
+            "text": paragraph[k][:80],
+        })
+    return "".join(kept)
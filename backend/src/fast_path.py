@@ -0,0 +1,368 @@
+"""Module with a deterministic parser of alloy compositions and properties."""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .relevance import ELEMENTS
+
+# Свойство в виде {property, value, unit}, как в структурированном выводе
+PropertyItem = Dict[str, str]
+
+COMPOSITION = "Alloy composition"
+
+_NUMBER = r"\d+(?:[.,]\d+)?"
+_RANGE = rf"{_NUMBER}(?:\s*(?:-|–|to)\s*{_NUMBER})?"
+_AMOUNT = rf"(?:[<>≤≥]\s*)?{_NUMBER}(?:\s*[-–]\s*{_NUMBER})?"
+_QUALIFIER = (
+    r"(?i:at\s+least|at\s+most|not\s+less\s+than|not\s+more\s+than"
+    r"|no\s+more\s+than|more\s+than|less\s+than|up\s+to|about"
+    r"|approximately)|[<>≤≥~]"
+)
+_PERCENT = r"(?:(?:wt|at|mass|vol)\s*\.?\s*%|%)"
+_BALANCE = r"(?i:bal(?:ance)?\.?|rest|remainder)"
+_ELEMENT = rf"(?<!\w)(?:{ELEMENTS})(?![A-Za-z])"
+
+_STRESS = r"MPa|GPa|ksi|N/mm2|N/mm²|МПа|ГПа"
+_TEMPERATURE = r"°\s*[CF]|℃|°С|[CFKС]"
+
+# Свойства: (название в ответе, название в тексте, единицы измерения)
+_PROPERTIES: Tuple[Tuple[str, str, str], ...] = (
+    ("Hardness", r"hardness|твердост\w*", r"HBW|HB|HV\s?\d*|HRC|HRB|HRA"),
+    ("Tensile strength",
+     r"(?:ultimate\s+)?tensile\s+strength|UTS|предел\w*\s+прочност\w*",
+     _STRESS),
+    ("Yield strength",
+     r"yield\s+strength|proof\s+stress|предел\w*\s+текучест\w*",
+     _STRESS),
+    ("Elongation", r"elongation|удлинени\w*", r"%"),
+    ("Melting temperature",
+     r"melting\s+(?:point|temperature)|температур\w*\s+плавлени\w*",
+     _TEMPERATURE),
+    ("Annealing temperature",
+     r"anneal(?:ing|ed)(?:\s+temperature)?|отжиг\w*", _TEMPERATURE),
+    ("Solution treatment temperature",
+     r"solution(?:\s+heat)?\s+treat(?:ment|ed)(?:\s+temperature)?",
+     _TEMPERATURE),
+    ("Density", r"density|плотност\w*", r"g/cm3|g/cm³|kg/m3|г/см3|г/см³"),
+)
+
+
+def _measure(index: int, units: str) -> str:
+    """Шаблон значения свойства с группами номера ``index``."""
+    return (
+        rf"(?P<q{index}>(?:{_QUALIFIER})\s*)?(?P<v{index}>{_RANGE})\s*"
+        rf"(?P<u{index}>{units})(?!\w)"
+    )
+
+
+# Все свойства одним шаблоном: текст просматривается за один проход,
+# номер сработавшей альтернативы определяет свойство
+_PROPERTY_MENTION = re.compile("|".join(
+    rf"(?P<p{i}>(?<!\w)(?i:{name})[^\d.;]{{0,40}}?{_measure(i, units)})"
+    for i, (_, name, units) in enumerate(_PROPERTIES)
+))
+
+# Содержание одного элемента: "Cr 20 wt%", "20% Cr", "Fe bal.",
+# "the balance being Fe"
+_PAIR = re.compile(
+    rf"(?P<element>{_ELEMENT})\s*[:=]?\s*"
+    rf"(?:(?P<amount>{_AMOUNT})\s*(?P<unit>{_PERCENT})"
+    rf"|(?P<balance>{_BALANCE})(?!\w))"
+    rf"|(?P<amount2>{_AMOUNT})\s*(?P<unit2>{_PERCENT})\s*"
+    rf"(?P<element2>{_ELEMENT})"
+    rf"|(?i:(?:the\s+)?(?:balance|remainder|rest)"
+    rf"(?:\s+(?:being|is|of))?)\s+(?P<element3>{_ELEMENT})"
+)
+_PAIR_GAP = re.compile(r"\s*(?:[,;]|and)?\s*")
+
+# Строка "Свойство (метка): значение", в том числе строки таблиц
+_PROPERTY_LINE = re.compile(
+    r"^[^\S\n]*(?P<name>[^:\n()]{1,60}?)"
+    r"(?:[^\S\n]*\((?P<label>[^()\n]{1,40})\))?"
+    r"[^\S\n]*:[^\S\n]*(?P<value>[^\n]*?)[^\S\n]*$",
+    re.MULTILINE
+)
+_COMPOSITION_NAME = re.compile(
+    r"(?:alloy\s+|chemical\s+)?composition|состав(?:\s+сплава)?",
+    re.IGNORECASE
+)
+_PROPERTY_NAMES = tuple(
+    re.compile(name, re.IGNORECASE) for _, name, _ in _PROPERTIES
+)
+_PROPERTY_VALUES = tuple(
+    re.compile(_measure(0, units)) for _, _, units in _PROPERTIES
+)
+
+# Заголовки столбцов таблицы: элемент ("Cr", "Cr (wt%)") или свойство с
+# единицей измерения ("Hardness HB", "Tensile strength, MPa")
+_ELEMENT_HEADER = re.compile(
+    rf"(?P<element>{ELEMENTS})\s*(?:[(,]?\s*(?P<unit>{_PERCENT})\s*\)?)?"
+)
+_PROPERTY_HEADERS = tuple(
+    re.compile(rf"(?i:{name})\s*[(,]?\s*(?P<unit>{units})\s*\)?")
+    for _, name, units in _PROPERTIES
+)
+_PROPERTY_CELL = re.compile(rf"(?:(?:{_QUALIFIER})\s*)?{_RANGE}")
+_TABLE_UNIT = re.compile(r"(?:wt|at|mass|vol)\s*\.?\s*%", re.IGNORECASE)
+_EMPTY_CELLS = ("", "-", "–", "—")
+
+_SPACES = re.compile(r"\s+")
+
+# Номера примеров, таблиц, фигур и пунктов формулы ("Example 3",
+# "FIG. 2", "claim 1") — не значения свойств
+_REFERENCE = re.compile(
+    r"(?<!\w)(?i:example|table|fig(?:ure)?\.?|claim|пример\w*|таблиц\w*"
+    r"|фиг\.?|пункт\w*)\s*\d+[a-z]?(?!\w)"
+)
+_DIGIT = re.compile(r"\d")
+
+
+def _compact(text: str) -> str:
+    """Убирает пробелы внутри числа, диапазона или единицы."""
+    return _SPACES.sub("", text)
+
+
+def _item(name: str, value: str, unit: str = "") -> PropertyItem:
+    """Создает свойство с нормализованными пробелами."""
+    return {
+        "property": name,
+        "value": _SPACES.sub(" ", value).strip(),
+        "unit": _compact(unit),
+    }
+
+
+def _pair_text(match: "re.Match[str]") -> str:
+    """Записывает содержание элемента в виде "Cr 20%" или "Fe bal."."""
+    if match.group("element3"):
+        return f"{match.group('element3')} bal."
+    if match.group("element2"):
+        element, amount, unit = match.group("element2", "amount2", "unit2")
+    elif match.group("balance"):
+        return f"{match.group('element')} bal."
+    else:
+        element, amount, unit = match.group("element", "amount", "unit")
+    unit = _compact(unit)
+    separator = "" if unit == "%" else " "
+    return f"{element} {_compact(amount)}{separator}{unit}"
+
+
+def _compositions(text: str) -> List[Tuple[int, int, str]]:
+    """
+    Находит перечисления содержания элементов.
+
+    Составом считаются не менее двух содержаний подряд, разделенных
+    запятой, точкой с запятой или "and".
+
+    :return: Список (начало, конец, состав в виде "Fe 70%, Cr 20%")
+    """
+    runs: List[List["re.Match[str]"]] = []
+    for match in _PAIR.finditer(text):
+        if runs and _PAIR_GAP.fullmatch(
+            text, runs[-1][-1].end(), match.start()
+        ):
+            runs[-1].append(match)
+        else:
+            runs.append([match])
+    return [
+        (run[0].start(), run[-1].end(), ", ".join(map(_pair_text, run)))
+        for run in runs if len(run) > 1
+    ]
+
+
+def _measure_item(
+    index: int,
+    match: "re.Match[str]",
+    group: int,
+    name: str
+) -> PropertyItem:
+    """Создает свойство из значения, найденного шаблоном ``_measure``."""
+    qualifier = match.group(f"q{group}") or ""
+    value = qualifier + _compact(match.group(f"v{group}"))
+    return _item(name or _PROPERTIES[index][0], value,
+                 match.group(f"u{group}"))
+
+
+def _line_item(match: "re.Match[str]") -> Optional[PropertyItem]:
+    """Разбирает строку "Свойство (метка): значение" известного вида."""
+    name, label, value = match.group("name", "label", "value")
+    suffix = f" ({label.strip()})" if label else ""
+    if _COMPOSITION_NAME.fullmatch(name.strip()):
+        compositions = _compositions(value)
+        if len(compositions) == 1 and compositions[0][:2] == (0, len(value)):
+            return _item(COMPOSITION + suffix, compositions[0][2])
+        return None
+    for index, pattern in enumerate(_PROPERTY_NAMES):
+        if not pattern.fullmatch(name.strip()):
+            continue
+        measure = _PROPERTY_VALUES[index].fullmatch(value)
+        if measure is None:
+            return None
+        return _measure_item(
+            index, measure, 0, _PROPERTIES[index][0] + suffix
+        )
+    return None
+
+
+def _blank(text: str, start: int, end: int) -> str:
+    """Заменяет разобранный фрагмент пробелами той же длины."""
+    return text[:start] + " " * (end - start) + text[end:]
+
+
+def extract_properties(text: str) -> Tuple[List[PropertyItem], str]:
+    """
+    Извлекает составы и числовые свойства сплавов без LLM.
+
+    Разбираются строки "Свойство (метка): значение" (в том числе строки
+    таблиц составов, см. ``table_lines``), перечисления содержания
+    элементов ("Fe 70%, Cr 20%, Ni 10%") и упоминания свойств с числом и
+    единицей измерения ("hardness of 350 HB", "annealed at 1050 °C").
+    Разобранные фрагменты заменяются в тексте пробелами.
+
+    :param text: Текст чанка
+    :return: Кортеж (свойства в порядке появления, неразобранный остаток)
+    """
+    found: List[Tuple[int, PropertyItem]] = []
+    for match in _PROPERTY_LINE.finditer(text):
+        item = _line_item(match)
+        if item is not None:
+            found.append((match.start(), item))
+            text = _blank(text, match.start(), match.end())
+    for start, end, composition in _compositions(text):
+        found.append((start, _item(COMPOSITION, composition)))
+        text = _blank(text, start, end)
+    for match in _PROPERTY_MENTION.finditer(text):
+        index = int(match.lastgroup[1:])
+        found.append((match.start(), _measure_item(index, match, index, "")))
+        text = _blank(text, match.start(), match.end())
+    found.sort(key=lambda pair: pair[0])
+    return [item for _, item in found], text
+
+
+def covers(text: str) -> Tuple[List[PropertyItem], bool]:
+    """
+    Проверяет, разбирается ли текст полностью без LLM.
+
+    Текст покрыт, если найдено хотя бы одно свойство, а в остатке нет
+    ни одного числа, кроме номеров примеров, таблиц и фигур
+    (``_REFERENCE``): регулярные выражения знают не все свойства
+    ("impact energy is 45 J"), и число в остатке может оказаться
+    значением, которое потеряется без LLM. Ключевые слова без чисел не
+    мешают.
+
+    :param text: Текст чанка
+    :return: Кортеж (найденные свойства, текст покрыт)
+    """
+    items, rest = extract_properties(text)
+    rest = _REFERENCE.sub(" ", rest)
+    return items, bool(items) and _DIGIT.search(rest) is None
+
+
+def _cell(value: Optional[str]) -> str:
+    """Нормализует пробелы и переносы строк в ячейке таблицы."""
+    return _SPACES.sub(" ", value or "").strip()
+
+
+def _table_columns(
+    header: Sequence[str]
+) -> Optional[List[Tuple[str, str, str]]]:
+    """
+    Определяет столбцы таблицы по строке заголовка.
+
+    :return: Для каждого столбца (вид, название, единица), где вид —
+        ``label``, ``element`` или ``property``; None, если заголовок не
+        похож на таблицу составов
+    """
+    columns: List[Tuple[str, str, str]] = []
+    for position, cell in enumerate(header):
+        element = _ELEMENT_HEADER.fullmatch(cell)
+        if element is not None:
+            columns.append(
+                ("element", element.group("element"),
+                 _compact(element.group("unit") or ""))
+            )
+            continue
+        for index, pattern in enumerate(_PROPERTY_HEADERS):
+            unit = pattern.fullmatch(cell)
+            if unit is not None:
+                columns.append(
+                    ("property", _PROPERTIES[index][0],
+                     _compact(unit.group("unit")))
+                )
+                break
+        else:
+            if position > 0:
+                return None
+            columns.append(("label", cell, ""))
+    if sum(1 for kind, _, _ in columns if kind == "element") < 2:
+        return None
+    return columns
+
+
+def _row_lines(
+    columns: List[Tuple[str, str, str]],
+    row: Sequence[str],
+    unit: str
+) -> Optional[List[str]]:
+    """
+    Записывает строку таблицы строками свойств.
+
+    Столбец с названием сплава всегда первый, поэтому метка известна до
+    столбцов элементов и свойств.
+
+    :return: Строки свойств или None, если ячейку не удалось разобрать
+    """
+    label, pairs, lines = "", [], []
+    for (kind, name, column_unit), cell in zip(columns, row):
+        if kind == "label":
+            label = f" ({cell})" if cell else ""
+        elif cell in _EMPTY_CELLS:
+            continue
+        elif kind == "element" and re.fullmatch(_BALANCE, cell):
+            pairs.append(f"{name} bal.")
+        elif kind == "element" and re.fullmatch(_AMOUNT, cell):
+            pair_unit = column_unit or unit
+            separator = "" if pair_unit == "%" else " "
+            pairs.append(f"{name} {_compact(cell)}{separator}{pair_unit}")
+        elif kind == "property" and _PROPERTY_CELL.fullmatch(cell):
+            lines.append(f"{name}{label}: {cell} {column_unit}")
+        else:
+            return None
+    if len(pairs) > 1:
+        lines.insert(0, f"{COMPOSITION}{label}: {', '.join(pairs)}")
+    elif pairs:
+        return None
+    return lines
+
+
+def table_lines(rows: Sequence[Sequence[Optional[str]]]) -> List[str]:
+    """
+    Записывает таблицу составов строками "Свойство (сплав): значение".
+
+    Таблица распознается, если в одной из первых трех строк есть
+    заголовок минимум с двумя столбцами элементов; кроме них допускаются
+    столбец с названием сплава (первый) и столбцы свойств с единицей
+    измерения в заголовке. Единица содержания берется из заголовка
+    столбца или строк над заголовком (wt%, at%), по умолчанию "%".
+
+    :param rows: Строки таблицы (``pdfplumber`` ``Table.extract()``)
+    :return: Строки свойств или пустой список, если таблица не является
+        таблицей составов или какую-либо ячейку не удалось разобрать
+    """
+    cells = [[_cell(value) for value in row] for row in rows]
+    for position, header in enumerate(cells[:3]):
+        columns = _table_columns(header)
+        if columns is not None:
+            break
+    else:
+        return []
+    title = _TABLE_UNIT.search(" ".join(sum(cells[:position], [])))
+    unit = _compact(title.group(0)) if title else "%"
+
+    lines: List[str] = []
+    for row in cells[position + 1:]:
+        if not any(row):
+            continue
+        row_lines = _row_lines(columns, row, unit)
+        if row_lines is None:
+            return []
+        lines.extend(row_lines)
+    return lines
@@ -0,0 +1,423 @@
+"""Module with a bounded background job queue for patent processing."""
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import CancelledError
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .metrics import JOBS_FINISHED, STAGE_SECONDS
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+# События завершения задачи: после них новых событий не бывает
+EVENT_DONE = "done"
+EVENT_FAILED = "failed"
+EVENT_CANCELLED = "cancelled"
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Очередь задач заполнена, новая задача не может быть принята."""
+
+
+class JobError(Exception):
+    """Ошибка обработки задачи с HTTP кодом для ответа клиенту."""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class Job:  # pylint: disable=too-many-instance-attributes
+    """
+    Задача обработки одного патента и ее состояние.
+
+    События о ходе обработки накапливаются в ``events`` и читаются
+    потоково через ``wait_events`` (из потоков) или через обработчики
+    ``add_listener`` (из цикла asyncio); последнее событие — ``done``,
+    ``failed`` или ``cancelled``. ``cancel()`` запрашивает отмену:
+    обработчик узнает о ней через ``check_cancelled()`` или обработчики
+    ``on_cancel`` (например, отмена чанков в планировщике модели).
+    ``priority`` — приоритет чанков задачи в планировщике.
+    ``on_discard`` вызывается вместо обработчика, если задача отменена
+    до запуска (например, чтобы удалить временные файлы из ``payload``).
+    """
+
+    filename: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = JOB_QUEUED
+    stage: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    error_code: Optional[int] = None
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    priority: int = 0
+    cancel_requested: bool = False
+    handler: Optional[Callable[["Job"], Dict[str, Any]]] = field(
+        default=None, repr=False, compare=False
+    )
+    on_discard: Optional[Callable[["Job"], None]] = field(
+        default=None, repr=False, compare=False
+    )
+    _cancel_callbacks: List[Callable[[], None]] = field(
+        default_factory=list, repr=False, compare=False
+    )
+    _events_changed: threading.Condition = field(
+        default_factory=threading.Condition, repr=False, compare=False
+    )
+    _listeners: List[Callable[[], None]] = field(
+        default_factory=list, repr=False, compare=False
+    )
+
+    @property
+    def finished(self) -> bool:
+        """Задача завершена успешно, с ошибкой или отменена."""
+        return self.status in (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+    def cancel(self) -> bool:
+        """
+        Запрашивает отмену задачи и вызывает обработчики ``on_cancel``.
+
+        Задача из очереди не запускается, выполняемая задача
+        останавливается после текущего чанка.
+
+        :return: False, если задача уже завершена
+        """
+        with self._events_changed:
+            if self.finished:
+                return False
+            self.cancel_requested = True
+            callbacks = list(self._cancel_callbacks)
+        for callback in callbacks:
+            callback()
+        return True
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """
+        Регистрирует обработчик отмены задачи.
+
+        Если отмена уже запрошена, обработчик вызывается сразу.
+        """
+        with self._events_changed:
+            if not self.cancel_requested:
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def check_cancelled(self) -> None:
+        """
+        Прерывает обработку, если запрошена отмена задачи.
+
+        :raises CancelledError: Если отмена запрошена
+        """
+        if self.cancel_requested:
+            raise CancelledError(f"Задача {self.job_id} отменена")
+
+    def emit(self, event: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Добавляет событие о ходе обработки и будит ожидающих читателей.
+
+        :param event: Тип события (например, ``page`` или ``chunk``)
+        :param data: Данные события
+        """
+        with self._events_changed:
+            self.events.append({
+                "id": len(self.events),
+                "event": event,
+                "data": data or {},
+            })
+            self._events_changed.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Регистрирует обработчик, вызываемый после каждого нового события.
+
+        Обработчик вызывается в потоке, добавившем событие, поэтому он
+        должен быть быстрым и не блокирующим (например, передавать
+        сигнал в цикл asyncio через ``loop.call_soon_threadsafe``).
+        """
+        with self._events_changed:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[], None]) -> None:
+        """Удаляет обработчик, зарегистрированный ``add_listener``."""
+        with self._events_changed:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def events_after(self, after: int) -> List[Dict[str, Any]]:
+        """Возвращает события с номера ``after`` без ожидания."""
+        with self._events_changed:
+            return self.events[after:]
+
+    def wait_events(
+        self,
+        after: int,
+        timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Возвращает события с номера ``after``, ожидая их появления.
+
+        :param after: Номер первого еще не прочитанного события
+        :param timeout: Максимальное время ожидания в секундах
+        :return: Новые события (пустой список, если время истекло)
+        """
+        with self._events_changed:
+            self._events_changed.wait_for(
+                lambda: len(self.events) > after, timeout
+            )
+            return self.events[after:]
+
+    @contextmanager
+    def stage_timer(self, stage: str) -> Iterator[None]:
+        """
+        Отмечает текущий этап задачи и замеряет его длительность.
+
+        :param stage: Название этапа (например, ``extract_text``)
+        """
+        self.stage = stage
+        self.emit("stage", {"stage": stage})
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start_time
+            self.timings[stage] = round(elapsed, 3)
+            STAGE_SECONDS.labels(stage).observe(elapsed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Возвращает публичное представление задачи для API."""
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "timings": dict(self.timings),
+            "result": self.result,
+            "error": self.error,
+            "error_code": self.error_code,
+            "priority": self.priority,
+            "cancel_requested": self.cancel_requested,
+        }
+
+
+class JobQueue:  # pylint: disable=too-many-instance-attributes
+    """
+    Ограниченная очередь задач с пулом фоновых потоков-обработчиков.
+
+    ``submit`` не блокирует вызывающего: задача ставится в очередь и
+    сразу возвращается. Если очередь заполнена, выбрасывается
+    ``QueueFullError``. Завершенные задачи хранятся в памяти, пока их
+    число не превысит ``max_finished``; самые старые удаляются первыми.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Job], Dict[str, Any]],
+        workers: int = 1,
+        max_queued: int = 16,
+        max_finished: int = 256
+    ):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_finished = max_finished
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(
+            maxsize=max(1, max_queued)
+        )
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+
+    @property
+    def depth(self) -> int:
+        """Количество задач, ожидающих обработки."""
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> int:
+        """Количество задач, обрабатываемых в данный момент."""
+        with self._jobs_lock:
+            return sum(
+                1 for job in self._jobs.values() if job.status == JOB_RUNNING
+            )
+
+    def start(self) -> None:
+        """Запускает потоки-обработчики, если они еще не запущены."""
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker, name=f"job-worker-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def shutdown(self) -> None:
+        """Останавливает потоки после завершения текущих задач."""
+        with self._start_lock:
+            for _ in self._threads:
+                self._queue.put(None)
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+
+    def submit(  # pylint: disable=too-many-arguments
+        self,
+        filename: str,
+        payload: Optional[Dict[str, Any]] = None,
+        handler: Optional[Callable[[Job], Dict[str, Any]]] = None,
+        priority: int = 0,
+        on_discard: Optional[Callable[[Job], None]] = None
+    ) -> Job:
+        """
+        Ставит новую задачу в очередь.
+
+        :param filename: Имя исходного файла
+        :param payload: Данные, необходимые обработчику
+        :param handler: Обработчик этой задачи вместо обработчика очереди
+            (например, для пакета файлов)
+        :param priority: Приоритет чанков задачи в планировщике модели
+        :param on_discard: Вызывается, если задача отменена до запуска
+            (например, для удаления временных файлов)
+        :return: Созданная задача
+        :raises QueueFullError: Если очередь заполнена
+        """
+        self.start()
+        job = Job(
+            filename=filename,
+            payload=payload or {},
+            handler=handler,
+            priority=priority,
+            on_discard=on_discard
+        )
+        with self._jobs_lock:
+            self._jobs[job.job_id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full as e:
+            with self._jobs_lock:
+                del self._jobs[job.job_id]
+            raise QueueFullError(
+                f"Очередь обработки заполнена ({self._queue.maxsize} задач)"
+            ) from e
+        return job
+
+    def complete(self, filename: str, result: Dict[str, Any]) -> Job:
+        """
+        Регистрирует уже завершенную задачу без постановки в очередь.
+
+        Используется, когда результат известен заранее (например, из кэша).
+
+        :param filename: Имя исходного файла
+        :param result: Готовый результат обработки
+        :return: Завершенная задача
+        """
+        now = time.time()
+        job = Job(
+            filename=filename,
+            status=JOB_DONE,
+            started_at=now,
+            finished_at=now,
+            result=result
+        )
+        job.emit(EVENT_DONE, {"result": result})
+        with self._jobs_lock:
+            self._jobs[job.job_id] = job
+        self._evict_finished()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Возвращает задачу по идентификатору или None."""
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def _worker(self) -> None:
+        """Цикл потока-обработчика: берет задачи из очереди по одной."""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job: Job) -> None:
+        """Выполняет одну задачу и сохраняет результат или ошибку."""
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        try:
+            if job.cancel_requested:
+                self._discard(job)
+            job.check_cancelled()
+            job.result = (job.handler or self.handler)(job)
+            job.status = JOB_DONE
+        except CancelledError:
+            logger.info("Задача %s отменена", job.job_id)
+            job.status = JOB_CANCELLED
+        except JobError as e:
+            job.error = str(e)
+            job.error_code = e.status_code
+            job.status = JOB_FAILED
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # Ошибка обработчика не должна останавливать поток-обработчик
+            logger.exception("Ошибка обработки задачи %s", job.job_id)
+            job.error = f"Внутренняя ошибка обработки: {e}"
+            job.error_code = 500
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = time.time()
+            job.stage = None
+            job.payload = {}
+            JOBS_FINISHED.labels(job.status).inc()
+            if job.status == JOB_DONE:
+                job.emit(EVENT_DONE, {"result": job.result})
+            elif job.status == JOB_CANCELLED:
+                job.emit(EVENT_CANCELLED, {})
+            else:
+                job.emit(EVENT_FAILED, {
+                    "error": job.error, "error_code": job.error_code
+                })
+            self._evict_finished()
+
+    @staticmethod
+    def _discard(job: Job) -> None:
+        """Освобождает ресурсы задачи, отмененной до запуска."""
+        if job.on_discard is None:
+            return
+        try:
+            job.on_discard(job)
+        except Exception:  # pylint: disable=broad-exception-caught
+            # Ошибка очистки не должна останавливать поток-обработчик
+            logger.exception("Ошибка очистки задачи %s", job.job_id)
+
+    def _evict_finished(self) -> None:
+        """Удаляет самые старые завершенные задачи сверх лимита."""
+        with self._jobs_lock:
+            finished = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished
+            ]
+            for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+                del self._jobs[job_id]
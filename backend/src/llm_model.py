@@ -0,0 +1,608 @@
+"""Module for loading the Llama model and keeping it warm across requests."""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from contextlib import contextmanager, redirect_stderr
+from io import StringIO
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import llama_cpp
+import numpy as np
+import numpy.typing as npt
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+
+from .metrics import MODEL_LOAD_SECONDS
+from .runtime_profile import RuntimeProfile, available_cpus, load_profile
+from .scheduler import ChunkScheduler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.environ.get(
+    "PATENT_MODEL_PATH",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "mistral-7b-instruct-v0.2.Q4_K_M.gguf"
+    )
+)
+
+# Количество процессов с отдельным экземпляром модели для обработки
+# чанков; 1 — модель только в процессе приложения
+LLM_WORKERS = int(os.environ.get("PATENT_LLM_WORKERS", "1"))
+
+# Спекулятивное декодирование поиском по промпту: число черновых токенов
+# за шаг (0 — отключено) и максимальная длина искомой n-граммы
+LLM_DRAFT_TOKENS = int(os.environ.get("PATENT_DRAFT_TOKENS", "0"))
+DRAFT_NGRAM_SIZE = int(os.environ.get("PATENT_DRAFT_NGRAM", "2"))
+
+# Порядок, в котором документы получают модель для следующего чанка
+# (см. ``ChunkScheduler``): "fair" или "shortest"
+SCHEDULER_POLICY = os.environ.get("PATENT_SCHEDULER_POLICY", "fair")
+
+# Количество слоев, выгружаемых на GPU, в порядке попыток загрузки
+GPU_LAYERS_ATTEMPTS: Tuple[int, ...] = (32, 16, 0)
+
+# Размер контекста модели
+N_CTX = 4096
+
+# Профиль потоков и пакета, подобранный командой калибровки
+# (``python -m benchmarks.calibrate``); без файла используются значения
+# по умолчанию
+RUNTIME_PROFILE_PATH = os.environ.get(
+    "PATENT_RUNTIME_PROFILE",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "runtime_profile.json"
+    )
+)
+
+# Формат записей лога процессов приложения и пула
+LOG_FORMAT = "%(asctime)s %(levelname)s %(processName)s %(message)s"
+
+# Кэши префиксов по экземплярам модели; удаляются вместе с моделью
+_prefix_caches: "weakref.WeakKeyDictionary[Llama, Dict[str, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class PromptPrefixCache:
+    """
+    Сохраненное состояние модели после вычисления общего префикса промпта.
+
+    Все чанки начинаются с одного и того же шаблона промпта. Префикс
+    вычисляется один раз для экземпляра модели, состояние (KV кэш)
+    сохраняется через ``Llama.save_state``; перед каждым чанком оно
+    восстанавливается, если KV кэш модели уже не начинается с префикса
+    (например, после финальной сборки или другого промпта). Дальше
+    llama-cpp находит совпадающий префикс токенов и вычисляет только
+    текст чанка.
+    """
+
+    def __init__(self, llm: Llama, prefix: str):
+        self.tokens: List[int] = list(
+            llm.tokenize(prefix.encode("utf-8"), add_bos=True)
+        )
+        start_time = time.time()
+        llm.reset()
+        llm.eval(self.tokens)
+        self.eval_time = time.time() - start_time
+        self._state = llm.save_state()
+        logger.info("[LLM] Префикс промпта вычислен и сохранен "
+                    "(%d токенов, %.2fс)", len(self.tokens), self.eval_time)
+
+    @classmethod
+    def for_model(cls, llm: Llama, prefix: str) -> "PromptPrefixCache":
+        """
+        Возвращает кэш префикса для экземпляра модели, создавая его при
+        первом обращении. Кэш живет, пока жив экземпляр модели.
+
+        :param llm: Загруженная модель LLM
+        :param prefix: Общий префикс промпта (шаблон)
+        :return: Кэш префикса
+        """
+        caches = _prefix_caches.setdefault(llm, {})
+        if prefix not in caches:
+            caches[prefix] = cls(llm, prefix)
+        return caches[prefix]
+
+    def prepare(self, llm: Llama) -> Tuple[bool, float]:
+        """
+        Готовит модель к промпту, начинающемуся с сохраненного префикса.
+
+        :param llm: Модель, для которой был вычислен префикс
+        :return: Кортеж (было ли восстановлено состояние,
+            сэкономленное время вычисления промпта в секундах)
+        """
+        prefix_len = len(self.tokens)
+        if (llm.n_tokens >= prefix_len
+                and list(llm.input_ids[:prefix_len]) == self.tokens):
+            return False, self.eval_time
+
+        start_time = time.time()
+        llm.load_state(self._state)
+        restore_time = time.time() - start_time
+        return True, max(0.0, self.eval_time - restore_time)
+
+
+class CountingPromptLookupDecoding(LlamaPromptLookupDecoding):
+    """
+    Черновые токены поиском n-грамм в промпте со статистикой принятия.
+
+    llama-cpp вызывает черновую модель после каждой проверки пакета
+    токенов, передавая принятые к этому моменту токены. Число принятых
+    черновых токенов предыдущего шага определяется по совпадению
+    черновика с тем, что модель фактически сгенерировала; последний
+    шаг генерации не учитывается, поэтому доля принятых — оценка снизу.
+    """
+
+    def __init__(self, max_ngram_size: int = 2, num_pred_tokens: int = 10):
+        super().__init__(max_ngram_size, num_pred_tokens)
+        self.drafted = 0
+        self.accepted = 0
+        self._last_draft: npt.NDArray[np.intc] = np.array([], np.intc)
+        self._last_length = 0
+
+    def reset_stats(self) -> None:
+        """Сбрасывает статистику перед новым запросом к модели."""
+        self.drafted = 0
+        self.accepted = 0
+        self._last_draft = np.array([], np.intc)
+        self._last_length = 0
+
+    def __call__(
+        self, input_ids: npt.NDArray[np.intc], /, **kwargs: Any
+    ) -> npt.NDArray[np.intc]:
+        if len(self._last_draft) and len(input_ids) > self._last_length:
+            actual = input_ids[
+                self._last_length:self._last_length + len(self._last_draft)
+            ]
+            matched = actual == self._last_draft[:len(actual)]
+            self.accepted += (
+                len(actual) if matched.all() else int(np.argmin(matched))
+            )
+        draft = super().__call__(input_ids, **kwargs)
+        self.drafted += len(draft)
+        self._last_draft = draft
+        self._last_length = len(input_ids)
+        return draft
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает число черновых и принятых токенов запроса."""
+        return {
+            "draft_tokens": self.drafted,
+            "accepted_tokens": self.accepted,
+        }
+
+
+def draft_model_of(llm: Llama) -> Optional[CountingPromptLookupDecoding]:
+    """Возвращает черновую модель экземпляра, если она со статистикой."""
+    draft = getattr(llm, "draft_model", None)
+    if isinstance(draft, CountingPromptLookupDecoding):
+        return draft
+    return None
+
+
+def reset_timings(llm: Llama) -> None:
+    """Сбрасывает счетчики времени llama.cpp перед новым запросом."""
+    if isinstance(llm, Llama):
+        llama_cpp.llama_perf_context_reset(llm.ctx)
+
+
+def llm_timings(llm: Llama) -> Optional[Dict[str, float]]:
+    """
+    Возвращает время вычисления промпта и генерации по счетчикам llama.cpp.
+
+    Счетчики накапливаются с последнего ``reset_timings``; в число
+    вычисленных токенов промпта не входит переиспользованный префикс.
+
+    :param llm: Модель llama-cpp
+    :return: Словарь ``prompt_eval_time``, ``generation_time`` (секунды)
+        и ``prompt_eval_tokens`` или None, если это не модель llama-cpp
+    """
+    if not isinstance(llm, Llama):
+        return None
+    data = llama_cpp.llama_perf_context(llm.ctx)
+    return {
+        "prompt_eval_time": round(data.t_p_eval_ms / 1000, 3),
+        "generation_time": round(data.t_eval_ms / 1000, 3),
+        "prompt_eval_tokens": data.n_p_eval,
+    }
+
+
+def load_llm_model(
+    model_path: str,
+    runtime: RuntimeProfile,
+    n_gpu_layers: Optional[int] = None,
+    draft_tokens: int = 0,
+    vocab_only: bool = False
+) -> Tuple[Llama, int]:
+    """
+    Загружает LLM модель с попытками использования GPU.
+
+    Если ``n_gpu_layers`` задан, пробуем только это значение; иначе
+    перебираем ``GPU_LAYERS_ATTEMPTS``. Сборки llama.cpp без поддержки
+    GPU сразу загружаются на CPU без заведомо неудачных попыток. При
+    ``vocab_only`` загружается только словарь модели (без весов): такой
+    экземпляр годится для токенизации, но не для генерации, поэтому
+    GPU и черновая модель ему не нужны.
+
+    :param model_path: Путь к модели
+    :param runtime: Потоки, размер пакета и закрепление памяти
+    :param n_gpu_layers: Заранее известное рабочее число GPU слоев
+    :param draft_tokens: Число черновых токенов спекулятивного
+        декодирования поиском по промпту (0 — отключено)
+    :param vocab_only: Загрузить только словарь для токенизации
+    :return: Кортеж (загруженная модель Llama, число GPU слоев)
+    """
+    if vocab_only:
+        attempts: Tuple[int, ...] = (0,)
+        draft_tokens = 0
+    elif n_gpu_layers is not None:
+        attempts = (n_gpu_layers,)
+    elif not _gpu_offload_supported():
+        attempts = (0,)
+    else:
+        attempts = GPU_LAYERS_ATTEMPTS
+
+    last_error: Optional[Exception] = None
+    with redirect_stderr(StringIO()):
+        for layers in attempts:
+            if layers == 0 and len(attempts) > 1:
+                logger.info("[LLM] Используем только CPU")
+            try:
+                llm = Llama(
+                    model_path=model_path,
+                    n_ctx=N_CTX,
+                    n_threads=runtime.n_threads,
+                    n_threads_batch=runtime.n_threads_batch,
+                    n_batch=runtime.n_batch,
+                    n_gpu_layers=layers,
+                    use_mmap=True,
+                    use_mlock=runtime.use_mlock,
+                    vocab_only=vocab_only,
+                    verbose=False,
+                    # С черновой моделью llama-cpp хранит логиты всех
+                    # позиций, но размер буфера берет из logits_all
+                    logits_all=draft_tokens > 0,
+                    draft_model=_make_draft_model(draft_tokens)
+                )
+            except (RuntimeError, OSError, ValueError) as e:
+                last_error = e
+                logger.warning("[LLM] Не удалось загрузить модель с %d GPU "
+                               "слоями (%s), пробуем с меньшим количеством "
+                               "слоев...", layers, e)
+                continue
+            if vocab_only:
+                logger.info("[LLM] Загружен словарь модели для токенизации")
+            else:
+                logger.info("[LLM] Модель Mistral загружена (GPU слоев: %d)",
+                            layers)
+            return llm, layers
+
+    raise RuntimeError(
+        f"Не удалось загрузить модель {model_path}: {last_error}"
+    )
+
+
+def _make_draft_model(
+    draft_tokens: int
+) -> Optional[CountingPromptLookupDecoding]:
+    """Создает черновую модель для экземпляра Llama, если она включена."""
+    if draft_tokens <= 0:
+        return None
+    return CountingPromptLookupDecoding(
+        max_ngram_size=DRAFT_NGRAM_SIZE, num_pred_tokens=draft_tokens
+    )
+
+
+# Модель процесса пула; загружается инициализатором процесса
+_worker_state: Dict[str, Llama] = {}
+
+
+def _init_worker(
+    model_path: str,
+    runtime: RuntimeProfile,
+    draft_tokens: int,
+    log_level: int = logging.INFO
+) -> None:
+    """
+    Загружает модель в процессе пула при его запуске.
+
+    Процесс запускается через spawn и не наследует настройку логирования,
+    поэтому уровень ``log_level`` передается из процесса приложения.
+    """
+    logging.basicConfig(level=log_level, format=LOG_FORMAT)
+    _worker_state["llm"], _ = load_llm_model(
+        model_path, runtime, draft_tokens=draft_tokens
+    )
+
+
+def _worker_pid() -> int:
+    """Возвращает PID процесса пула (для прогрева пула)."""
+    return os.getpid()
+
+
+def worker_llm() -> Llama:
+    """
+    Возвращает модель текущего процесса пула.
+
+    Вызывается из функций, выполняемых в ``LlmWorkerPool``.
+    """
+    if "llm" not in _worker_state:
+        raise RuntimeError("Модель процесса пула не загружена")
+    return _worker_state["llm"]
+
+
+class LlmWorkerPool:
+    """
+    Пул процессов, в каждом из которых загружен свой экземпляр модели.
+
+    llama.cpp плохо масштабируется на одном экземпляре с большим числом
+    потоков, поэтому ядра делятся между ``workers`` процессами с
+    параметрами ``runtime``. Все процессы открывают один GGUF файл через
+    mmap (``use_mmap=True``), так что веса хранятся в страничном кэше
+    один раз; отдельными у процессов остаются только контекст и KV кэш.
+    Задачи выполняются функциями уровня модуля, которые берут модель
+    процесса через ``worker_llm()``.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        workers: int,
+        runtime: RuntimeProfile,
+        draft_tokens: int = 0
+    ):
+        self.model_path = model_path
+        self.workers = workers
+        self.runtime = runtime
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                model_path, runtime, draft_tokens,
+                logging.getLogger().getEffectiveLevel()
+            )
+        )
+
+    def warm_up(self) -> int:
+        """
+        Запускает процессы пула и дожидается загрузки моделей в них.
+
+        :return: Количество запущенных процессов
+        """
+        futures = [
+            self._executor.submit(_worker_pid) for _ in range(self.workers)
+        ]
+        wait(futures)
+        return len({future.result() for future in futures})
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """
+        Ставит вызов ``fn(*args)`` в очередь пула.
+
+        :param fn: Функция уровня модуля (передается в процесс по имени)
+        :return: Future с результатом вызова
+        """
+        return self._executor.submit(fn, *args)
+
+    def shutdown(self) -> None:
+        """Останавливает процессы пула, отменяя ожидающие задачи."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _gpu_offload_supported() -> bool:
+    """Проверяет, собрана ли llama.cpp с поддержкой выгрузки на GPU."""
+    # pylint: disable=import-outside-toplevel
+    try:
+        from llama_cpp import llama_supports_gpu_offload
+    except ImportError:
+        return True
+    return bool(llama_supports_gpu_offload())
+
+
+class LlamaModelManager:  # pylint: disable=too-many-instance-attributes
+    """
+    Держит модель LLM загруженной в памяти процесса.
+
+    Модель загружается один раз (при старте приложения или при первом
+    обращении) и переиспользуется всеми запросами. Рабочее значение
+    ``n_gpu_layers`` запоминается, поэтому повторная загрузка (например,
+    после смены пути к модели) не повторяет неудачные попытки с GPU.
+    Экземпляр ``Llama`` не потокобезопасен, поэтому доступ к нему
+    выдается через ``acquire()`` под блокировкой.
+
+    При ``workers > 1`` вместе с моделью запускается ``LlmWorkerPool``:
+    генерация выполняется в процессах пула (по ``cpu_count // workers``
+    потоков на процесс), а в процессе приложения загружается только
+    словарь модели (``vocab_only``) для токенизации. При
+    ``draft_tokens > 0`` каждый экземпляр модели использует
+    спекулятивное декодирование поиском по промпту.
+    Потоки, размер пакета и закрепление памяти берутся из ``profile``
+    (см. ``runtime()``); ``cpu_count`` по умолчанию учитывает квоту CPU
+    контейнера. Чанки одновременно обрабатываемых документов получают
+    модель через ``scheduler``, у которого столько мест, сколько
+    экземпляров модели.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        model_path: Optional[str] = None,
+        cpu_count: Optional[int] = None,
+        workers: int = 1,
+        draft_tokens: int = 0,
+        profile: Optional[RuntimeProfile] = None
+    ):
+        self.model_path = model_path or DEFAULT_MODEL_PATH
+        self.cpu_count = cpu_count or available_cpus()
+        self.workers = max(1, workers)
+        self.draft_tokens = max(0, draft_tokens)
+        self.profile = profile
+        self.pool: Optional[LlmWorkerPool] = None
+        self.n_gpu_layers: Optional[int] = None
+        self.load_time: Optional[float] = None
+        self.load_error: Optional[str] = None
+        self._llm: Optional[Llama] = None
+        self._loaded_path: Optional[str] = None
+        self._load_lock = threading.Lock()
+        self._inference_lock = threading.Lock()
+        self._working_gpu_layers: Dict[str, int] = {}
+        self.scheduler = ChunkScheduler(policy=SCHEDULER_POLICY)
+
+    def runtime(self, workers: int = 1) -> RuntimeProfile:
+        """
+        Возвращает параметры одного экземпляра модели.
+
+        :param workers: Число одновременно работающих экземпляров
+        :return: Профиль калибровки, пересчитанный на ``workers``
+            экземпляров, или профиль по умолчанию
+        """
+        if self.profile is None:
+            return RuntimeProfile.default(self.cpu_count, workers)
+        return self.profile.scaled(workers, self.cpu_count)
+
+    @property
+    def is_ready(self) -> bool:
+        """Возвращает True, если модель загружена и готова к работе."""
+        return self._llm is not None
+
+    def load(self, model_path: Optional[str] = None) -> Llama:
+        """
+        Загружает модель, если она еще не загружена.
+
+        :param model_path: Путь к модели (по умолчанию ``self.model_path``)
+        :return: Загруженная модель Llama
+        """
+        path = model_path or self.model_path
+        with self._load_lock:
+            if self._llm is not None and self._loaded_path == path:
+                return self._llm
+
+            if not os.path.exists(path):
+                self.load_error = f"Модель не найдена по пути: {path}"
+                raise FileNotFoundError(self.load_error)
+
+            logger.info("[LLM] Загрузка модели...")
+            start_time = time.time()
+            self._llm = None
+            # В режиме пула генерация идет в процессах пула, поэтому
+            # веса модели в процессе приложения не нужны
+            vocab_only = self.workers >= 2
+            llm, layers = load_llm_model(
+                path,
+                self.runtime(),
+                self._working_gpu_layers.get(path),
+                self.draft_tokens,
+                vocab_only=vocab_only
+            )
+            if not vocab_only:
+                self._working_gpu_layers[path] = layers
+            self._start_pool(path)
+            self._llm = llm
+            self._loaded_path = path
+            self.n_gpu_layers = layers
+            self.load_time = time.time() - start_time
+            self.load_error = None
+            MODEL_LOAD_SECONDS.observe(self.load_time)
+            logger.info("[LLM] Модель загружена за %.1fс", self.load_time)
+            return llm
+
+    def _start_pool(self, path: str) -> None:
+        """Перезапускает пул процессов модели, если он включен."""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+            self.scheduler.resize(1)
+        if self.workers < 2:
+            return
+        runtime = self.runtime(self.workers)
+        logger.info("[LLM] Запуск пула моделей: %d процессов по %d потоков",
+                    self.workers, runtime.n_threads)
+        pool = LlmWorkerPool(
+            path, self.workers, runtime, self.draft_tokens
+        )
+        try:
+            started = pool.warm_up()
+        except RuntimeError:
+            pool.shutdown()
+            raise
+        logger.info("[LLM] Пул моделей готов (процессов: %d)", started)
+        self.pool = pool
+        self.scheduler.resize(self.workers)
+
+    def try_load(self) -> bool:
+        """
+        Загружает модель, сохраняя ошибку вместо выбрасывания исключения.
+
+        Используется фоновой загрузкой при старте приложения.
+
+        :return: True, если модель успешно загружена
+        """
+        try:
+            self.load()
+        except (FileNotFoundError, RuntimeError) as e:
+            self.load_error = str(e)
+            logger.error("[LLM] Ошибка загрузки модели: %s", e)
+            return False
+        return True
+
+    @contextmanager
+    def acquire(
+        self,
+        model_path: Optional[str] = None,
+        exclusive: bool = True
+    ) -> Iterator[Llama]:
+        """
+        Выдает загруженную модель для монопольного использования.
+
+        :param model_path: Путь к модели (по умолчанию ``self.model_path``)
+        :param exclusive: False — выдать модель без блокировки; допустимо,
+            только если модель используется лишь для токенизации, а
+            генерация выполняется в пуле процессов или по очереди
+            планировщика ``scheduler``
+        :return: Контекстный менеджер с моделью Llama
+        """
+        llm = self.load(model_path)
+        if not exclusive:
+            yield llm
+            return
+        with self._inference_lock:
+            yield llm
+
+    def unload(self) -> None:
+        """Выгружает модель и останавливает пул процессов."""
+        with self._load_lock:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+                self.scheduler.resize(1)
+            self._llm = None
+            self._loaded_path = None
+
+
+def _profile_model_path(profile: Optional[RuntimeProfile]) -> Optional[str]:
+    """
+    Возвращает вариант модели из профиля, если путь не задан явно.
+
+    ``PATENT_MODEL_PATH`` имеет приоритет над выбором калибровки.
+    """
+    if profile is None or not profile.model_path:
+        return None
+    if "PATENT_MODEL_PATH" in os.environ:
+        return None
+    return profile.model_path
+
+
+RUNTIME_PROFILE = load_profile(RUNTIME_PROFILE_PATH)
+
+model_manager = LlamaModelManager(
+    model_path=_profile_model_path(RUNTIME_PROFILE),
+    workers=LLM_WORKERS,
+    draft_tokens=LLM_DRAFT_TOKENS,
+    profile=RUNTIME_PROFILE
+)
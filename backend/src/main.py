@@ -1,13 +1,129 @@
 """Patent API module for patent management and processing."""
+import asyncio
+import functools
+import json
+import logging
 import os
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Header, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
+from .batch import run_pipeline
+from .jobs import (
+    EVENT_CANCELLED,
+    EVENT_DONE,
+    EVENT_FAILED,
+    Job,
+    JobError,
+    JobQueue,
+    QueueFullError
+)
+from .llm_model import LOG_FORMAT
+from .metrics import JOBS_RUNNING, QUEUE_DEPTH, render as render_metrics
+from .pdf_pages import extract_text_from_pdf
 from .pdf_text_extractor import (
-    extract_text_from_pdf,
-    extract_alloy_info_from_text
+    ExtractionSettings,
+    extract_alloy_info_from_text,
+    model_manager
+)
+from .properties import parse_properties
+from .prompts import PROMPT_VERSION
+from .result_cache import ResultCache, result_key
+from .sections import section_kinds
+from .uploads import UploadError, is_zip_upload, spool_upload, unpack_pdfs
+
+# Уровень логирования (DEBUG выводит ответы модели по каждому чанку)
+LOG_LEVEL = os.environ.get("PATENT_LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# Количество фоновых обработчиков и максимальная длина очереди задач.
+# Модель между задачами делит планировщик чанков, поэтому несколько
+# обработчиков позволяют коротким патентам не ждать длинные
+JOB_WORKERS = int(os.environ.get("PATENT_JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.environ.get("PATENT_JOB_QUEUE_SIZE", "16"))
+
+# Максимальное число чанков одного патента, одновременно обрабатываемых
+# пулом моделей (0 — без ограничения)
+JOB_MAX_SLOTS = int(os.environ.get("PATENT_JOB_MAX_SLOTS", "0"))
+
+# Количество процессов для параллельного извлечения текста из PDF
+PDF_WORKERS = int(os.environ.get("PATENT_PDF_WORKERS", "1"))
+
+# Параметры извлечения информации о сплавах
+EXTRACTION_SETTINGS = ExtractionSettings(
+    token_chunking=os.environ.get("PATENT_TOKEN_CHUNKING", "1") == "1",
+    context_share=float(os.environ.get("PATENT_CONTEXT_SHARE", "0.9")),
+    prefix_cache=os.environ.get("PATENT_PREFIX_CACHE", "1") == "1",
+    relevance_threshold=float(
+        os.environ.get("PATENT_RELEVANCE_THRESHOLD", "3.0")
+    ),
+    dedup_threshold=float(os.environ.get("PATENT_DEDUP_THRESHOLD", "0.8")),
+    fast_path=os.environ.get("PATENT_FAST_PATH", "1") == "1",
+    structured_output=os.environ.get("PATENT_STRUCTURED_OUTPUT", "0") == "1",
+    sections=os.environ.get("PATENT_SECTIONS", "1") == "1",
+    section_order=section_kinds(os.environ.get("PATENT_SECTION_ORDER", "")),
+    skip_sections=section_kinds(os.environ.get("PATENT_SKIP_SECTIONS", "")),
+    property_budget=int(os.environ.get("PATENT_PROPERTY_BUDGET", "0")),
+)
+
+# Максимальный размер загружаемого PDF и каталог временных файлов
+MAX_UPLOAD_BYTES = int(os.environ.get("PATENT_MAX_UPLOAD_MB", "100")) * 2 ** 20
+SPOOL_DIR = os.environ.get("PATENT_SPOOL_DIR") or None
+
+# Максимальное число PDF в одном пакете и число файлов пакета, текст
+# которых извлекается заранее, пока LLM обрабатывает предыдущие
+MAX_BATCH_FILES = int(os.environ.get("PATENT_MAX_BATCH_FILES", "500"))
+# Максимальный размер ZIP архива пакета и суммарный размер распакованных
+# из него PDF
+MAX_BATCH_BYTES = (
+    int(os.environ.get("PATENT_MAX_BATCH_MB", "1024")) * 2 ** 20
 )
+BATCH_PREFETCH = int(os.environ.get("PATENT_BATCH_PREFETCH", "2"))
+
+# Кэш результатов; пустой PATENT_CACHE_PATH отключает кэширование
+CACHE_PATH = os.environ.get(
+    "PATENT_CACHE_PATH",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "cache", "results.sqlite3"
+    )
+)
+CACHE_MAX_BYTES = int(os.environ.get("PATENT_CACHE_MAX_MB", "512")) * 2 ** 20
+
+# Интервал, после которого поток событий отправляет комментарий-пинг,
+# чтобы прокси не закрывали простаивающее соединение
+EVENTS_KEEPALIVE = float(os.environ.get("PATENT_EVENTS_KEEPALIVE", "15"))
+
+# Кэш результатов открывается при запуске приложения (см. ``lifespan``),
+# а не при импорте модуля, чтобы импорт не создавал файл базы
+result_cache: Optional[ResultCache] = None  # pylint: disable=invalid-name
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Загружает модель LLM в фоне и запускает обработчики очереди задач.
+
+    Загрузка не блокирует запуск сервера: пока модель не готова,
+    ``GET /ready`` отвечает 503. Здесь же открывается кэш результатов.
+    """
+    global result_cache  # pylint: disable=global-statement
+    if CACHE_PATH:
+        result_cache = await asyncio.to_thread(
+            ResultCache, CACHE_PATH, CACHE_MAX_BYTES
+        )
+    loader = asyncio.create_task(asyncio.to_thread(model_manager.try_load))
+    job_queue.start()
+    yield
+    await loader
+    await asyncio.to_thread(job_queue.shutdown)
+    model_manager.unload()
+
 
 app = FastAPI(
     title="Patent API",
@@ -15,6 +131,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Configure CORS to allow requests from Angular frontend
@@ -34,64 +151,631 @@ async def root():
     return {"message": "Hello World"}
 
 
-@app.post("/patent")
-async def upload_patent(file: UploadFile = File(...)):
+@app.get("/ready")
+async def ready():
     """
-    Загрузка PDF файла для обработки патента.
+    Проверка готовности: модель LLM загружена и готова к обработке.
 
-    Аргументы:
-        file: PDF файл для загрузки
+    Возвращает 503, пока модель загружается или если загрузка не удалась.
+    """
+    if model_manager.is_ready:
+        return {
+            "status": "ready",
+            "model_path": model_manager.model_path,
+            "n_gpu_layers": model_manager.n_gpu_layers,
+            "load_time": model_manager.load_time,
+            "runtime": {
+                key: value
+                for key, value in asdict(model_manager.runtime()).items()
+                if key in ("n_threads", "n_threads_batch", "n_batch",
+                           "use_mlock")
+            },
+        }
+    if model_manager.load_error:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "error", "detail": model_manager.load_error}
+        )
+    return JSONResponse(status_code=503, content={"status": "loading"})
 
-    Возвращает:
-        Результат обработки PDF
+
+def _document_text(
+    file_location: str,
+    doc_hash: str,
+    on_page: Optional[Callable[[int, int], None]] = None
+) -> Tuple[str, Dict[str, Any], bool]:
     """
-    # Сохранение загруженного файла временно
-    file_location = f"/tmp/{file.filename}"
-    try:
-        with open(file_location, "wb") as f:
-            content = await file.read()
-            f.write(content)
-    except (IOError, OSError) as e:
-        raise HTTPException(
-            status_code=500, detail=f"Ошибка при сохранении файла: {str(e)}"
-        ) from e
+    Возвращает текст документа из кэша или извлекает его из PDF.
+
+    Текст кэшируется по страницам: из PDF извлекаются только страницы,
+    которых нет в кэше. С быстрым путем страницы, извлеченные без
+    разбора таблиц составов, извлекаются заново.
+
+    :return: Кортеж (текст, метаданные, текст взят из кэша)
+    """
+    tables = EXTRACTION_SETTINGS.fast_path
+    if result_cache:
+        cached_text = result_cache.get_text(doc_hash, tables)
+        if cached_text is not None:
+            return cached_text[0], cached_text[1], True
+    extracted_text, metadata = extract_text_from_pdf(
+        file_location,
+        workers=PDF_WORKERS,
+        on_page=on_page,
+        tables=tables,
+        page_cache=(
+            result_cache.pages(doc_hash, tables) if result_cache else None
+        )
+    )
+    return extracted_text, metadata, False
+
+
+def _document_alloy_info(
+    extracted_text: str,
+    payload: Dict[str, Any],
+    llm_report: Dict[str, Any],
+    job: Job,
+    on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None
+) -> str:
+    """
+    Извлекает информацию о сплавах и сохраняет ее в кэш результатов.
+
+    Чанки документа получают модель через планировщик с приоритетом
+    задачи ``job``; отмена задачи отменяет еще не запущенные чанки.
+    """
+    with model_manager.scheduler.session(
+        payload.get("filename", job.filename), job.priority, JOB_MAX_SLOTS
+    ) as session:
+        job.on_cancel(session.cancel)
+        alloy_info = extract_alloy_info_from_text(
+            extracted_text,
+            settings=EXTRACTION_SETTINGS,
+            report=llm_report,
+            on_event=on_event,
+            cache=result_cache,
+            session=session
+        )
+    if result_cache:
+        result_cache.put_result(
+            payload["cache_key"], payload["doc_hash"], alloy_info
+        )
+    return alloy_info
+
 
-    # Извлечение текста из PDF
+def process_patent_job(job: Job) -> Dict[str, Any]:
+    """
+    Обрабатывает патент из очереди: извлекает текст и информацию о сплавах.
+
+    Выполняется в фоновом потоке ``job_queue``. Временный файл удаляется
+    после обработки в любом случае.
+
+    :param job: Задача с путем к сохраненному PDF в ``payload``
+    :return: Результат обработки PDF
+    :raises CancelledError: Если задача отменена
+    """
+    file_location = job.payload["file_location"]
     try:
-        print(f"[PDF] Начало обработки файла: {file.filename}", flush=True)
-        extracted_text, metadata = extract_text_from_pdf(file_location)
+        logger.info("[PDF] Начало обработки файла: %s", job.filename)
+        with job.stage_timer("extract_text"):
+            extracted_text, metadata, cached = _document_text(
+                file_location,
+                job.payload["doc_hash"],
+                on_page=lambda page, pages: job.emit(
+                    "page", {"page": page, "pages": pages}
+                )
+            )
         pages = metadata.get('pages', 'N/A')
         chars = len(extracted_text)
-        print(f"[PDF] Текст извлечен. Страниц: {pages}, "
-              f"Символов: {chars}", flush=True)
+        logger.info("[PDF] Текст извлечен. Страниц: %s, Символов: %d",
+                    pages, chars)
+        job.emit("text", {
+            "pages": metadata.get("pages"),
+            "chars": chars,
+            "cached": cached,
+        })
 
         # Извлечение информации об сплавах из текста патента
-        print("[PDF] Начало извлечения информации об сплавах...", flush=True)
-        alloy_info = extract_alloy_info_from_text(extracted_text)
-        print("[PDF] Извлечение информации об сплавах завершено", flush=True)
+        job.check_cancelled()
+        logger.info("[PDF] Начало извлечения информации об сплавах...")
+        llm_report: Dict[str, Any] = {}
+        with job.stage_timer("extract_alloy_info"):
+            alloy_info = _document_alloy_info(
+                extracted_text, job.payload, llm_report, job,
+                on_event=job.emit
+            )
+        logger.info("[PDF] Извлечение информации об сплавах завершено")
+    except ValueError as e:
+        raise JobError(str(e), status_code=400) from e
+    except (FileNotFoundError, OSError) as e:
+        raise JobError(
+            f"Произошла ошибка при обработке PDF: {str(e)}", status_code=500
+        ) from e
+    finally:
         # Удаляем временный файл после обработки
         if os.path.exists(file_location):
             os.remove(file_location)
+
+    response = _processed_response(extracted_text, metadata, alloy_info)
+    response["llm_report"] = llm_report
+    return response
+
+
+def _remove_batch_files(files: List[Dict[str, Any]]) -> None:
+    """Удаляет временные файлы пакета, которые еще не обработаны."""
+    for item in files:
+        location = item.get("file_location")
+        if location and os.path.exists(location):
+            os.remove(location)
+
+
+def discard_patent_job(job: Job) -> None:
+    """Удаляет временный файл патента, задача которого отменена в очереди."""
+    _remove_batch_files([job.payload])
+
+
+def discard_batch_job(job: Job) -> None:
+    """Удаляет временные файлы пакета, задача которого отменена в очереди."""
+    _remove_batch_files(job.payload["files"])
+
+
+def process_batch_job(job: Job) -> Dict[str, Any]:
+    """
+    Обрабатывает пакет патентов одним конвейером.
+
+    Текст следующих файлов извлекается, пока LLM обрабатывает текущие;
+    LLM одновременно обрабатывает столько файлов, сколько процессов в
+    пуле модели, так что чанки разных файлов занимают все процессы.
+    Результат каждого файла отправляется событием ``file`` сразу после
+    готовности. Файлы, отклоненные при загрузке, и файлы с ошибкой
+    обработки получают статус ``failed``, остальные файлы пакета
+    обрабатываются дальше. При отмене задачи оставшиеся файлы не
+    обрабатываются.
+
+    :param job: Задача со списком файлов пакета в ``payload["files"]``
+    :return: Результаты файлов в порядке загрузки
+    :raises CancelledError: Если задача отменена
+    """
+    files: List[Dict[str, Any]] = job.payload["files"]
+    job.emit("files", {"total": len(files)})
+
+    def extract(index: int) -> Tuple[str, Dict[str, Any], Optional[str]]:
+        item = files[index]
+        job.check_cancelled()
+        if "error" in item:
+            raise JobError(item["error"], status_code=item["error_code"])
+        try:
+            cached = None
+            if result_cache:
+                cached = result_cache.lookup(
+                    item["doc_hash"], item["cache_key"],
+                    EXTRACTION_SETTINGS.fast_path
+                )
+            if cached is not None:
+                return cached
+            extracted_text, metadata, _ = _document_text(
+                item["file_location"], item["doc_hash"]
+            )
+            return extracted_text, metadata, None
+        finally:
+            _remove_batch_files([item])
+
+    def process(
+        index: int,
+        extracted: Tuple[str, Dict[str, Any], Optional[str]]
+    ) -> Dict[str, Any]:
+        extracted_text, metadata, alloy_info = extracted
+        llm_report: Dict[str, Any] = {}
+        cached = alloy_info is not None
+        if alloy_info is None:
+            job.check_cancelled()
+            alloy_info = _document_alloy_info(
+                extracted_text, files[index], llm_report, job
+            )
+        response = _processed_response(extracted_text, metadata, alloy_info)
+        response.update(
+            filename=files[index]["filename"],
+            cached=cached,
+            llm_report=llm_report
+        )
+        return response
+
+    try:
+        with job.stage_timer("batch"):
+            results = run_pipeline(
+                [item["filename"] for item in files],
+                extract,
+                process,
+                on_result=lambda index, result: job.emit(
+                    "file", {"index": index, **result}
+                ),
+                workers=model_manager.workers,
+                prefetch=BATCH_PREFETCH
+            )
+    finally:
+        _remove_batch_files(files)
+    job.check_cancelled()
+
+    failed = sum(1 for result in results if result["status"] == "failed")
+    return {
+        "message": "Пакет файлов обработан",
+        "status": "processed",
+        "processed": len(results) - failed,
+        "failed": failed,
+        "files": results,
+    }
+
+
+def _processed_response(
+    extracted_text: str,
+    metadata: Dict[str, Any],
+    alloy_info: str
+) -> Dict[str, Any]:
+    """
+    Формирует результат обработки патента.
+
+    ``alloy_properties`` — те же данные, что и в ``alloy_info``, в виде
+    списка ``{property, value, unit}``.
+    """
+    return {
+        "message": "Файл патента успешно получен и обработан",
+        "status": "processed",
+        "extracted_text": extracted_text,
+        "metadata": metadata,
+        "alloy_info": alloy_info,
+        "alloy_properties": parse_properties(alloy_info)
+    }
+
+
+def _cache_key(doc_hash: str) -> str:
+    """Строит ключ кэша результата для текущих настроек обработки."""
+    return result_key(
+        doc_hash,
+        model_manager.model_path,
+        PROMPT_VERSION,
+        EXTRACTION_SETTINGS.cache_options()
+    )
+
+
+job_queue = JobQueue(
+    process_patent_job,
+    workers=JOB_WORKERS,
+    max_queued=JOB_QUEUE_SIZE
+)
+QUEUE_DEPTH.set_function(lambda: job_queue.depth)
+JOBS_RUNNING.set_function(lambda: job_queue.running)
+
+
+@app.post("/patent", status_code=202)
+async def upload_patent(file: UploadFile = File(...), priority: int = 0):
+    """
+    Загрузка PDF файла и постановка его в очередь на обработку.
+
+    Файл потоково сохраняется во временный файл с уникальным именем;
+    файлы без сигнатуры PDF (400) и больше ``PATENT_MAX_UPLOAD_MB``
+    (413) отклоняются сразу. Обработка выполняется в фоне; статус и
+    результат доступны через ``GET /jobs/{job_id}``. Если этот же PDF
+    уже обрабатывался с теми же настройками, результат берется из кэша
+    и задача сразу завершена.
+
+    Аргументы:
+        file: PDF файл для загрузки
+        priority: Приоритет обработки (чанки задач с большим приоритетом
+            получают модель первыми)
+
+    Возвращает:
+        Идентификатор задачи и текущую глубину очереди
+    """
+    try:
+        upload = await spool_upload(file, MAX_UPLOAD_BYTES, SPOOL_DIR)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e)) from e
+    except OSError as e:
+        raise HTTPException(
+            status_code=500, detail=f"Ошибка при сохранении файла: {str(e)}"
+        ) from e
+    doc_hash = upload.doc_hash
+    cache_key = _cache_key(doc_hash)
+
+    cached = None
+    if result_cache:
+        cached = await asyncio.to_thread(
+            result_cache.lookup, doc_hash, cache_key,
+            EXTRACTION_SETTINGS.fast_path
+        )
+    if cached is not None:
+        upload.remove()
+        job = job_queue.complete(file.filename, _processed_response(*cached))
         return {
-            "message": "Файл патента успешно получен и обработан",
-            "status": "processed",
-            "extracted_text": extracted_text,
-            "metadata": metadata,
-            "alloy_info": alloy_info
+            "message": "Результат обработки файла взят из кэша",
+            "job_id": job.job_id,
+            "status": job.status,
+            "queue_depth": job_queue.depth,
+            "cached": True,
+            "result": job.result,
         }
-    except ValueError as e:
-        # Удаляем временный файл при ошибке
-        if os.path.exists(file_location):
-            os.remove(file_location)
-        raise HTTPException(status_code=400, detail=str(e)) from e
-    except (FileNotFoundError, OSError) as e:
-        # Удаляем временный файл при ошибке
-        if os.path.exists(file_location):
-            os.remove(file_location)
+
+    try:
+        job = job_queue.submit(
+            file.filename,
+            {
+                "file_location": upload.path,
+                "doc_hash": doc_hash,
+                "cache_key": cache_key,
+            },
+            priority=priority,
+            on_discard=discard_patent_job
+        )
+    except QueueFullError as e:
+        upload.remove()
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": "30"}
+        ) from e
+
+    return {
+        "message": "Файл патента принят в обработку",
+        "job_id": job.job_id,
+        "status": job.status,
+        "queue_depth": job_queue.depth,
+        "cached": False,
+    }
+
+
+async def _spool_batch_file(file: UploadFile) -> List[Dict[str, Any]]:
+    """
+    Сохраняет файл пакета или распаковывает PDF из ZIP архива.
+
+    Отклоненный файл (не PDF, слишком большой, поврежденный архив) не
+    прерывает загрузку пакета, а попадает в пакет с ошибкой.
+
+    :param file: PDF файл или ZIP архив с PDF файлами
+    :return: Файлы пакета для ``process_batch_job``
+    """
+    try:
+        if is_zip_upload(file):
+            archive = await spool_upload(
+                file, MAX_BATCH_BYTES, SPOOL_DIR, archive=True
+            )
+            try:
+                unpacked = await asyncio.to_thread(
+                    unpack_pdfs, archive.path, MAX_UPLOAD_BYTES,
+                    MAX_BATCH_FILES, SPOOL_DIR, MAX_BATCH_BYTES
+                )
+            finally:
+                archive.remove()
+            unpacked = [
+                (f"{file.filename}/{name}", upload)
+                for name, upload in unpacked
+            ]
+        else:
+            unpacked = [(
+                file.filename or "",
+                await spool_upload(file, MAX_UPLOAD_BYTES, SPOOL_DIR)
+            )]
+    except UploadError as e:
+        return [{
+            "filename": file.filename,
+            "error": str(e),
+            "error_code": e.status_code,
+        }]
+    return [
+        {
+            "filename": name,
+            "file_location": upload.path,
+            "doc_hash": upload.doc_hash,
+            "cache_key": _cache_key(upload.doc_hash),
+        }
+        for name, upload in unpacked
+    ]
+
+
+@app.post("/patents/batch", status_code=202)
+async def upload_patent_batch(
+    files: List[UploadFile] = File(...),
+    priority: int = 0
+):
+    """
+    Загрузка пакета PDF файлов (или ZIP архивов с PDF) одной задачей.
+
+    Все файлы обрабатываются общим конвейером (см.
+    ``process_batch_job``); результат каждого файла приходит событием
+    ``file`` в ``GET /jobs/{job_id}/events`` по мере готовности, а
+    итоговый список — в результате задачи. Файлы, отклоненные при
+    загрузке, попадают в результат со статусом ``failed``.
+
+    Аргументы:
+        files: PDF файлы и ZIP архивы с PDF файлами
+        priority: Приоритет обработки файлов пакета
+
+    Возвращает:
+        Идентификатор задачи пакета и число принятых файлов
+    """
+    items: List[Dict[str, Any]] = []
+    try:
+        for file in files:
+            items.extend(await _spool_batch_file(file))
+            if len(items) > MAX_BATCH_FILES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"В пакете больше {MAX_BATCH_FILES} файлов"
+                )
+        job = job_queue.submit(
+            f"Пакет из {len(items)} файлов",
+            {"files": items},
+            handler=process_batch_job,
+            priority=priority,
+            on_discard=discard_batch_job
+        )
+    except HTTPException:
+        _remove_batch_files(items)
+        raise
+    except OSError as e:
+        _remove_batch_files(items)
         raise HTTPException(
-            status_code=500,
-            detail=f"Произошла ошибка при обработке PDF: {str(e)}"
+            status_code=500, detail=f"Ошибка при сохранении файла: {str(e)}"
         ) from e
+    except QueueFullError as e:
+        _remove_batch_files(items)
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": "30"}
+        ) from e
+
+    return {
+        "message": "Пакет файлов принят в обработку",
+        "job_id": job.job_id,
+        "status": job.status,
+        "queue_depth": job_queue.depth,
+        "files": len(items),
+        "rejected": sum(1 for item in items if "error" in item),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Возвращает метрики обработки в текстовом формате Prometheus."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/jobs")
+async def jobs_summary():
+    """Возвращает состояние очереди обработки и кэша результатов."""
+    cache_stats = None
+    if result_cache:
+        cache_stats = await asyncio.to_thread(result_cache.stats)
+    return {
+        "queue_depth": job_queue.depth,
+        "running": job_queue.running,
+        "workers": job_queue.workers,
+        "scheduler": model_manager.scheduler.stats(),
+        "cache": cache_stats,
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Возвращает статус задачи, время этапов и результат обработки.
+
+    Аргументы:
+        job_id: Идентификатор задачи, полученный от ``POST /patent``
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    response = job.to_dict()
+    response["queue_depth"] = job_queue.depth
+    return response
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Отменяет задачу: задача из очереди не запускается, у выполняемой
+    задачи не запускаются оставшиеся чанки (текущие доделываются).
+
+    Аргументы:
+        job_id: Идентификатор задачи, полученный от ``POST /patent``
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    if not job.cancel():
+        raise HTTPException(status_code=409, detail="Задача уже завершена")
+    return job.to_dict()
+
+
+def _format_event(event: Dict[str, Any]) -> str:
+    """Форматирует событие задачи в формате Server-Sent Events."""
+    data = json.dumps(event["data"], ensure_ascii=False)
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {data}\n\n"
+
+
+def _wake_stream(
+    loop: asyncio.AbstractEventLoop,
+    changed: asyncio.Event
+) -> None:
+    """Будит поток событий задачи из потока обработчика задачи."""
+    try:
+        loop.call_soon_threadsafe(changed.set)
+    except RuntimeError:
+        # Цикл уже закрыт (приложение остановлено)
+        pass
+
+
+async def _job_event_stream(
+    job: Job,
+    position: int,
+    cancel_on_disconnect: bool = False
+) -> AsyncIterator[str]:
+    """
+    Передает события задачи по мере их появления до ее завершения.
+
+    :param job: Задача, события которой передаются
+    :param position: Номер первого события для передачи
+    :param cancel_on_disconnect: Отменить задачу, если поток закрыт
+        (клиент отключился) до ее завершения
+    """
+    # Потоки задач сообщают о новых событиях через цикл asyncio, поэтому
+    # ожидающий клиент не занимает поток пула по умолчанию
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    listener = functools.partial(_wake_stream, loop, changed)
+    job.add_listener(listener)
+    try:
+        while True:
+            changed.clear()
+            events = job.events_after(position)
+            if not events:
+                try:
+                    await asyncio.wait_for(changed.wait(), EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                continue
+            for event in events:
+                yield _format_event(event)
+            position += len(events)
+            if events[-1]["event"] in (
+                EVENT_DONE, EVENT_FAILED, EVENT_CANCELLED
+            ):
+                return
+    finally:
+        job.remove_listener(listener)
+        if cancel_on_disconnect and job.cancel():
+            logger.info("[PDF] Клиент отключился, задача %s отменена",
+                        job.job_id)
+
+
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(
+    job_id: str,
+    last_event_id: int = Header(default=-1),
+    cancel_on_disconnect: bool = False
+):
+    """
+    Поток событий обработки задачи (Server-Sent Events).
+
+    События: ``stage`` (начало этапа), ``page`` (страница извлечена),
+    ``text`` (текст готов), ``chunks`` (число чанков), ``chunk_line``
+    (строка ответа модели по мере генерации), ``chunk`` (свойства
+    готового чанка), ``merge`` (начало сборки), ``done`` (итоговый
+    результат), ``failed`` (ошибка) или ``cancelled`` (задача
+    отменена). Поток завершается после ``done``, ``failed`` или
+    ``cancelled``; при переподключении заголовок ``Last-Event-ID``
+    позволяет продолжить с места обрыва.
+
+    Аргументы:
+        job_id: Идентификатор задачи, полученный от ``POST /patent``
+        cancel_on_disconnect: Отменить задачу, если клиент отключится
+            до ее завершения
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return StreamingResponse(
+        _job_event_stream(job, last_event_id + 1, cancel_on_disconnect),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+"""Module with Prometheus metrics of the patent processing pipeline."""
+from typing import Any, Dict, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    ProcessCollector,
+    generate_latest
+)
+
+# Отдельный реестр: метрики приложения и процесса без глобального
+# состояния prometheus_client
+REGISTRY = CollectorRegistry()
+ProcessCollector(registry=REGISTRY)
+
+_SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+_TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+PDF_PAGE_SECONDS = Histogram(
+    "patent_pdf_page_seconds",
+    "Время извлечения текста одной страницы PDF (без страниц из кэша)",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    registry=REGISTRY,
+)
+PDF_PAGES_CACHED = Counter(
+    "patent_pdf_pages_cached",
+    "Страницы PDF, взятые из кэша страниц без разбора",
+    registry=REGISTRY,
+)
+MODEL_LOAD_SECONDS = Histogram(
+    "patent_model_load_seconds",
+    "Время загрузки модели LLM",
+    buckets=_SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+CHUNK_SECONDS = Histogram(
+    "patent_chunk_seconds",
+    "Время обработки чанка моделью",
+    buckets=_SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+CHUNK_PROMPT_EVAL_SECONDS = Histogram(
+    "patent_chunk_prompt_eval_seconds",
+    "Время вычисления промпта чанка",
+    buckets=_SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+CHUNK_GENERATION_SECONDS = Histogram(
+    "patent_chunk_generation_seconds",
+    "Время генерации ответа по чанку",
+    buckets=_SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+CHUNK_TOKENS = Histogram(
+    "patent_chunk_tokens",
+    "Число токенов промпта (in) и ответа (out) чанка",
+    ["direction"],
+    buckets=_TOKEN_BUCKETS,
+    registry=REGISTRY,
+)
+CHUNK_WAIT_SECONDS = Histogram(
+    "patent_chunk_wait_seconds",
+    "Время ожидания чанка в планировщике до запуска в модели",
+    buckets=_SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+MERGE_SECONDS = Histogram(
+    "patent_merge_seconds",
+    "Время сборки финального ответа",
+    buckets=_SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+STAGE_SECONDS = Histogram(
+    "patent_job_stage_seconds",
+    "Время этапов обработки задачи",
+    ["stage"],
+    buckets=_SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+JOBS_FINISHED = Counter(
+    "patent_jobs_finished",
+    "Число завершенных задач по статусу",
+    ["status"],
+    registry=REGISTRY,
+)
+QUEUE_DEPTH = Gauge(
+    "patent_queue_depth",
+    "Число задач в очереди",
+    registry=REGISTRY,
+)
+JOBS_RUNNING = Gauge(
+    "patent_jobs_running",
+    "Число выполняемых задач",
+    registry=REGISTRY,
+)
+CACHE_LOOKUPS = Counter(
+    "patent_cache_lookups",
+    "Обращения к кэшу результатов по виду записи и исходу",
+    ["kind", "result"],
+    registry=REGISTRY,
+)
+CACHE_EVICTIONS = Counter(
+    "patent_cache_evictions",
+    "Записи кэша результатов, вытесненные по лимиту размера",
+    ["table"],
+    registry=REGISTRY,
+)
+
+
+def observe_chunk(stats: Dict[str, Any]) -> None:
+    """
+    Учитывает статистику обработанного чанка в метриках.
+
+    Время вычисления промпта и генерации есть только у настоящей модели
+    llama-cpp (см. ``llm_timings``).
+
+    :param stats: Статистика чанка из ``ChunkRun.record``
+    """
+    CHUNK_SECONDS.observe(stats["time"])
+    CHUNK_TOKENS.labels("in").observe(stats["prompt_tokens"])
+    if "completion_tokens" in stats:
+        CHUNK_TOKENS.labels("out").observe(stats["completion_tokens"])
+    if "prompt_eval_time" in stats:
+        CHUNK_PROMPT_EVAL_SECONDS.observe(stats["prompt_eval_time"])
+        CHUNK_GENERATION_SECONDS.observe(stats["generation_time"])
+
+
+def render() -> Tuple[bytes, str]:
+    """
+    Возвращает метрики в текстовом формате Prometheus.
+
+    :return: Кортеж (тело ответа, тип содержимого)
+    """
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,246 @@
+"""Module for extracting page text from PDF files."""
+import heapq
+import logging
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pdfplumber
+
+from .fast_path import table_lines
+from .metrics import PDF_PAGE_SECONDS, PDF_PAGES_CACHED
+from .result_cache import PageCache
+
+logger = logging.getLogger(__name__)
+
+# Минимальное число страниц, начиная с которого извлечение текста
+# распараллеливается по процессам, и число пакетов страниц на процесс
+PARALLEL_MIN_PAGES = 16
+PAGE_BATCHES_PER_WORKER = 4
+
+
+def _page_text(page: Any, tables: bool = False) -> str:
+    """
+    Извлекает текст страницы PDF.
+
+    При ``tables`` таблицы составов, распознанные ``table_lines``,
+    вырезаются из текста страницы и добавляются после него строками
+    "Свойство (сплав): значение", которые разбираются без LLM; остальные
+    таблицы остаются в тексте как есть.
+
+    :param page: Страница ``pdfplumber``
+    :param tables: Разбирать таблицы составов
+    :return: Текст страницы
+    """
+    if not tables:
+        return page.extract_text() or ""
+    lines: List[str] = []
+    text_page = page
+    for table in page.find_tables():
+        rows = table_lines(table.extract())
+        if rows:
+            lines.extend(rows)
+            text_page = text_page.outside_bbox(table.bbox)
+    text = text_page.extract_text() or ""
+    return "\n".join([text] + lines if text else lines)
+
+
+def _extract_pages(
+    file_path: str,
+    page_numbers: List[int],
+    tables: bool = False
+) -> List[Tuple[int, str]]:
+    """
+    Извлекает текст страниц с номерами ``page_numbers``.
+
+    Выполняется в отдельном процессе пула: каждый процесс открывает PDF
+    самостоятельно и загружает только свои страницы.
+
+    :param file_path: Путь к PDF файлу
+    :param page_numbers: Номера страниц (с 1) по возрастанию
+    :param tables: Разбирать таблицы составов (см. ``_page_text``)
+    :return: Список пар (номер страницы, текст)
+    """
+    pages: List[Tuple[int, str]] = []
+    with pdfplumber.open(file_path, pages=page_numbers) as pdf:
+        for page_no, page in zip(page_numbers, pdf.pages):
+            pages.append((page_no, _page_text(page, tables)))
+            page.close()
+    return pages
+
+
+def _iter_pages_parallel(
+    file_path: str,
+    page_numbers: List[int],
+    workers: int,
+    tables: bool = False
+) -> Iterator[Tuple[int, str]]:
+    """
+    Извлекает текст страниц в пуле процессов, сохраняя порядок страниц.
+
+    Страницы делятся на пакеты (несколько на процесс), чтобы первые
+    страницы были готовы раньше, чем обработан весь документ.
+    """
+    batch_size = math.ceil(
+        len(page_numbers) / (workers * PAGE_BATCHES_PER_WORKER)
+    )
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    try:
+        futures = [
+            pool.submit(
+                _extract_pages,
+                file_path,
+                page_numbers[first:first + batch_size],
+                tables
+            )
+            for first in range(0, len(page_numbers), batch_size)
+        ]
+        for future in futures:
+            yield from future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _iter_pages(
+    pdf: pdfplumber.PDF,
+    file_path: str,
+    workers: int,
+    tables: bool = False,
+    cached: Optional[Dict[int, str]] = None
+) -> Iterator[Tuple[int, str]]:
+    """
+    Выдает текст страниц открытого PDF последовательно или в пуле.
+
+    Страницы из ``cached`` (номер страницы — текст) не разбираются.
+    """
+    pages_count = len(pdf.pages)
+    cached = cached or {}
+    missing = [n for n in range(1, pages_count + 1) if n not in cached]
+    if workers > 1 and len(missing) >= PARALLEL_MIN_PAGES:
+        extracted = _iter_pages_parallel(file_path, missing, workers, tables)
+        try:
+            # Обе последовательности упорядочены по номеру страницы
+            yield from heapq.merge(sorted(cached.items()), extracted)
+        finally:
+            extracted.close()
+        return
+
+    for page_no, page in enumerate(pdf.pages, 1):
+        if page_no in cached:
+            yield page_no, cached[page_no]
+            continue
+        page_text = _page_text(page, tables)
+        # Сбрасываем кэши разметки pdfplumber, чтобы не держать их
+        # в памяти до конца документа
+        page.close()
+        yield page_no, page_text
+
+
+def iter_pdf_pages(
+    file_path: str,
+    workers: int = 1,
+    tables: bool = False
+) -> Iterator[Tuple[int, str]]:
+    """
+    Потоково извлекает текст страниц PDF-файла.
+
+    Страницы выдаются по порядку по мере готовности. Конвейер
+    извлечения информации о сплавах использует ``extract_text_from_pdf``:
+    разделам патента и удалению повторов нужен текст всего документа.
+
+    :param file_path: Путь к PDF файлу
+    :param workers: Количество процессов для параллельного извлечения
+    :param tables: Разбирать таблицы составов (см. ``_page_text``)
+    :return: Генератор пар (номер страницы с 1, текст страницы)
+    """
+    with pdfplumber.open(file_path) as pdf:
+        yield from _iter_pages(pdf, file_path, workers, tables)
+
+
+def _cached_pages(
+    page_cache: Optional[PageCache],
+    pages_count: int
+) -> Dict[int, str]:
+    """Возвращает страницы документа, уже сохраненные в кэше страниц."""
+    if page_cache is None:
+        return {}
+    cached = {}
+    for page_no in range(1, pages_count + 1):
+        page_text = page_cache.get(page_no)
+        if page_text is not None:
+            cached[page_no] = page_text
+    if cached:
+        logger.info("[PDF] Страниц в кэше: %d/%d", len(cached), pages_count)
+    return cached
+
+
+def extract_text_from_pdf(
+    file_path: str,
+    workers: int = 1,
+    on_page: Optional[Callable[[int, int], None]] = None,
+    tables: bool = False,
+    page_cache: Optional[PageCache] = None
+) -> Tuple[str, Dict]:
+    """
+    Извлекает текст из PDF-файла по пути.
+
+    При ``workers > 1`` документы от ``PARALLEL_MIN_PAGES`` страниц
+    обрабатываются пулом процессов. При ``tables`` распознанные таблицы
+    составов записываются строками свойств (см. ``_page_text``), а в
+    метаданных ``tables`` равно True. Страницы из ``page_cache`` не
+    разбираются, а извлеченные страницы сохраняются в него, в том числе
+    при ошибке на одной из следующих страниц.
+
+    :param file_path: Путь к PDF файлу
+    :param workers: Количество процессов для параллельного извлечения
+    :param on_page: Вызывается после каждой страницы с аргументами
+        (номер страницы, всего страниц)
+    :param tables: Разбирать таблицы составов
+    :param page_cache: Кэш страниц документа (опционально)
+    :return: Кортеж (извлеченный текст, метаданные)
+    """
+    logger.info("[PDF] Открытие PDF файла: %s", file_path)
+    extracted_pages: List[str] = []
+    metadata: Dict[str, Any] = {"tables": tables}
+
+    with pdfplumber.open(file_path) as pdf:
+        metadata["pages"] = len(pdf.pages)
+        pages_count = metadata['pages']
+        logger.info("[PDF] Всего страниц в документе: %d", pages_count)
+        cached = _cached_pages(page_cache, pages_count)
+        page_start = time.perf_counter()
+        try:
+            for i, page_text in _iter_pages(
+                pdf, file_path, workers, tables, cached
+            ):
+                # При параллельном извлечении это интервал между готовыми
+                # страницами, то есть время на страницу с учетом
+                # параллелизма; страницы из кэша в него не попадают
+                page_end = time.perf_counter()
+                if i in cached:
+                    PDF_PAGES_CACHED.inc()
+                else:
+                    PDF_PAGE_SECONDS.observe(page_end - page_start)
+                page_start = page_end
+                if page_text:
+                    extracted_pages.append(page_text)
+                if page_cache is not None and i not in cached:
+                    page_cache.put(i, pages_count, page_text)
+                if on_page is not None:
+                    on_page(i, pages_count)
+                if i % 10 == 0 or i == pages_count:
+                    logger.info("[PDF] Обработано страниц: %d/%d",
+                                i, pages_count)
+        finally:
+            if page_cache is not None:
+                page_cache.flush()
+
+    full_text = "\n\n".join(extracted_pages).strip()
+    logger.info("[PDF] Извлечение текста завершено. Всего символов: %d",
+                len(full_text))
+    return full_text, metadata
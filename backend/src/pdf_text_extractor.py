@@ -1,214 +1,280 @@
-"""Module for extracting text from PDF files."""
-import multiprocessing
+"""Module for extracting alloy information from patent text with LLM."""
+import contextlib
+import json
+import logging
 import os
 import time
-from contextlib import redirect_stderr
-from io import StringIO
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import Future, as_completed
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    List,
+    Optional,
+    Tuple
+)
 
-import pdfplumber
 from llama_cpp import Llama
 
+from .chunking import chunk_token_budget, count_llm_tokens, pack_lines
+from .llm_model import (
+    LlamaModelManager,
+    LlmWorkerPool,
+    PromptPrefixCache,
+    draft_model_of,
+    llm_timings,
+    model_manager,
+    reset_timings,
+    worker_llm
+)
+from .metrics import MERGE_SECONDS, observe_chunk
+from .prompts import (
+    CHUNK_MAX_TOKENS,
+    PROPERTIES_GBNF,
+    SUMMARY_MAX_TOKENS,
+    complete,
+    fit_prompt,
+    generation_options,
+    prompt_templates
+)
+from .properties import (
+    dedup_property_lines,
+    item_to_line,
+    parse_properties
+)
+from .result_cache import ResultCache, chunk_key
+from .scheduler import SchedulerSession, scheduled_submit, scheduled_turn
+from .text_preparation import (
+    ExtractionSettings,
+    select_chunks,
+    split_for_llm
+)
+
+logger = logging.getLogger(__name__)
+
+# Обработчик событий о ходе обработки: (тип события, данные)
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+# Обертка этапа обработки: имя этапа -> контекстный менеджер
+StageHook = Callable[[str], ContextManager[Any]]
+
+# Стоп-последовательности ответа по чанку в текстовом режиме
+_CHUNK_STOP = ["\n\nText:", "\n\nText"]
+
+
+def _as_summary_lines(output_text: str, structured: bool) -> str:
+    """Переводит JSON ответ модели в строки-объекты для сборки."""
+    if not structured:
+        return output_text
+    if not output_text.rstrip().endswith("]"):
+        logger.warning("[LLM] JSON ответ оборван лимитом max_tokens, "
+                       "сохранены только полные объекты")
+    return "\n".join(
+        item_to_line(item) for item in parse_properties(output_text)
+    )
 
-def split_text_into_chunks(
-    text: str,
-    chunk_size: int = 2000,
-    overlap: int = 0
-) -> List[str]:
-    """
-    Разбивает текст на чанки заданного размера.
 
-    :param text: Текст для разбиения
-    :param chunk_size: Размер чанка в символах
-    :param overlap: Перекрытие между чанками в символах
-    :return: Список текстовых чанков
+@dataclass
+class ChunkRun:  # pylint: disable=too-many-instance-attributes
     """
-    if not text or not text.strip():
-        return []
-
-    if len(text) <= chunk_size:
-        return [text]
-
-    chunks = []
-    start = 0
-
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        if chunk.strip():
-            chunks.append(chunk)
-
-        if end >= len(text):
-            break
-        start = end - overlap
-
-    return chunks
-
-
-def extract_text_from_pdf(file_path: str) -> Tuple[str, Dict]:
+    Общие объекты и накопленная статистика обработки чанков одного текста.
+
+    :ivar prefix_cache: Кэш префикса промпта чанков (None — отключен)
+    :ivar chunk_stats: Статистика по каждому обработанному чанку
+    :ivar on_event: Обработчик событий о ходе обработки (опционально)
+    :ivar structured: Структурированный вывод (JSON массив свойств)
+    :ivar cache: Кэш ответов модели по чанкам (опционально)
+    :ivar outputs: Ответы модели по номерам чанков (с 1)
+    :ivar cached_chunks: Число ответов, взятых из кэша
+    :ivar property_budget: Число свойств, после которого следующие чанки
+        не обрабатываются (0 — без ограничения)
+    :ivar found_lines: Строки свойств, найденные без LLM (учитываются в
+        ``property_budget``)
+    :ivar early_stop: Сведения о досрочной остановке (None — не было)
+    :ivar session: Сессия документа в планировщике модели (None — чанки
+        отправляются в модель без очереди)
     """
-    Извлекает текст из PDF-файла по пути.
 
-    :param file_path: Путь к PDF файлу
-    :return: Кортеж (извлеченный текст, метаданные)
-    """
-    print(f"[PDF] Открытие PDF файла: {file_path}", flush=True)
-    extracted_pages: List[str] = []
-    metadata = {}
-
-    with pdfplumber.open(file_path) as pdf:
-        metadata["pages"] = len(pdf.pages)
-        pages_count = metadata['pages']
-        print(f"[PDF] Всего страниц в документе: {pages_count}",
-              flush=True)
-        for i, page in enumerate(pdf.pages, 1):
-            page_text = page.extract_text()
-            if page_text:
-                extracted_pages.append(page_text)
-                if i % 10 == 0 or i == metadata["pages"]:
-                    print(f"[PDF] Обработано страниц: {i}/{pages_count}",
-                          flush=True)
-
-    full_text = "\n\n".join(extracted_pages).strip()
-    chars_count = len(full_text)
-    print(f"[PDF] Извлечение текста завершено. "
-          f"Всего символов: {chars_count}", flush=True)
-    return full_text, metadata
+    prefix_cache: Optional[PromptPrefixCache] = None
+    chunk_stats: List[Dict[str, Any]] = field(default_factory=list)
+    on_event: Optional[EventCallback] = None
+    structured: bool = False
+    cache: Optional[ResultCache] = None
+    outputs: Dict[int, str] = field(default_factory=dict)
+    cached_chunks: int = 0
+    property_budget: int = 0
+    found_lines: List[str] = field(default_factory=list)
+    early_stop: Optional[Dict[str, int]] = None
+    session: Optional[SchedulerSession] = None
+
+    def emit(self, event: str, data: Dict[str, Any]) -> None:
+        """Передает событие обработчику, если он задан."""
+        if self.on_event is not None:
+            self.on_event(event, data)
+
+    def record(
+        self,
+        stats: Dict[str, Any],
+        output_text: str,
+        total_chunks: int
+    ) -> None:
+        """Сохраняет статистику обработанного чанка и сообщает о нем."""
+        self.chunk_stats.append(stats)
+        self.outputs[stats["chunk"]] = output_text
+        observe_chunk(stats)
+        self.emit("chunk", {
+            "chunk": stats["chunk"],
+            "total": total_chunks,
+            "time": stats["time"],
+            "text": output_text,
+            "properties": parse_properties(output_text),
+        })
+
+    def budget_reached_at(self, total_chunks: int) -> Optional[int]:
+        """
+        Находит чанк, после которого набрано ``property_budget`` свойств.
+
+        Учитываются строки ``found_lines`` и ответы первых чанков подряд
+        (до первого необработанного), поэтому результат не зависит от
+        порядка, в котором пул завершает чанки.
+
+        :param total_chunks: Общее число чанков
+        :return: Номер чанка (0 — бюджет набран без LLM) или None
+        """
+        if self.property_budget <= 0:
+            return None
+        texts = ["\n".join(self.found_lines)]
+        for number in range(total_chunks + 1):
+            if number:
+                if number not in self.outputs:
+                    return None
+                texts.append(self.outputs[number])
+            if len(dedup_property_lines(texts)) >= self.property_budget:
+                return number
+        return None
+
+    def line_handler(self, chunk: int) -> Optional[Callable[[str], None]]:
+        """
+        Возвращает обработчик строк ответа по чанку для потоковой передачи.
+
+        :param chunk: Номер чанка (с 1)
+        :return: Обработчик строк или None, если событий никто не ждет
+            или ответ структурированный
+        """
+        if self.on_event is None or self.structured:
+            return None
+        return lambda line: self.emit(
+            "chunk_line", {"chunk": chunk, "line": line}
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        """Возвращает сводку по обработанным чанкам для отчета."""
+        summary: Dict[str, Any] = {"chunk_stats": self.chunk_stats}
+        if self.early_stop is not None:
+            summary["early_stop"] = self.early_stop
+        if self.cache is not None:
+            summary["chunk_cache"] = {
+                "hits": self.cached_chunks,
+                "misses": len(self.chunk_stats),
+            }
+        if self.prefix_cache is not None:
+            saved = [
+                stats["prompt_eval_saved"] for stats in self.chunk_stats
+            ]
+            summary["prefix_cache"] = {
+                "prefix_tokens": len(self.prefix_cache.tokens),
+                "prefix_eval_time": round(self.prefix_cache.eval_time, 3),
+                "restores": sum(
+                    1 for stats in self.chunk_stats
+                    if stats["prefix_restored"]
+                ),
+                "prompt_eval_saved": round(sum(saved), 3),
+            }
+        drafted = sum(s.get("draft_tokens", 0) for s in self.chunk_stats)
+        if drafted:
+            accepted = sum(
+                s.get("accepted_tokens", 0) for s in self.chunk_stats
+            )
+            summary["speculative"] = {
+                "draft_tokens": drafted,
+                "accepted_tokens": accepted,
+                "acceptance_rate": round(accepted / drafted, 3),
+            }
+        return summary
 
 
 def _process_single_chunk(
     chunk_text: str,
     llm: Llama,
     chunk_num: int = 0,
-    total_chunks: int = 0
+    total_chunks: int = 0,
+    run: Optional[ChunkRun] = None
 ) -> str:
     """Обрабатывает один чанк текста через LLM."""
-    chunk_size = len(chunk_text)
-    if total_chunks > 0:
-        msg = f"[LLM] Обработка чанка {chunk_num + 1}/{total_chunks} "
-        msg += f"(размер: {chunk_size} символов)..."
-        print(msg, flush=True)
-    else:
-        print(f"[LLM] Обработка чанка (размер: {chunk_size} символов)...",
-              flush=True)
+    chunk_info = f"{chunk_num + 1}/{total_chunks}" if total_chunks > 0 else ""
+    logger.info("[LLM] Обработка чанка %s (размер: %d символов)...",
+                chunk_info, len(chunk_text))
 
     start_time = time.time()
 
-    prompt_template = (
-        "Extract all explicitly stated information about metallic alloys "
-        "from the text.\n"
-        "List each property on a new line in format: "
-        "\"Property name: value\"\n"
-        "Use original wording and units from the text.\n"
-        "If no alloy information found, write \"No alloy information\".\n\n"
-        "Example:\n"
-        "Melting temperature: 1600 °C\n"
-        "Alloy composition: Fe 70%, Cr 20%, Ni 10%\n"
-        "Hardness: 350 HB\n\n"
-        "Text:\n"
+    structured = run is not None and run.structured
+    prompt = fit_prompt(
+        llm, prompt_templates(structured)[0], chunk_text, CHUNK_MAX_TOKENS
     )
-    prompt = prompt_template + chunk_text
-
-    max_prompt_chars = 3500
-    if len(prompt) > max_prompt_chars:
-        max_text_chars = max_prompt_chars - len(prompt_template)
-        chunk_text = chunk_text[:max_text_chars]
-        prompt = prompt_template + chunk_text
-
-    response = llm(
+    restored, saved = False, 0.0
+    if run is not None and run.prefix_cache is not None:
+        restored, saved = run.prefix_cache.prepare(llm)
+    draft = draft_model_of(llm)
+    if draft is not None:
+        draft.reset_stats()
+    reset_timings(llm)
+
+    output_text = complete(
+        llm,
         prompt,
-        temperature=0.0,
-        top_p=0.9,
-        top_k=20,
-        max_tokens=500,
-        repeat_penalty=1.1,
-        stop=["\n\nText:", "\n\nText"],
-        echo=False
+        run.line_handler(chunk_num + 1) if run is not None else None,
+        **generation_options(structured, CHUNK_MAX_TOKENS, _CHUNK_STOP)
     )
-
-    output_text = response["choices"][0]["text"].strip()
+    output_text = _as_summary_lines(output_text, structured).strip()
 
     elapsed_time = time.time() - start_time
-    if total_chunks > 0:
-        msg = f"[LLM] Чанк {chunk_num + 1}/{total_chunks} "
-        msg += f"обработан за {elapsed_time:.1f}с"
-        print(msg, flush=True)
-    else:
-        print(f"[LLM] Чанк обработан за {elapsed_time:.1f}с", flush=True)
+    logger.info("[LLM] Чанк %s обработан за %.1fс", chunk_info, elapsed_time)
+
+    if run is not None:
+        stats = {
+            "chunk": chunk_num + 1,
+            "prompt_tokens": len(prompt),
+            "completion_tokens": count_llm_tokens(llm, output_text),
+            "time": round(elapsed_time, 3),
+            "prefix_restored": restored,
+            "prompt_eval_saved": round(saved, 3),
+        }
+        stats.update(llm_timings(llm) or {})
+        if draft is not None:
+            stats.update(draft.stats())
+        run.record(stats, output_text, total_chunks)
 
     if output_text:
-        chunk_info = f"{chunk_num + 1}" if total_chunks > 0 else ""
-        print(f"[LLM] Ответ по чанку {chunk_info}:", flush=True)
-        print(output_text, flush=True)
-        print("-" * 80, flush=True)
+        logger.debug("[LLM] Ответ по чанку %s:\n%s", chunk_info, output_text)
     else:
-        chunk_info = f"{chunk_num + 1}" if total_chunks > 0 else ""
-        print(f"[LLM] Пустой ответ по чанку {chunk_info}", flush=True)
+        logger.info("[LLM] Пустой ответ по чанку %s", chunk_info)
 
     return output_text
 
 
-def _load_llm_model(model_path: str, cpu_count: int) -> Llama:
-    """
-    Загружает LLM модель с попытками использования GPU.
-
-    :param model_path: Путь к модели
-    :param cpu_count: Количество CPU потоков
-    :return: Загруженная модель Llama
-    """
-    with redirect_stderr(StringIO()):
-        try:
-            llm = Llama(
-                model_path=model_path,
-                n_ctx=4096,
-                n_threads=cpu_count,
-                n_batch=1024,
-                n_gpu_layers=32,
-                use_mmap=True,
-                use_mlock=False,
-                verbose=False
-            )
-            print("[LLM] Модель Mistral загружена с GPU ускорением (32 слоя)",
-                  flush=True)
-            return llm
-        except (RuntimeError, OSError) as e:
-            error_msg = str(e)
-            msg = "[LLM] Предупреждение: не удалось загрузить с полным GPU "
-            msg += f"({error_msg}), пробуем с меньшим количеством слоев..."
-            print(msg, flush=True)
-            try:
-                llm = Llama(
-                    model_path=model_path,
-                    n_ctx=4096,
-                    n_threads=cpu_count,
-                    n_batch=1024,
-                    n_gpu_layers=16,
-                    use_mmap=True,
-                    verbose=False
-                )
-                print("[LLM] Модель Mistral загружена с частичным "
-                      "GPU ускорением (16 слоев)", flush=True)
-                return llm
-            except (RuntimeError, OSError):
-                print("[LLM] Используем только CPU", flush=True)
-                llm = Llama(
-                    model_path=model_path,
-                    n_ctx=4096,
-                    n_threads=cpu_count,
-                    n_batch=1024,
-                    n_gpu_layers=0,
-                    use_mmap=True,
-                    verbose=False
-                )
-                return llm
-
-
-def _process_chunks(chunks: List[str], llm: Llama) -> List[str]:
+def _process_chunks(
+    chunks: List[str],
+    llm: Llama,
+    run: Optional[ChunkRun] = None
+) -> List[str]:
     """
     Обрабатывает все чанки текста через LLM.
 
     :param chunks: Список текстовых чанков
     :param llm: Загруженная модель LLM
+    :param run: Общие объекты и статистика обработки (опционально)
     :return: Список сводок по каждому чанку
     """
     summaries: List[str] = []
@@ -216,95 +282,489 @@ def _process_chunks(chunks: List[str], llm: Llama) -> List[str]:
     for i, chunk in enumerate(chunks):
         if not chunk or not chunk.strip():
             continue
-        chunk_summary = _process_single_chunk(
-            chunk, llm, chunk_num=i, total_chunks=len(chunks)
-        )
+        if run is not None and run.budget_reached_at(len(chunks)) is not None:
+            break
+        with scheduled_turn(run.session if run is not None else None):
+            chunk_summary = _process_single_chunk(
+                chunk, llm, chunk_num=i, total_chunks=len(chunks), run=run
+            )
         if chunk_summary.strip():
             summaries.append(chunk_summary)
 
     return summaries
 
 
-def _build_final_summary(
-    summaries: List[str],
-    llm: Llama
-) -> str:
-    """Собирает финальный ответ из всех сводок."""
-    print("[LLM] Сборка финального ответа из всех записей...", flush=True)
-    start_time = time.time()
+def _pool_process_chunk(
+    chunk_text: str,
+    chunk_num: int,
+    total_chunks: int,
+    settings: ExtractionSettings
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Обрабатывает один чанк моделью процесса пула.
+
+    :return: Кортеж (ответ модели, статистика чанка)
+    """
+    llm = worker_llm()
+    run = ChunkRun(structured=settings.structured_output)
+    if settings.prefix_cache:
+        run.prefix_cache = PromptPrefixCache.for_model(
+            llm, prompt_templates(run.structured)[0]
+        )
+    output_text = _process_single_chunk(
+        chunk_text, llm, chunk_num, total_chunks, run
+    )
+    return output_text, run.chunk_stats[-1]
+
+
+def _cancel_pending(futures: List[Future]) -> None:
+    """Отменяет задачи пула, которые еще не начали выполняться."""
+    for future in futures:
+        future.cancel()
+
 
-    valid_summaries = [
-        s.strip() for s in summaries
-        if s.strip() and "No alloy information" not in s.lower()
+def _process_chunks_in_pool(
+    chunks: List[str],
+    pool: LlmWorkerPool,
+    run: ChunkRun,
+    settings: ExtractionSettings
+) -> List[str]:
+    """
+    Распределяет чанки по процессам пула моделей.
+
+    События ``chunk`` отправляются по мере готовности чанков, а сводки
+    возвращаются в исходном порядке чанков.
+
+    :param chunks: Список текстовых чанков
+    :param pool: Пул процессов с моделями
+    :param run: Накопитель статистики и событий обработки
+    :param settings: Параметры обработки (кэш префикса, режим вывода)
+    :return: Список сводок по каждому чанку
+    """
+    futures: Dict[Future, int] = {
+        scheduled_submit(
+            pool, run.session,
+            _pool_process_chunk, chunk, i, len(chunks), settings
+        ): i
+        for i, chunk in enumerate(chunks)
+        if chunk and chunk.strip()
+    }
+    outputs: Dict[int, str] = {}
+    try:
+        for future in as_completed(futures):
+            output_text, stats = future.result()
+            outputs[futures[future]] = output_text
+            run.record(stats, output_text, len(chunks))
+            if run.budget_reached_at(len(chunks)) is not None:
+                break
+    finally:
+        _cancel_pending(list(futures))
+    run.chunk_stats.sort(key=lambda stats: stats["chunk"])
+    return [
+        outputs[i] for i in sorted(outputs) if outputs[i].strip()
     ]
-    if not valid_summaries:
-        print("[LLM] Нет данных для сборки", flush=True)
-        return ""
 
-    combined_summaries = "\n\n".join(
-        [f"Запись {i+1}:\n{s}" for i, s in enumerate(valid_summaries)]
-    )
 
-    prompt_template = (
-        "Combine all information about metallic alloys from the "
-        "summaries below.\n"
-        "List each property on a new line in format: "
-        "\"Property name: value\"\n"
-        "Merge duplicates - if the same property appears multiple "
-        "times, keep the most complete version.\n"
-        "Use original wording and units.\n\n"
-        "Example:\n"
-        "Melting temperature: 1600 °C\n"
-        "Alloy composition: Fe 70%, Cr 20%, Ni 10%\n"
-        "Hardness: 350 HB\n\n"
-        "Summaries:\n"
+def _chunk_cache_key(chunk_text: str, llm: Llama, structured: bool) -> str:
+    """Строит ключ кэша ответа модели по чанку (см. ``chunk_key``)."""
+    options = generation_options(structured, CHUNK_MAX_TOKENS, _CHUNK_STOP)
+    # Грамматика входит в ключ текстом GBNF, а не объектом llama-cpp;
+    # от размера контекста зависит, сокращается ли текст чанка
+    options["grammar"] = PROPERTIES_GBNF if structured else None
+    options["n_ctx"] = llm.n_ctx()
+    return chunk_key(
+        llm.model_path, prompt_templates(structured)[0] + chunk_text, options
     )
-    prompt = prompt_template + combined_summaries
 
-    max_prompt_chars = 3500
-    if len(prompt) > max_prompt_chars:
-        max_summaries_chars = max_prompt_chars - len(prompt_template)
-        combined_summaries = combined_summaries[:max_summaries_chars]
-        prompt = prompt_template + combined_summaries
 
-    response = llm(
+def _cached_outputs(chunks: List[str], llm: Llama, run: ChunkRun) -> List[str]:
+    """
+    Берет из кэша ответы модели по чанкам и сообщает о них событиями.
+
+    :return: Ключи кэша чанков (пустой список без кэша)
+    """
+    if run.cache is None:
+        return []
+    keys = [_chunk_cache_key(chunk, llm, run.structured) for chunk in chunks]
+    for i, key in enumerate(keys):
+        output_text = run.cache.get_chunk(key)
+        if output_text is None:
+            continue
+        run.outputs[i + 1] = output_text
+        run.cached_chunks += 1
+        run.emit("chunk", {
+            "chunk": i + 1,
+            "total": len(chunks),
+            "time": 0.0,
+            "text": output_text,
+            "properties": parse_properties(output_text),
+            "cached": True,
+        })
+    if run.cached_chunks:
+        logger.info("[LLM] Ответов по чанкам в кэше: %d/%d",
+                    run.cached_chunks, len(chunks))
+    return keys
+
+
+def _run_chunks(
+    chunks: List[str],
+    llm: Llama,
+    run: ChunkRun,
+    settings: ExtractionSettings,
+    pool: Optional[LlmWorkerPool] = None
+) -> List[str]:
+    """
+    Обрабатывает чанки моделью приложения или пулом моделей.
+
+    Ответы, сохраненные в ``run.cache``, берутся из кэша, и модель
+    вызывается только для чанков, текст или промпт которых изменился.
+    Новые ответы сохраняются в кэш, в том числе при ошибке на одном из
+    следующих чанков. Когда первые чанки вместе со строками
+    ``run.found_lines`` дают ``run.property_budget`` свойств, следующие
+    чанки не обрабатываются.
+
+    :param chunks: Список текстовых чанков
+    :param llm: Модель приложения
+    :param run: Общие объекты, кэш и статистика обработки
+    :param settings: Параметры обработки
+    :param pool: Пул процессов с моделями (опционально)
+    :return: Список непустых сводок в порядке чанков
+    """
+    keys = _cached_outputs(chunks, llm, run)
+    cached = set(run.outputs)
+    stop = run.budget_reached_at(len(chunks))
+    # Чанки из кэша и после досрочной остановки заменяются пустыми
+    # строками, чтобы номера остальных чанков в событиях и статистике
+    # не менялись
+    pending = [
+        "" if i + 1 in cached or (stop is not None and i >= stop) else chunk
+        for i, chunk in enumerate(chunks)
+    ]
+    if run.session is not None:
+        run.session.expect(sum(1 for chunk in pending if chunk.strip()))
+    try:
+        if pool is not None:
+            _process_chunks_in_pool(pending, pool, run, settings)
+        else:
+            if settings.prefix_cache and any(pending):
+                with scheduled_turn(run.session):
+                    run.prefix_cache = PromptPrefixCache.for_model(
+                        llm, prompt_templates(run.structured)[0]
+                    )
+            _process_chunks(pending, llm, run)
+    finally:
+        if run.cache is not None:
+            for number in sorted(set(run.outputs) - cached):
+                run.cache.put_chunk(keys[number - 1], run.outputs[number])
+    stop = run.budget_reached_at(len(chunks))
+    if stop is not None and stop < len(chunks):
+        run.early_stop = {
+            "after_chunk": stop,
+            "chunks_skipped": len(chunks) - stop,
+        }
+        logger.info("[LLM] Набрано свойств: %d, остальные чанки (%d) "
+                    "не обрабатываются", run.property_budget,
+                    len(chunks) - stop)
+    return [
+        run.outputs[number] for number in sorted(run.outputs)
+        if (stop is None or number <= stop) and run.outputs[number].strip()
+    ]
+
+
+def _merge_group(
+    lines: List[str],
+    llm: Llama,
+    structured: bool = False
+) -> str:
+    """Объединяет одну группу строк сводок через LLM."""
+    _, summary_template = prompt_templates(structured)
+    prompt = fit_prompt(
+        llm, summary_template, "\n".join(lines), SUMMARY_MAX_TOKENS
+    )
+    output_text = complete(
+        llm,
         prompt,
-        temperature=0.0,
-        top_p=0.9,
-        top_k=20,
-        max_tokens=1000,
-        repeat_penalty=1.1,
-        stop=["\n\nSummaries", "\n\nSummaries:"],
-        echo=False
+        **generation_options(
+            structured,
+            SUMMARY_MAX_TOKENS,
+            ["\n\nSummaries", "\n\nSummaries:"]
+        )
     )
+    return _as_summary_lines(output_text, structured).strip()
+
+
+def _pool_merge_group(lines: List[str], structured: bool) -> str:
+    """Объединяет одну группу строк сводок моделью процесса пула."""
+    return _merge_group(lines, worker_llm(), structured)
+
+
+def _merge_groups(
+    groups: List[List[str]],
+    llm: Llama,
+    pool: Optional[LlmWorkerPool] = None,
+    structured: bool = False,
+    session: Optional[SchedulerSession] = None
+) -> List[str]:
+    """
+    Объединяет все группы одного уровня сборки.
+
+    Группы одного уровня независимы друг от друга: с пулом моделей они
+    объединяются параллельно, с одним экземпляром модели — по очереди.
+    С ``session`` группы получают модель через планировщик, как чанки.
+    """
+    if pool is None:
+        merged = []
+        for group in groups:
+            with scheduled_turn(session):
+                merged.append(_merge_group(group, llm, structured))
+        return merged
+    futures = [
+        scheduled_submit(pool, session, _pool_merge_group, group, structured)
+        for group in groups
+    ]
+    try:
+        return [future.result() for future in futures]
+    finally:
+        _cancel_pending(futures)
+
+
+def _final_text(lines: List[str], structured: bool) -> str:
+    """Собирает итоговый текст: строки свойств или JSON массив."""
+    if not structured:
+        return "\n".join(lines)
+    return json.dumps(
+        parse_properties("\n".join(lines)), ensure_ascii=False
+    )
+
 
-    output_text = response["choices"][0]["text"].strip()
+def _build_final_summary(  # pylint: disable=too-many-arguments
+    summaries: List[str],
+    llm: Llama,
+    settings: Optional[ExtractionSettings] = None,
+    report: Optional[Dict[str, Any]] = None,
+    pool: Optional[LlmWorkerPool] = None,
+    *,
+    session: Optional[SchedulerSession] = None
+) -> str:
+    """
+    Собирает финальный ответ из всех сводок иерархическим слиянием.
+
+    Сначала строки всех сводок объединяются без LLM: точные и
+    нормализованные дубликаты "Свойство: значение" отбрасываются. Если
+    оставшиеся строки не помещаются в один запрос, они делятся на группы
+    по бюджету токенов, каждая группа сводится моделью, и так уровень за
+    уровнем, пока не останется одна группа. Ни одна сводка не обрезается.
+
+    :param summaries: Сводки по чанкам
+    :param llm: Загруженная модель LLM
+    :param settings: Параметры обработки (опционально)
+    :param report: Словарь для отчета о сборке (опционально)
+    :param pool: Пул процессов с моделями для параллельной сборки
+        (опционально)
+    :param session: Сессия документа в планировщике модели (опционально)
+    :return: Финальная информация о сплавах
+    """
+    logger.info("[LLM] Сборка финального ответа из всех записей...")
+    start_time = time.time()
+    if settings is None:
+        settings = ExtractionSettings()
+
+    lines = dedup_property_lines(summaries)
+    merge_report: Dict[str, Any] = {
+        "input_lines": sum(len(s.splitlines()) for s in summaries),
+        "unique_lines": len(lines),
+        "levels": 0,
+        "llm_merges": 0,
+    }
+    if report is not None:
+        report["merge"] = merge_report
+    if not lines:
+        logger.info("[LLM] Нет данных для сборки")
+        return ""
+
+    budget = chunk_token_budget(
+        llm, prompt_templates(settings.structured_output)[1],
+        SUMMARY_MAX_TOKENS,
+        settings.context_share
+    )
+    groups = pack_lines(
+        lines, lambda text: count_llm_tokens(llm, text), budget
+    )
+    while len(groups) > 1:
+        merge_report["levels"] += 1
+        logger.info("[LLM] Уровень сборки %d: %d групп",
+                    merge_report["levels"], len(groups))
+        merged = dedup_property_lines(
+            _merge_groups(
+                groups, llm, pool, settings.structured_output, session
+            )
+        )
+        merge_report["llm_merges"] += len(groups)
+        next_groups = pack_lines(
+            merged, lambda text: count_llm_tokens(llm, text), budget
+        )
+        if len(next_groups) >= len(groups):
+            # Слияние не сокращает объем: возвращаем строки без
+            # финального запроса, чтобы не потерять данные
+            logger.warning("[LLM] Сборка не сокращает объем, "
+                           "возвращаем объединенные строки")
+            return _final_text(merged, settings.structured_output)
+        groups = next_groups
+
+    output_text = _final_text(
+        dedup_property_lines(_merge_groups(
+            groups, llm, pool, settings.structured_output, session
+        )),
+        settings.structured_output
+    )
+    merge_report["llm_merges"] += 1
+    merge_report["final_input_tokens"] = sum(
+        count_llm_tokens(llm, line) + 1 for line in groups[0]
+    )
 
     elapsed_time = time.time() - start_time
-    print(f"[LLM] Финальный ответ собран за {elapsed_time:.1f}с", flush=True)
+    MERGE_SECONDS.observe(elapsed_time)
+    logger.info("[LLM] Финальный ответ собран за %.1fс", elapsed_time)
     return output_text
 
 
-def extract_alloy_info_from_text(
+def _with_fast_path(
+    output_text: str,
+    fast_lines: List[str],
+    structured: bool
+) -> str:
+    """
+    Добавляет к ответу модели свойства, разобранные без LLM.
+
+    Строки быстрого пути идут первыми; дубликаты отбрасываются так же,
+    как при сборке ответа.
+    """
+    if not fast_lines:
+        return output_text
+    lines = dedup_property_lines(
+        ["\n".join(fast_lines), _as_summary_lines(output_text, structured)]
+    )
+    return _final_text(lines, structured)
+
+
+def _no_stage(_: str) -> ContextManager[Any]:
+    """Выполняет этап без обертки (``on_stage`` по умолчанию)."""
+    return contextlib.nullcontext()
+
+
+def run_pipeline(  # pylint: disable=too-many-arguments
+    patent_text: str,
+    llm: Llama,
+    settings: ExtractionSettings,
+    report: Dict[str, Any],
+    pool: Optional[LlmWorkerPool] = None,
+    *,
+    run: Optional[ChunkRun] = None,
+    on_stage: Optional[StageHook] = None
+) -> str:
+    """
+    Прогоняет текст патента через все этапы обработки моделью ``llm``.
+
+    Этапы: ``chunking`` (разделы, повторы, разбиение на чанки, быстрый
+    путь и фильтр релевантности), ``chunks`` (ответы модели по чанкам)
+    и ``merge`` (сборка финального ответа). Используется API и
+    бенчмарком, поэтому порядок этапов задается только здесь.
+
+    :param patent_text: Текст патента
+    :param llm: Модель приложения (или заглушка)
+    :param settings: Параметры обработки
+    :param report: Словарь для отчета об обработке
+    :param pool: Пул процессов с моделями (опционально)
+    :param run: Объекты обработки чанков: события, кэш, сессия
+        планировщика (опционально); режим вывода и бюджет свойств
+        берутся из ``settings``
+    :param on_stage: Возвращает контекстный менеджер, в котором
+        выполняется этап с переданным именем (например, для замера
+        времени); по умолчанию этапы не оборачиваются
+    :return: Извлеченная информация о сплавах
+    """
+    if run is None:
+        run = ChunkRun()
+    if on_stage is None:
+        on_stage = _no_stage
+    run.structured = settings.structured_output
+    run.property_budget = settings.property_budget
+
+    with on_stage("chunking"):
+        chunks = split_for_llm(patent_text, llm, settings, report)
+        report["chunks"] = len(chunks)
+        if not chunks:
+            logger.error("[LLM] Не удалось разбить текст на чанки")
+            return ""
+        logger.info("[LLM] Текст разбит на %d чанков", len(chunks))
+        chunks, run.found_lines = select_chunks(chunks, settings, report)
+
+    run.emit("chunks", {
+        "total": len(chunks),
+        "skipped": report["chunks_skipped"],
+        "fast_path": report.get("fast_path", {}).get("chunks", 0),
+    })
+    with on_stage("chunks"):
+        summaries = _run_chunks(chunks, llm, run, settings, pool)
+    report.update(run.summary())
+
+    with on_stage("merge"):
+        result = ""
+        if summaries:
+            run.emit("merge", {"summaries": len(summaries)})
+            result = _build_final_summary(
+                summaries, llm, settings, report, pool, session=run.session
+            )
+        elif not run.found_lines:
+            logger.info("[LLM] Не найдено информации об сплавах")
+        return _with_fast_path(
+            result, run.found_lines, settings.structured_output
+        )
+
+
+def extract_alloy_info_from_text(  # pylint: disable=too-many-arguments
     patent_text: str,
     model_path: Optional[str] = None,
-    chunk_size: int = 2000,
-    overlap: int = 0
+    settings: Optional[ExtractionSettings] = None,
+    manager: Optional[LlamaModelManager] = None,
+    report: Optional[Dict[str, Any]] = None,
+    *,
+    on_event: Optional[EventCallback] = None,
+    cache: Optional[ResultCache] = None,
+    session: Optional[SchedulerSession] = None
 ) -> str:
     """
     Извлекает информацию о сплавах из текста патента с помощью LLM.
 
+    Модель берется из ``manager`` (по умолчанию общий ``model_manager``)
+    и загружается только при первом обращении. С ``session`` чанки и
+    группы сборки получают модель через планировщик по очереди с
+    другими обрабатываемыми документами.
+
     :param patent_text: Текст патента для обработки
     :param model_path: Путь к модели LLM (опционально)
-    :param chunk_size: Размер чанка для обработки
-    :param overlap: Перекрытие между чанками
+    :param settings: Параметры разбиения и обработки (опционально)
+    :param manager: Менеджер модели LLM (опционально)
+    :param report: Словарь, в который записывается отчет об обработке
+        (число чанков, токены по чанкам и т.п.)
+    :param on_event: Обработчик событий о ходе обработки: ``chunks``
+        (число чанков), ``chunk_line`` (строка ответа по мере генерации),
+        ``chunk`` (свойства готового чанка), ``merge`` (начало сборки)
+    :param cache: Кэш ответов модели по чанкам (опционально)
+    :param session: Сессия документа в планировщике ``manager.scheduler``
+        (приоритет, лимит, отмена); без нее документ занимает модель
+        приложения целиком
     :return: Извлеченная информация о сплавах
+    :raises CancelledError: Если сессия отменена до конца обработки
     """
+    if manager is None:
+        manager = model_manager
     if model_path is None:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(
-            current_dir, "mistral-7b-instruct-v0.2.Q4_K_M.gguf"
-        )
+        model_path = manager.model_path
+    if settings is None:
+        settings = ExtractionSettings()
+    if report is None:
+        report = {}
 
     if not os.path.exists(model_path):
         raise FileNotFoundError(
@@ -312,40 +772,27 @@ def extract_alloy_info_from_text(
         )
 
     if not patent_text or not patent_text.strip():
-        print("[LLM] Ошибка: текст патента пустой", flush=True)
+        logger.error("[LLM] Текст патента пустой")
         return ""
 
-    text_size = len(patent_text)
-    print(f"[LLM] Начало обработки текста патента "
-          f"(размер: {text_size} символов)", flush=True)
+    logger.info("[LLM] Начало обработки текста патента "
+                "(размер: %d символов)", len(patent_text))
     start_total_time = time.time()
 
-    print("[LLM] Загрузка модели...", flush=True)
-    model_load_start = time.time()
-    cpu_count = multiprocessing.cpu_count()
-    llm = _load_llm_model(model_path, cpu_count)
-    model_load_time = time.time() - model_load_start
-    print(f"[LLM] Модель загружена за {model_load_time:.1f}с", flush=True)
-
-    print(f"[LLM] Разбиение текста на чанки "
-          f"(размер чанка: {chunk_size} символов)...", flush=True)
-    chunks = split_text_into_chunks(patent_text, chunk_size, overlap)
-
-    if not chunks:
-        print("[LLM] Ошибка: не удалось разбить текст на чанки", flush=True)
-        return ""
-
-    print(f"[LLM] Текст разбит на {len(chunks)} чанков", flush=True)
-
-    summaries = _process_chunks(chunks, llm)
-
-    if summaries:
-        result = _build_final_summary(summaries, llm)
-    else:
-        print("[LLM] Не найдено информации об сплавах", flush=True)
-        result = ""
+    # С пулом моделей или сессией планировщика генерация идет по
+    # очереди с другими документами, а модель приложения вне очереди
+    # только токенизирует текст и не блокируется на весь документ
+    with manager.acquire(
+        model_path, exclusive=session is None and manager.workers < 2
+    ) as llm:
+        pool = manager.pool
+        report["llm_workers"] = manager.workers if pool is not None else 1
+        result = run_pipeline(
+            patent_text, llm, settings, report, pool,
+            run=ChunkRun(on_event=on_event, cache=cache, session=session)
+        )
 
-    total_time = time.time() - start_total_time
-    print(f"[LLM] Обработка завершена за {total_time:.1f}с", flush=True)
+    report["total_time"] = round(time.time() - start_total_time, 3)
+    logger.info("[LLM] Обработка завершена за %.1fс", report["total_time"])
 
     return result
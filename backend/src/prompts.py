@@ -0,0 +1,195 @@
+"""Module with prompt templates and helpers for calling the Llama model."""
+import functools
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from llama_cpp import Llama, LlamaGrammar
+
+logger = logging.getLogger(__name__)
+
+# Максимальное число генерируемых токенов для чанка и финальной сборки
+CHUNK_MAX_TOKENS = 500
+SUMMARY_MAX_TOKENS = 1000
+
+# Версия шаблонов промптов; увеличивается при любом изменении промптов
+# или грамматики ответа, чтобы кэшированные результаты старых промптов
+# не переиспользовались
+PROMPT_VERSION = "4"
+
+CHUNK_PROMPT_TEMPLATE = (
+    "Extract all explicitly stated information about metallic alloys "
+    "from the text.\n"
+    "List each property on a new line in format: "
+    "\"Property name: value\"\n"
+    "Use original wording and units from the text.\n"
+    "If no alloy information found, write \"No alloy information\".\n\n"
+    "Example:\n"
+    "Melting temperature: 1600 °C\n"
+    "Alloy composition: Fe 70%, Cr 20%, Ni 10%\n"
+    "Hardness: 350 HB\n\n"
+    "Text:\n"
+)
+
+SUMMARY_PROMPT_TEMPLATE = (
+    "Combine all information about metallic alloys from the "
+    "summaries below.\n"
+    "List each property on a new line in format: "
+    "\"Property name: value\"\n"
+    "Merge duplicates - if the same property appears multiple "
+    "times, keep the most complete version.\n"
+    "Use original wording and units.\n\n"
+    "Example:\n"
+    "Melting temperature: 1600 °C\n"
+    "Alloy composition: Fe 70%, Cr 20%, Ni 10%\n"
+    "Hardness: 350 HB\n\n"
+    "Summaries:\n"
+)
+
+CHUNK_JSON_PROMPT_TEMPLATE = (
+    "Extract all explicitly stated information about metallic alloys "
+    "from the text.\n"
+    "Answer with a JSON array of objects with keys \"property\", "
+    "\"value\" and \"unit\" (empty string if there is no unit).\n"
+    "Use original wording and units from the text.\n"
+    "If no alloy information found, answer [].\n\n"
+    "Example:\n"
+    "[{\"property\":\"Melting temperature\",\"value\":\"1600\","
+    "\"unit\":\"°C\"},"
+    "{\"property\":\"Alloy composition\","
+    "\"value\":\"Fe 70%, Cr 20%, Ni 10%\",\"unit\":\"\"},"
+    "{\"property\":\"Hardness\",\"value\":\"350\",\"unit\":\"HB\"}]"
+    "\n\n"
+    "Text:\n"
+)
+
+SUMMARY_JSON_PROMPT_TEMPLATE = (
+    "Combine all information about metallic alloys from the "
+    "JSON objects below.\n"
+    "Answer with a JSON array of objects with keys \"property\", "
+    "\"value\" and \"unit\".\n"
+    "Merge duplicates - if the same property appears multiple "
+    "times, keep the most complete version.\n"
+    "Use original wording and units.\n\n"
+    "Summaries:\n"
+)
+
+# Грамматика GBNF компактного JSON массива свойств: генерация
+# останавливается сразу после закрывающей скобки массива. Число
+# объектов и длина строк не ограничиваются грамматикой (составы
+# сплавов бывают длинными), длину ответа ограничивает max_tokens
+PROPERTIES_GBNF = r"""
+root ::= "[" ( item ( "," item )* )? "]"
+item ::= "{\"property\":" str ",\"value\":" str ",\"unit\":" str "}"
+str ::= "\"" char* "\""
+char ::= [^"\\\x7F\x00-\x1F] | "\\" ["\\/bfnrt]
+"""
+
+
+def prompt_templates(structured: bool) -> Tuple[str, str]:
+    """Возвращает шаблоны промптов чанка и сборки для режима вывода."""
+    if structured:
+        return CHUNK_JSON_PROMPT_TEMPLATE, SUMMARY_JSON_PROMPT_TEMPLATE
+    return CHUNK_PROMPT_TEMPLATE, SUMMARY_PROMPT_TEMPLATE
+
+
+@functools.lru_cache(maxsize=None)
+def properties_grammar() -> LlamaGrammar:
+    """Возвращает грамматику JSON массива свойств (создается один раз)."""
+    return LlamaGrammar.from_string(PROPERTIES_GBNF, verbose=False)
+
+
+def generation_options(
+    structured: bool,
+    max_tokens: int,
+    stop: List[str]
+) -> Dict[str, Any]:
+    """
+    Возвращает параметры генерации для режима вывода.
+
+    В структурированном режиме вывод ограничен грамматикой, поэтому
+    стоп-последовательности ``stop`` не нужны: генерация заканчивается
+    вместе с JSON массивом.
+
+    :param structured: Структурированный вывод (JSON массив свойств)
+    :param max_tokens: Максимальное число генерируемых токенов
+    :param stop: Стоп-последовательности для текстового вывода
+    :return: Именованные аргументы вызова модели
+    """
+    options: Dict[str, Any] = {
+        "temperature": 0.0,
+        "top_p": 0.9,
+        "top_k": 20,
+        "max_tokens": max_tokens,
+        "repeat_penalty": 1.1,
+        "echo": False,
+    }
+    if structured:
+        options["grammar"] = properties_grammar()
+    else:
+        options["stop"] = stop
+    return options
+
+
+def fit_prompt(
+    llm: Llama,
+    prompt_template: str,
+    text: str,
+    max_tokens: int
+) -> List[int]:
+    """
+    Собирает токены промпта и проверяет, что он помещается в контекст.
+
+    Шаблон и текст токенизируются отдельно, поэтому токены шаблона
+    всегда совпадают с сохраненным префиксом ``PromptPrefixCache``.
+    Если промпт вместе с ответом не помещается, текст сокращается по
+    токенам с предупреждением в логе, чтобы потеря текста была видна.
+
+    :return: Токены промпта для модели
+    """
+    prefix_tokens = llm.tokenize(prompt_template.encode("utf-8"),
+                                 add_bos=True)
+    text_tokens = llm.tokenize(text.encode("utf-8"), add_bos=False)
+    available = llm.n_ctx() - max_tokens - len(prefix_tokens)
+    if len(text_tokens) > available:
+        keep = max(0, available)
+        logger.warning("[LLM] Промпт (%d токенов) не помещается в контекст, "
+                       "текст сокращен до %d токенов",
+                       len(prefix_tokens) + len(text_tokens), keep)
+        text_tokens = text_tokens[:keep]
+    return list(prefix_tokens) + list(text_tokens)
+
+
+def complete(
+    llm: Llama,
+    prompt: List[int],
+    on_line: Optional[Callable[[str], None]] = None,
+    **kwargs: Any
+) -> str:
+    """
+    Выполняет запрос к модели и возвращает текст ответа.
+
+    Если задан ``on_line``, ответ читается потоково (``stream=True``) и
+    каждая законченная строка передается в ``on_line`` сразу после
+    генерации, не дожидаясь конца ответа.
+
+    :param llm: Загруженная модель LLM
+    :param prompt: Токены промпта
+    :param on_line: Обработчик готовых строк ответа (опционально)
+    :return: Полный текст ответа
+    """
+    if on_line is None:
+        return llm(prompt, **kwargs)["choices"][0]["text"]
+
+    text = ""
+    sent = 0
+    for part in llm(prompt, stream=True, **kwargs):
+        text += part["choices"][0]["text"]
+        end = text.find("\n", sent)
+        while end != -1:
+            if text[sent:end].strip():
+                on_line(text[sent:end].strip())
+            sent = end + 1
+            end = text.find("\n", sent)
+    if text[sent:].strip():
+        on_line(text[sent:].strip())
+    return text
@@ -0,0 +1,185 @@
+"""Module for parsing and deduplicating "Property: value" lines."""
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+NO_ALLOY_INFO = "No alloy information"
+
+_PROPERTY_LINE = re.compile(
+    r"^\s*(?:[-*•]|\d+[.)])?\s*([^:]{1,120}?)\s*:\s*(.+?)\s*$"
+)
+_SPACES = re.compile(r"\s+")
+_DEGREES = re.compile(r"\s*(?:°|º|˚)\s*([CСF])\b|\s*℃", re.IGNORECASE)
+_SPACE_BEFORE_UNIT = re.compile(r"(\d)\s+(%|°)")
+_DECIMAL_COMMA = re.compile(r"(\d),(\d)")
+_TRAILING_PUNCT = re.compile(r"[\s.;,]+$")
+
+
+def parse_property_line(line: str) -> Optional[Tuple[str, str]]:
+    """
+    Разбирает строку вида "Property name: value".
+
+    :param line: Строка ответа модели
+    :return: Кортеж (свойство, значение) или None, если строка не
+        похожа на свойство
+    """
+    match = _PROPERTY_LINE.match(line)
+    if match is None:
+        return None
+    name, value = match.group(1).strip(), match.group(2).strip()
+    if not name or not value:
+        return None
+    return name, value
+
+
+def _normalize(text: str) -> str:
+    """Приводит строку к каноническому виду для сравнения."""
+    text = text.lower()
+    text = _DEGREES.sub(
+        lambda m: " °f" if m.group(1) in ("F", "f") else " °c", text
+    )
+    text = _DECIMAL_COMMA.sub(r"\1.\2", text)
+    text = _SPACE_BEFORE_UNIT.sub(r"\1\2", text)
+    text = _SPACES.sub(" ", text)
+    return _TRAILING_PUNCT.sub("", text).strip()
+
+
+def _as_item(obj: Any) -> Optional[Dict[str, str]]:
+    """Приводит разобранный JSON объект к виду {property, value, unit}."""
+    if not isinstance(obj, dict):
+        return None
+    name, value = obj.get("property"), obj.get("value")
+    if not isinstance(name, str) or not isinstance(value, str):
+        return None
+    if not name.strip() or not value.strip():
+        return None
+    unit = obj.get("unit")
+    return {
+        "property": name.strip(),
+        "value": value.strip(),
+        "unit": unit.strip() if isinstance(unit, str) else "",
+    }
+
+
+def item_from_line(line: str) -> Optional[Dict[str, str]]:
+    """
+    Разбирает строку с JSON объектом свойства.
+
+    :param line: Строка вида ``{"property": ..., "value": ..., "unit": ...}``
+    :return: Свойство или None, если строка не является таким объектом
+    """
+    line = line.strip()
+    if not line.startswith("{"):
+        return None
+    try:
+        return _as_item(json.loads(line))
+    except ValueError:
+        return None
+
+
+def item_to_line(item: Dict[str, str]) -> str:
+    """Записывает свойство компактным JSON объектом в одну строку."""
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+
+
+def _salvage_items(text: str) -> List[Dict[str, str]]:
+    """Извлекает полные JSON объекты из оборванного JSON массива."""
+    decoder = json.JSONDecoder()
+    items: List[Dict[str, str]] = []
+    position = text.find("{")
+    while position != -1:
+        try:
+            obj, end = decoder.raw_decode(text, position)
+        except ValueError:
+            position = text.find("{", position + 1)
+            continue
+        item = _as_item(obj)
+        if item is not None:
+            items.append(item)
+        position = text.find("{", end)
+    return items
+
+
+def parse_properties(text: str) -> List[Dict[str, str]]:
+    """
+    Разбирает ответ модели в список свойств {property, value, unit}.
+
+    Поддерживаются JSON массив (структурированный вывод; из оборванного
+    по лимиту токенов массива извлекаются полные объекты), JSON объекты
+    по одному на строке и строки "Property name: value" (единица
+    измерения остается в значении, ``unit`` пустой).
+
+    :param text: Ответ модели
+    :return: Список свойств в исходном порядке
+    """
+    text = text.strip()
+    if text.startswith("["):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return _salvage_items(text)
+        if isinstance(data, list):
+            return [item for item in map(_as_item, data) if item is not None]
+
+    items: List[Dict[str, str]] = []
+    for line in text.splitlines():
+        item = item_from_line(line)
+        if item is None:
+            parsed = parse_property_line(line)
+            if parsed is None or is_no_info(line):
+                continue
+            item = {"property": parsed[0], "value": parsed[1], "unit": ""}
+        items.append(item)
+    return items
+
+
+def property_key(line: str) -> str:
+    """
+    Возвращает нормализованный ключ строки для поиска дубликатов.
+
+    Для строк "свойство: значение" и JSON объектов свойств регистр,
+    пробелы, запятая в дробях и написание градусов не различаются;
+    остальные строки сравниваются после нормализации пробелов и
+    регистра.
+
+    :param line: Строка ответа модели
+    :return: Ключ для сравнения
+    """
+    item = item_from_line(line)
+    if item is not None:
+        value = f"{item['value']} {item['unit']}".strip()
+        return f"{_normalize(item['property'])}: {_normalize(value)}"
+    parsed = parse_property_line(line)
+    if parsed is None:
+        return _normalize(line)
+    return f"{_normalize(parsed[0])}: {_normalize(parsed[1])}"
+
+
+def is_no_info(text: str) -> bool:
+    """Проверяет, что ответ модели означает отсутствие информации."""
+    return _normalize(text).startswith(NO_ALLOY_INFO.lower())
+
+
+def dedup_property_lines(texts: Iterable[str]) -> List[str]:
+    """
+    Объединяет строки нескольких ответов модели без дубликатов.
+
+    Пустые строки и ответы "No alloy information" отбрасываются; из
+    точных и нормализованных дубликатов остается первое вхождение.
+
+    :param texts: Ответы модели (сводки по чанкам)
+    :return: Список уникальных строк в исходном порядке
+    """
+    seen = set()
+    lines: List[str] = []
+    for text in texts:
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or is_no_info(line):
+                continue
+            key = property_key(line)
+            if key in seen:
+                continue
+            seen.add(key)
+            lines.append(line)
+    return lines
@@ -0,0 +1,83 @@
+"""Module with a cheap relevance pre-filter for patent text chunks."""
+import re
+from typing import List, Tuple
+
+# Химические элементы, встречающиеся в составах сплавов
+ELEMENTS = (
+    "Fe|Cr|Ni|Mo|Mn|Si|Al|Ti|V|W|Co|Cu|Nb|Zr|Ta|Hf|Re|Mg|Zn|Sn|Pb|Ag|Au|"
+    "Pt|Pd|Ir|Ru|Rh|Be|Li|Ca|Ce|La|Y|Sc|Nd|Bi|Sb|Ga|Ge|In|Cd|Te|Se|"
+    "C|N|B|P|S|O|H"
+)
+
+_NUMBER = r"\d+(?:[.,]\d+)?"
+
+# Признаки значений состава и свойств сплавов и их веса
+_VALUE_FEATURES: Tuple[Tuple["re.Pattern[str]", float], ...] = (
+    # Содержание элемента: "Cr 20", "Cr: 18-20", "20% Cr", "Fe-20Cr"
+    (re.compile(
+        rf"\b(?:{ELEMENTS})\s*[:=]?\s*{_NUMBER}"
+        rf"|{_NUMBER}\s*%?\s*(?:{ELEMENTS})\b"
+    ), 1.0),
+    # Единицы состава: wt%, at%, mass%, масс.%, % by weight
+    (re.compile(
+        r"(?:wt|at|mass|масс|ат|вес)\.?\s*%"
+        r"|%\s*(?:by\s+(?:weight|mass)|по\s+массе)",
+        re.IGNORECASE
+    ), 2.0),
+    # Температуры
+    (re.compile(rf"{_NUMBER}\s*(?:°\s*[CСF]|℃|K\b)"), 1.0),
+    # Механические свойства: твердость и прочность
+    (re.compile(
+        rf"{_NUMBER}\s*(?:HB|HV|HRC|HRB|MPa|GPa|ksi|МПа|ГПа)\b"
+        r"|\b(?:HB|HV|HRC)\s*" + _NUMBER
+    ), 2.0),
+)
+
+# Признаки информации о сплавах: значения и ключевые слова
+_FEATURES = _VALUE_FEATURES + (
+    # Ключевые слова предметной области
+    (re.compile(
+        r"\b(?:alloy|steel|superalloy|hardness|tensile|yield strength"
+        r"|elongation|melting|annealing|quench|tempering|solution treat"
+        r"|сплав|стал[ьи]|твердост|прочност|удлинени|плавлени|отжиг"
+        r"|закалк|отпуск)",
+        re.IGNORECASE
+    ), 0.5),
+)
+
+# Порог по умолчанию: примерно два явных признака состава или свойств
+DEFAULT_RELEVANCE_THRESHOLD = 3.0
+
+
+def score_chunk(text: str) -> float:
+    """
+    Оценивает, насколько вероятно наличие информации о сплавах в тексте.
+
+    Оценка — взвешенное число совпадений признаков: содержание
+    элементов, единицы состава (wt%, at%), температуры, твердость и
+    прочность (HB, HV, MPa), ключевые слова.
+
+    :param text: Текст чанка
+    :return: Оценка релевантности (0 — признаков нет)
+    """
+    return sum(
+        weight * len(pattern.findall(text)) for pattern, weight in _FEATURES
+    )
+
+
+def filter_relevant_chunks(
+    chunks: List[str],
+    threshold: float = DEFAULT_RELEVANCE_THRESHOLD
+) -> Tuple[List[int], List[float]]:
+    """
+    Отбирает чанки, которые стоит отправлять в LLM.
+
+    :param chunks: Список текстовых чанков
+    :param threshold: Минимальная оценка релевантности (0 — без фильтра)
+    :return: Кортеж (индексы отобранных чанков, оценки всех чанков)
+    """
+    scores = [score_chunk(chunk) for chunk in chunks]
+    if threshold <= 0:
+        return list(range(len(chunks))), scores
+    kept = [i for i, score in enumerate(scores) if score >= threshold]
+    return kept, scores
@@ -0,0 +1,405 @@
+"""Module with a persistent content-addressed cache of processing results."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .metrics import CACHE_EVICTIONS, CACHE_LOOKUPS
+
+# Число новых страниц, после которого они записываются в кэш, не
+# дожидаясь конца документа
+PAGE_FLUSH = 16
+
+_SCHEMA = (
+    # Текст документа хранится по страницам (см. PageCache)
+    "DROP TABLE IF EXISTS texts",
+    """
+    CREATE TABLE IF NOT EXISTS pages (
+        doc_hash TEXT NOT NULL,
+        tables INTEGER NOT NULL,
+        page INTEGER NOT NULL,
+        pages INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        accessed_at REAL NOT NULL,
+        PRIMARY KEY (doc_hash, tables, page)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS chunks (
+        key TEXT PRIMARY KEY,
+        output TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        accessed_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS results (
+        key TEXT PRIMARY KEY,
+        doc_hash TEXT NOT NULL,
+        alloy_info TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        accessed_at REAL NOT NULL
+    )
+    """,
+)
+
+_TABLES = ("pages", "chunks", "results")
+
+# Виды обращений к кэшу в статистике
+_LOOKUP_KINDS = ("text", "page", "chunk", "result")
+
+
+def result_key(
+    doc_hash: str,
+    model_path: str,
+    prompt_version: str,
+    options: Dict[str, Any]
+) -> str:
+    """
+    Строит ключ результата LLM для документа и настроек обработки.
+
+    Любое изменение модели, версии промптов или параметров обработки
+    (``chunk_size``, ``overlap`` и т.п.) дает новый ключ, поэтому
+    устаревшие результаты не переиспользуются.
+
+    :param doc_hash: SHA-256 содержимого PDF
+    :param model_path: Путь к модели LLM
+    :param prompt_version: Версия шаблонов промптов
+    :param options: Параметры обработки, влияющие на результат
+    :return: Ключ кэша (hex SHA-256)
+    """
+    parts = [
+        doc_hash,
+        os.path.basename(model_path),
+        prompt_version,
+        json.dumps(options, sort_keys=True),
+    ]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def chunk_key(model_path: str, prompt: str, options: Dict[str, Any]) -> str:
+    """
+    Строит ключ ответа модели по одному чанку.
+
+    Ключ зависит только от модели, полного текста промпта (шаблон и
+    текст чанка) и параметров генерации, поэтому после изменения
+    ``chunk_size`` или промпта заново обрабатываются только чанки,
+    текст или промпт которых действительно изменился.
+
+    :param model_path: Путь к модели LLM
+    :param prompt: Текст промпта чанка
+    :param options: Параметры генерации (сериализуемые в JSON)
+    :return: Ключ кэша (hex SHA-256)
+    """
+    parts = [
+        os.path.basename(model_path),
+        prompt,
+        json.dumps(options, sort_keys=True),
+    ]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def _join_pages(texts: Sequence[str]) -> str:
+    """Собирает текст документа из текста страниц, как при извлечении."""
+    return "\n\n".join(text for text in texts if text).strip()
+
+
+class ResultCache:
+    """
+    Кэш результатов обработки патентов в SQLite.
+
+    Хранит текст страниц PDF (ключ — SHA-256 документа, режим разбора
+    таблиц и номер страницы), ответы модели по чанкам (ключ —
+    ``chunk_key``) и результат извлечения информации о сплавах (ключ —
+    ``result_key``). Общий размер записей ограничен ``max_bytes``; при
+    превышении удаляются записи, к которым дольше всего не обращались
+    (LRU).
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lookups = {
+            kind: {"hit": 0, "miss": 0} for kind in _LOOKUP_KINDS
+        }
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Открывает соединение с базой под блокировкой кэша."""
+        with self._lock:
+            conn = sqlite3.connect(self.path)
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+
+    def count_lookup(self, kind: str, found: bool) -> None:
+        """Учитывает попадание или промах кэша для записи вида ``kind``."""
+        result = "hit" if found else "miss"
+        CACHE_LOOKUPS.labels(kind, result).inc()
+        with self._lock:
+            self.lookups[kind][result] += 1
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_pages(
+        self,
+        doc_hash: str,
+        tables: bool = False
+    ) -> Tuple[int, Dict[int, str]]:
+        """
+        Возвращает сохраненные страницы документа.
+
+        :param doc_hash: SHA-256 содержимого PDF
+        :param tables: Страницы извлечены с разбором таблиц составов
+        :return: Кортеж (число страниц документа или 0, если страниц в
+            кэше нет; текст сохраненных страниц по номерам)
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT page, pages, text FROM pages "
+                "WHERE doc_hash = ? AND tables = ? ORDER BY page",
+                (doc_hash, int(tables))
+            ).fetchall()
+            if rows:
+                conn.execute(
+                    "UPDATE pages SET accessed_at = ? "
+                    "WHERE doc_hash = ? AND tables = ?",
+                    (time.time(), doc_hash, int(tables))
+                )
+        pages_count = rows[0][1] if rows else 0
+        return pages_count, {page: text for page, _, text in rows}
+
+    def put_pages(  # pylint: disable=too-many-arguments
+        self,
+        doc_hash: str,
+        tables: bool,
+        pages_count: int,
+        pages: Sequence[Tuple[int, str]]
+    ) -> None:
+        """Сохраняет текст страниц документа (номер страницы, текст)."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (doc_hash, int(tables), page, pages_count, text,
+                     len(text.encode("utf-8")), now)
+                    for page, text in pages
+                ]
+            )
+            self._evict(conn)
+
+    def get_text(
+        self,
+        doc_hash: str,
+        tables: bool = False
+    ) -> Optional[Tuple[str, Dict]]:
+        """
+        Возвращает текст документа, если в кэше есть все его страницы.
+
+        :param doc_hash: SHA-256 содержимого PDF
+        :param tables: Текст извлечен с разбором таблиц составов
+        :return: Кортеж (текст, метаданные) или None
+        """
+        pages_count, pages = self.get_pages(doc_hash, tables)
+        found = bool(pages) and len(pages) == pages_count
+        self.count_lookup("text", found)
+        if not found:
+            return None
+        text = _join_pages([pages[page] for page in sorted(pages)])
+        return text, {"tables": tables, "pages": pages_count}
+
+    def pages(self, doc_hash: str, tables: bool = False) -> "PageCache":
+        """Возвращает кэш страниц документа для извлечения текста."""
+        return PageCache(self, doc_hash, tables)
+
+    def get_chunk(self, key: str) -> Optional[str]:
+        """
+        Возвращает сохраненный ответ модели по чанку.
+
+        :param key: Ключ, построенный ``chunk_key``
+        :return: Ответ модели или None
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT output FROM chunks WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE chunks SET accessed_at = ? WHERE key = ?",
+                    (time.time(), key)
+                )
+        self.count_lookup("chunk", row is not None)
+        return None if row is None else row[0]
+
+    def put_chunk(self, key: str, output: str) -> None:
+        """Сохраняет ответ модели по чанку."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)",
+                (key, output, len(output.encode("utf-8")), time.time())
+            )
+            self._evict(conn)
+
+    def get_result(self, key: str) -> Optional[str]:
+        """
+        Возвращает сохраненный результат извлечения информации о сплавах.
+
+        :param key: Ключ, построенный ``result_key``
+        :return: Информация о сплавах или None
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT alloy_info FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE results SET accessed_at = ? WHERE key = ?",
+                    (time.time(), key)
+                )
+        self.count_lookup("result", row is not None)
+        return None if row is None else row[0]
+
+    def put_result(self, key: str, doc_hash: str, alloy_info: str) -> None:
+        """Сохраняет результат извлечения информации о сплавах."""
+        size = len(alloy_info.encode("utf-8"))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, doc_hash, alloy_info, size, time.time())
+            )
+            self._evict(conn)
+
+    def lookup(
+        self,
+        doc_hash: str,
+        key: str,
+        tables: bool = False
+    ) -> Optional[Tuple[str, Dict, str]]:
+        """
+        Возвращает полный результат обработки документа, если он есть.
+
+        :param doc_hash: SHA-256 содержимого PDF
+        :param key: Ключ, построенный ``result_key``
+        :param tables: Текст извлечен с разбором таблиц составов
+        :return: Кортеж (текст, метаданные, информация о сплавах) или None
+        """
+        alloy_info = self.get_result(key)
+        if alloy_info is None:
+            return None
+        text = self.get_text(doc_hash, tables)
+        if text is None:
+            return None
+        return text[0], text[1], alloy_info
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """
+        Удаляет давно не использованные записи сверх лимита размера.
+
+        Страницы вытесняются по одной, поэтому от документа может
+        остаться часть страниц; недостающие извлекаются заново.
+        """
+        total = sum(
+            conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}")
+            .fetchone()[0]
+            for table in _TABLES
+        )
+        if total <= self.max_bytes:
+            return
+        oldest = conn.execute(
+            " UNION ALL ".join(
+                f"SELECT '{table}', rowid, size, accessed_at FROM {table}"
+                for table in _TABLES
+            ) + " ORDER BY accessed_at"
+        )
+        evicted: List[Tuple[str, int]] = []
+        for table, rowid, size, _ in oldest:
+            if total <= self.max_bytes:
+                break
+            evicted.append((table, rowid))
+            total -= size
+        oldest.close()
+        for table, rowid in evicted:
+            conn.execute(f"DELETE FROM {table} WHERE rowid = ?", (rowid,))
+            CACHE_EVICTIONS.labels(table).inc()
+        self.evictions += len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает число записей, общий размер и статистику попаданий."""
+        with self._connect() as conn:
+            entries = {
+                table: conn.execute(
+                    f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {table}"
+                ).fetchone()
+                for table in _TABLES
+            }
+        return {
+            "entries": {table: row[0] for table, row in entries.items()},
+            "size_bytes": sum(row[1] for row in entries.values()),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "lookups": {
+                kind: dict(counts) for kind, counts in self.lookups.items()
+            },
+            "evictions": self.evictions,
+        }
+
+
+class PageCache:
+    """
+    Текст страниц одного документа в ``ResultCache``.
+
+    Сохраненные страницы читаются одним запросом при создании. Новые
+    страницы записываются пакетами по ``PAGE_FLUSH`` страниц и при
+    ``flush``, поэтому прерванное извлечение продолжается с первой
+    несохраненной страницы.
+    """
+
+    def __init__(self, cache: ResultCache, doc_hash: str, tables: bool):
+        self.cache = cache
+        self.doc_hash = doc_hash
+        self.tables = tables
+        _, self.texts = cache.get_pages(doc_hash, tables)
+        self._pending: List[Tuple[int, str]] = []
+        self._pages_count = 0
+
+    def get(self, page: int) -> Optional[str]:
+        """Возвращает сохраненный текст страницы (с 1) или None."""
+        text = self.texts.get(page)
+        self.cache.count_lookup("page", text is not None)
+        return text
+
+    def put(self, page: int, pages_count: int, text: str) -> None:
+        """Добавляет извлеченную страницу документа из ``pages_count``."""
+        self.texts[page] = text
+        self._pending.append((page, text))
+        self._pages_count = pages_count
+        if len(self._pending) >= PAGE_FLUSH:
+            self.flush()
+
+    def flush(self) -> None:
+        """Записывает накопленные страницы в кэш."""
+        if self._pending:
+            self.cache.put_pages(
+                self.doc_hash, self.tables, self._pages_count, self._pending
+            )
+            self._pending = []
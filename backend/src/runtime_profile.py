@@ -0,0 +1,157 @@
+"""Module for the calibrated CPU runtime profile of the Llama model."""
+import json
+import logging
+import math
+import os
+from dataclasses import asdict, dataclass, field, replace
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Размер пакета вычисления промпта без профиля
+DEFAULT_N_BATCH = 1024
+
+# Файлы ограничения CPU контейнера: cgroup v2 и cgroup v1
+_CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+_CGROUP_V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+_CGROUP_V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read_file(path: str) -> Optional[str]:
+    """Возвращает содержимое файла или None, если его нет."""
+    try:
+        with open(path, encoding="utf-8") as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit() -> Optional[int]:
+    """
+    Возвращает квоту CPU контейнера, округленную вверх до целых CPU.
+
+    :return: Число CPU или None, если квота не задана
+    """
+    cpu_max = _read_file(_CGROUP_V2_CPU_MAX)
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(" ")
+    else:
+        quota = _read_file(_CGROUP_V1_QUOTA) or "-1"
+        period = _read_file(_CGROUP_V1_PERIOD) or "100000"
+    if quota in ("max", "-1"):
+        return None
+    try:
+        return max(1, math.ceil(int(quota) / int(period)))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def available_cpus() -> int:
+    """
+    Возвращает число CPU, доступных процессу.
+
+    В отличие от ``multiprocessing.cpu_count()`` учитывает привязку
+    процесса к ядрам (``sched_getaffinity``) и квоту CPU cgroup, поэтому
+    в контейнере с лимитом в 4 CPU на 64-ядерном сервере возвращает 4.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    return min(cpus, limit) if limit is not None else cpus
+
+
+@dataclass
+class RuntimeProfile:
+    """
+    Параметры llama.cpp для одного экземпляра модели на CPU.
+
+    Профиль создается командой калибровки (``benchmarks/calibrate.py``)
+    для ``workers`` одновременно работающих экземпляров модели и
+    читается загрузчиком модели при запуске.
+
+    :ivar n_threads: Потоки генерации
+    :ivar n_threads_batch: Потоки вычисления промпта
+    :ivar n_batch: Размер пакета вычисления промпта
+    :ivar use_mlock: Закрепить веса модели в памяти
+    :ivar model_path: Выбранный вариант квантования модели (пустая
+        строка — модель из настроек)
+    :ivar workers: Число экземпляров модели, для которого подобран профиль
+    :ivar measurements: Результаты замера (токены в секунду, число CPU)
+    """
+
+    n_threads: int
+    n_threads_batch: int
+    n_batch: int = DEFAULT_N_BATCH
+    use_mlock: bool = False
+    model_path: str = ""
+    workers: int = 1
+    measurements: Dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def default(cls, cpus: int, workers: int = 1) -> "RuntimeProfile":
+        """Профиль без калибровки: CPU поровну между экземплярами."""
+        threads = max(1, cpus // max(1, workers))
+        return cls(n_threads=threads, n_threads_batch=threads, workers=workers)
+
+    def scaled(self, workers: int, cpus: int) -> "RuntimeProfile":
+        """
+        Пересчитывает профиль на другое число экземпляров модели.
+
+        Размер пакета и закрепление памяти сохраняются, а потоки
+        делятся так, чтобы их общее число не превышало ``cpus``.
+
+        :param workers: Число экземпляров модели
+        :param cpus: Число доступных CPU
+        :return: Профиль одного экземпляра
+        """
+        if workers == self.workers:
+            return self
+        workers = max(1, workers)
+        return replace(
+            self,
+            n_threads=max(
+                1, min(cpus, self.n_threads * self.workers) // workers
+            ),
+            n_threads_batch=max(
+                1, min(cpus, self.n_threads_batch * self.workers) // workers
+            ),
+            workers=workers
+        )
+
+
+def load_profile(path: str) -> Optional[RuntimeProfile]:
+    """
+    Читает профиль из JSON файла.
+
+    Поврежденный профиль не мешает запуску: в лог выводится
+    предупреждение, и модель загружается с параметрами по умолчанию.
+
+    :param path: Путь к файлу профиля
+    :return: Профиль или None, если файла нет или он поврежден
+    """
+    text = _read_file(path)
+    if text is None:
+        return None
+    try:
+        profile = RuntimeProfile(**json.loads(text))
+    except (TypeError, ValueError) as e:
+        logger.warning("[LLM] Профиль %s не прочитан: %s", path, e)
+        return None
+    cpus = profile.measurements.get("cpus")
+    if cpus and cpus != available_cpus():
+        logger.warning("[LLM] Профиль %s подобран для %d CPU, доступно %d; "
+                       "рекомендуется повторить калибровку",
+                       path, cpus, available_cpus())
+    logger.info("[LLM] Профиль модели: %s", path)
+    return profile
+
+
+def save_profile(profile: RuntimeProfile, path: str) -> None:
+    """Записывает профиль в JSON файл."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(asdict(profile), file, ensure_ascii=False, indent=2)
+        file.write("\n")
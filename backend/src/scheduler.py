@@ -0,0 +1,334 @@
+"""Module with a chunk-level scheduler shared by concurrent documents."""
+import contextlib
+import functools
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple
+)
+
+from .metrics import CHUNK_WAIT_SECONDS
+
+# Порядок выбора документа, чанк которого запускается следующим:
+# "fair" — документ, дольше всех не получавший модель (по кругу),
+# "shortest" — документ с наименьшим числом оставшихся чанков
+POLICIES = ("fair", "shortest")
+
+# Запуск задачи на модели: возвращает Future ее результата
+Start = Callable[[], Future]
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerSession:  # pylint: disable=too-many-instance-attributes
+    """
+    Задачи модели одного документа в планировщике.
+
+    Задачи ставятся в очередь ``submit`` (пул процессов) или
+    выполняются в потоке документа внутри ``turn()`` (одна модель
+    приложения). ``cancel()`` отменяет задачи, которые еще не
+    запущены; запущенные задачи доделываются.
+
+    :ivar name: Имя документа для логов
+    :ivar priority: Приоритет: задачи документов с большим приоритетом
+        запускаются первыми
+    :ivar limit: Максимальное число одновременно выполняемых задач
+        документа (0 — без ограничения)
+    """
+
+    def __init__(
+        self,
+        scheduler: "ChunkScheduler",
+        name: str,
+        priority: int = 0,
+        limit: int = 0
+    ):
+        self.name = name
+        self.priority = priority
+        self.limit = max(0, limit)
+        self.pending: Deque[Tuple[Future, Start, float]] = deque()
+        self.running = 0
+        self.expected = 0
+        self.completed = 0
+        self.served = 0
+        self.cancelled = False
+        self._scheduler = scheduler
+
+    @property
+    def remaining(self) -> int:
+        """Число задач документа, которые еще не завершены."""
+        return max(
+            self.expected - self.completed, len(self.pending) + self.running
+        )
+
+    def expect(self, tasks: int) -> None:
+        """
+        Сообщает, сколько еще задач поставит документ.
+
+        Используется политикой ``shortest``, когда задачи выполняются
+        по одной через ``turn()`` и очередь документа короче остатка.
+        """
+        with self._scheduler.lock:
+            self.expected = self.completed + max(0, tasks)
+
+    def submit(self, start: Start) -> Future:
+        """
+        Ставит задачу в очередь планировщика.
+
+        :param start: Запускает задачу (например, ``pool.submit``), когда
+            подходит очередь документа
+        :return: Future с результатом задачи; отменяется при ``cancel()``
+        """
+        return self._scheduler.submit(self, start)
+
+    @contextlib.contextmanager
+    def turn(self) -> Iterator[None]:
+        """
+        Ждет очереди документа и держит место модели до выхода из блока.
+
+        :raises CancelledError: Если документ отменен
+        """
+        granted = threading.Event()
+        release: Future = Future()
+
+        def start() -> Future:
+            granted.set()
+            return release
+
+        ticket = self.submit(start)
+        ticket.add_done_callback(lambda _: granted.set())
+        granted.wait()
+        if ticket.cancelled():
+            raise CancelledError(f"Обработка {self.name} отменена")
+        try:
+            yield
+        finally:
+            release.set_result(None)
+
+    def cancel(self) -> None:
+        """Отменяет еще не запущенные задачи документа."""
+        self._scheduler.cancel(self)
+
+    def close(self) -> None:
+        """Удаляет документ из планировщика."""
+        self._scheduler.close(self)
+
+    def __enter__(self) -> "SchedulerSession":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class ChunkScheduler:
+    """
+    Распределяет задачи модели всех обрабатываемых документов по местам.
+
+    Мест столько, сколько экземпляров модели (процессов пула или одна
+    модель приложения); в модель передается не больше задач, чем мест,
+    а остальные ждут в очередях документов. Освободившееся место
+    получает документ с наибольшим приоритетом, а среди равных — по
+    ``policy``: ``fair`` — дольше всех ждавший (чанки документов
+    чередуются), ``shortest`` — с наименьшим числом оставшихся задач.
+    Поэтому короткий патент не ждет, пока обработается длинный,
+    загруженный раньше.
+    """
+
+    def __init__(self, slots: int = 1, policy: str = "fair"):
+        if policy not in POLICIES:
+            raise ValueError(
+                f"Неизвестная политика планировщика: {policy} "
+                f"(допустимы: {', '.join(POLICIES)})"
+            )
+        self.policy = policy
+        self.lock = threading.Lock()
+        self._slots = max(1, slots)
+        self._running = 0
+        self._sessions: List[SchedulerSession] = []
+        self._turns = itertools.count(1)
+
+    @property
+    def slots(self) -> int:
+        """Число задач, одновременно выполняемых моделью."""
+        return self._slots
+
+    def resize(self, slots: int) -> None:
+        """Меняет число мест (например, после запуска пула процессов)."""
+        with self.lock:
+            self._slots = max(1, slots)
+        self._dispatch()
+
+    def session(
+        self,
+        name: str,
+        priority: int = 0,
+        limit: int = 0
+    ) -> SchedulerSession:
+        """
+        Регистрирует документ в планировщике.
+
+        :param name: Имя документа для логов
+        :param priority: Приоритет документа (больше — раньше)
+        :param limit: Максимальное число одновременно выполняемых задач
+            документа (0 — без ограничения)
+        :return: Сессия документа; закрывается ``close()`` или выходом
+            из блока ``with``
+        """
+        # Новый документ еще не получал модель и идет первым среди
+        # документов того же приоритета
+        session = SchedulerSession(self, name, priority, limit)
+        with self.lock:
+            self._sessions.append(session)
+        return session
+
+    def submit(self, session: SchedulerSession, start: Start) -> Future:
+        """Ставит задачу документа в очередь (см. ``SchedulerSession``)."""
+        ticket: Future = Future()
+        with self.lock:
+            if session.cancelled:
+                ticket.cancel()
+                return ticket
+            session.pending.append((ticket, start, time.time()))
+        self._dispatch()
+        return ticket
+
+    def cancel(self, session: SchedulerSession) -> None:
+        """Отменяет еще не запущенные задачи документа."""
+        with self.lock:
+            session.cancelled = True
+            pending = list(session.pending)
+            session.pending.clear()
+        for ticket, _, _ in pending:
+            ticket.cancel()
+        if pending:
+            logger.info("[LLM] Обработка %s отменена, не запущено задач: %d",
+                        session.name, len(pending))
+
+    def close(self, session: SchedulerSession) -> None:
+        """Отменяет оставшиеся задачи документа и удаляет его."""
+        with self.lock:
+            pending = list(session.pending)
+            session.pending.clear()
+            if session in self._sessions:
+                self._sessions.remove(session)
+        for ticket, _, _ in pending:
+            ticket.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает состояние планировщика для API."""
+        with self.lock:
+            return {
+                "policy": self.policy,
+                "slots": self._slots,
+                "running": self._running,
+                "documents": len(self._sessions),
+                "pending": sum(
+                    len(session.pending) for session in self._sessions
+                ),
+            }
+
+    def _pick(self) -> Optional[SchedulerSession]:
+        """Выбирает документ для свободного места (под ``lock``)."""
+        ready = [
+            session for session in self._sessions
+            if session.pending
+            and (not session.limit or session.running < session.limit)
+        ]
+        if not ready:
+            return None
+        if self.policy == "shortest":
+            return min(ready, key=lambda session: (
+                -session.priority, session.remaining, session.served
+            ))
+        return min(
+            ready, key=lambda session: (-session.priority, session.served)
+        )
+
+    def _dispatch(self) -> None:
+        """Запускает задачи, пока есть свободные места."""
+        while True:
+            with self.lock:
+                if self._running >= self._slots:
+                    return
+                session = self._pick()
+                if session is None:
+                    return
+                ticket, start, queued_at = session.pending.popleft()
+                if not ticket.set_running_or_notify_cancel():
+                    continue
+                session.running += 1
+                session.served = next(self._turns)
+                self._running += 1
+            CHUNK_WAIT_SECONDS.observe(time.time() - queued_at)
+            try:
+                task = start()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                self._release(session)
+                ticket.set_exception(e)
+                continue
+            task.add_done_callback(
+                lambda task, session=session, ticket=ticket:
+                    self._finished(session, ticket, task)
+            )
+
+    def _release(self, session: SchedulerSession) -> None:
+        """Освобождает место завершенной задачи документа."""
+        with self.lock:
+            session.running -= 1
+            session.completed += 1
+            self._running -= 1
+
+    def _finished(
+        self,
+        session: SchedulerSession,
+        ticket: Future,
+        task: Future
+    ) -> None:
+        """Передает результат задачи и запускает следующие."""
+        self._release(session)
+        if task.cancelled():
+            ticket.set_exception(CancelledError())
+        elif task.exception() is not None:
+            ticket.set_exception(task.exception())
+        else:
+            ticket.set_result(task.result())
+        self._dispatch()
+
+
+def scheduled_turn(
+    session: Optional[SchedulerSession]
+) -> ContextManager[Any]:
+    """Ждет очереди документа к модели (без сессии — сразу)."""
+    if session is None:
+        return contextlib.nullcontext()
+    return session.turn()
+
+
+def scheduled_submit(
+    executor: Any,
+    session: Optional[SchedulerSession],
+    fn: Callable[..., Any],
+    *args: Any
+) -> Future:
+    """
+    Ставит вызов ``fn(*args)`` в ``executor`` через очередь документа.
+
+    :param executor: Объект с методом ``submit`` (пул процессов модели)
+    :param session: Сессия документа (None — сразу в ``executor``)
+    :return: Future с результатом вызова
+    """
+    if session is None:
+        return executor.submit(fn, *args)
+    return session.submit(functools.partial(executor.submit, fn, *args))
@@ -0,0 +1,192 @@
+"""Module for splitting patent text into sections by headings."""
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Sequence, Tuple
+
+# Виды разделов патента; текст до первого заголовка относится к "front"
+SECTION_KINDS = (
+    "front", "abstract", "field", "background", "summary", "drawings",
+    "description", "examples", "claims",
+)
+
+# Заголовок — короткая отдельная строка
+_MAX_HEADING_CHARS = 80
+
+# Необязательная нумерация заголовка: "1.", "II.", "(3)", "[4]"
+_NUMBERING = r"(?:(?:\d+|[IVX]+)\s*[.)]|\(\d+\)|\[\d+\])?\s*"
+
+_HEADINGS: Tuple[Tuple[str, "re.Pattern[str]"], ...] = tuple(
+    (kind, re.compile(
+        rf"{_NUMBERING}(?:{pattern})\s*[:.]?", re.IGNORECASE
+    ))
+    for kind, pattern in (
+        ("abstract", r"abstract(?: of the disclosure)?"),
+        ("field", r"(?:technical )?field(?: of the (?:invention|disclosure))?"
+                  r"|technical field"),
+        ("background",
+         r"background(?: of the (?:invention|disclosure)| art)?"
+         r"|(?:description of )?(?:the )?(?:related|prior) art"),
+        ("summary",
+         r"(?:brief )?summary(?: of the (?:invention|disclosure))?"
+         r"|disclosure of (?:the )?invention|technical problem"
+         r"|solution to (?:the )?problem"),
+        ("drawings",
+         r"brief description of (?:the )?(?:drawings?|figures?)"),
+        ("description",
+         r"(?:detailed )?description(?: of (?:the )?(?:preferred )?"
+         r"(?:embodiments?|invention))?"
+         r"|(?:best )?mode for carrying out the invention"
+         r"|industrial applicability"),
+        ("examples",
+         r"(?:(?:working|comparative|inventive) )?examples?"
+         r"(?: \d+[a-z]?(?: (?:to|and|-) \d+[a-z]?)?)?"),
+        ("claims",
+         r"claims?|what is claimed is|(?:we|i) claim"
+         r"|the invention claimed is"),
+    )
+)
+
+# Нумерация формулы без заголовка: "1. An alloy ..." и зависимый пункт
+# "2. The alloy according to claim 1 ..."
+_FIRST_CLAIM = re.compile(r"1\s*\.\s+(?:An?|The)\s")
+_DEPENDENT_CLAIM = re.compile(r"\d+\s*\.\s+The\s.*\bclaims?\s+1\b")
+
+
+@dataclass
+class Section:
+    """
+    Раздел текста патента.
+
+    :ivar kind: Вид раздела (один из ``SECTION_KINDS``)
+    :ivar title: Строка заголовка (пустая для "front")
+    :ivar text: Текст раздела без заголовка
+    """
+
+    kind: str
+    title: str
+    text: str
+
+
+def heading_kind(line: str, previous: str = "") -> str:
+    """
+    Определяет вид раздела по строке заголовка.
+
+    Заголовок начинается не со строчной буквы и не продолжает
+    предложение предыдущей строки (она не оканчивается строчной буквой,
+    запятой или дефисом), поэтому перенесенное на отдельную строку
+    слово "example." заголовком не считается.
+
+    :param line: Строка текста
+    :param previous: Предыдущая строка текста
+    :return: Вид раздела или пустая строка, если это не заголовок
+    """
+    line = line.strip()
+    previous = previous.strip()
+    if not line or len(line) > _MAX_HEADING_CHARS or line[0].islower():
+        return ""
+    if previous and (previous[-1].islower() or previous[-1] in ",-"):
+        return ""
+    for kind, pattern in _HEADINGS:
+        if pattern.fullmatch(line):
+            return kind
+    return ""
+
+
+def _claims_start(lines: Sequence[str]) -> int:
+    """Находит первый пункт формулы без заголовка или возвращает -1."""
+    for i, line in enumerate(lines):
+        if _FIRST_CLAIM.match(line) and any(
+            _DEPENDENT_CLAIM.match(later) for later in lines[i + 1:]
+        ):
+            return i
+    return -1
+
+
+def split_sections(text: str) -> List[Section]:
+    """
+    Делит текст патента на разделы по строкам заголовков.
+
+    Заголовок — отдельная строка вида "BACKGROUND OF THE INVENTION",
+    "Example 3" или "What is claimed is:" (с необязательной нумерацией).
+    Если заголовка формулы нет, она начинается с пункта "1. An ...", за
+    которым следует зависимый пункт со ссылкой на пункт 1. Соседние
+    разделы одного вида объединяются, поэтому примеры подряд образуют
+    один раздел.
+
+    :param text: Текст патента
+    :return: Непустые разделы в порядке следования
+    """
+    lines = text.split("\n")
+    kinds = [
+        heading_kind(line, lines[i - 1] if i else "")
+        for i, line in enumerate(lines)
+    ]
+    if "claims" not in kinds:
+        claims = _claims_start(lines)
+        if claims >= 0:
+            lines.insert(claims, "")
+            kinds.insert(claims, "claims")
+
+    sections: List[Section] = []
+    current = Section("front", "", "")
+    body: List[str] = []
+    for line, kind in zip(lines, kinds):
+        if not kind:
+            body.append(line)
+            continue
+        if kind == current.kind:
+            body.append(line)
+            continue
+        current.text = "\n".join(body).strip()
+        if current.text or current.title:
+            sections.append(current)
+        current, body = Section(kind, line.strip(), ""), []
+    current.text = "\n".join(body).strip()
+    if current.text or current.title:
+        sections.append(current)
+    return [section for section in sections if section.text]
+
+
+def arrange_sections(
+    sections: Iterable[Section],
+    order: Sequence[str] = (),
+    skip: Sequence[str] = ()
+) -> Tuple[List[Section], List[Section]]:
+    """
+    Упорядочивает разделы для обработки и отбрасывает пропускаемые.
+
+    Разделы видов из ``order`` идут первыми в указанном порядке,
+    остальные — за ними в порядке следования в документе.
+
+    :param sections: Разделы патента
+    :param order: Приоритетные виды разделов
+    :param skip: Виды разделов, которые не обрабатываются
+    :return: Кортеж (разделы для обработки, пропущенные разделы)
+    """
+    kept: List[Section] = []
+    skipped: List[Section] = []
+    for section in sections:
+        (skipped if section.kind in skip else kept).append(section)
+    priority = {kind: i for i, kind in enumerate(order)}
+    kept.sort(key=lambda section: priority.get(section.kind, len(order)))
+    return kept, skipped
+
+
+def section_kinds(value: str) -> Tuple[str, ...]:
+    """
+    Разбирает список видов разделов через запятую.
+
+    :param value: Строка вида "examples,claims"
+    :return: Кортеж видов разделов
+    :raises ValueError: Если вид раздела неизвестен
+    """
+    kinds = tuple(
+        kind.strip().lower() for kind in value.split(",") if kind.strip()
+    )
+    unknown = [kind for kind in kinds if kind not in SECTION_KINDS]
+    if unknown:
+        raise ValueError(
+            f"Неизвестные разделы: {', '.join(unknown)} "
+            f"(допустимы: {', '.join(SECTION_KINDS)})"
+        )
+    return kinds
@@ -0,0 +1,292 @@
+"""Module for preparing patent text chunks before LLM processing."""
+import logging
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, List, Tuple
+
+from llama_cpp import Llama
+
+from .chunking import (
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_CONTEXT_SHARE,
+    chunk_token_budget,
+    count_llm_tokens,
+    split_text_into_chunks,
+    split_text_into_token_chunks
+)
+from .dedup import DEFAULT_DEDUP_THRESHOLD, fold_duplicate_texts
+from .fast_path import covers
+from .prompts import CHUNK_MAX_TOKENS, prompt_templates
+from .properties import item_to_line
+from .relevance import DEFAULT_RELEVANCE_THRESHOLD, filter_relevant_chunks
+from .sections import arrange_sections, split_sections
+
+logger = logging.getLogger(__name__)
+
+# Параметры, которые влияют только на скорость, но не на результат
+_PERFORMANCE_OPTIONS = ("prefix_cache",)
+
+
+@dataclass
+class ExtractionSettings:  # pylint: disable=too-many-instance-attributes
+    """
+    Параметры извлечения информации о сплавах из текста патента.
+
+    При ``token_chunking`` текст разбивается на чанки по токенам модели
+    так, чтобы промпт чанка вместе с ответом занимал ``context_share``
+    контекста; ``chunk_size`` и ``overlap`` используются только при
+    разбиении по символам. ``prefix_cache`` включает переиспользование
+    вычисленного префикса промпта между чанками. Чанки с оценкой
+    релевантности ниже ``relevance_threshold`` не отправляются в LLM
+    (0 отключает предварительный фильтр). Предложения, почти совпадающие
+    с уже встреченными (сходство не ниже ``dedup_threshold``, те же
+    числа), удаляются до разбиения на чанки (0 отключает). При
+    ``fast_path`` чанки, полностью разобранные регулярными выражениями
+    (``src/fast_path.py``), не отправляются в LLM. При
+    ``structured_output`` модель отвечает JSON массивом
+    ``[{property, value, unit}]``, форма которого задается грамматикой
+    GBNF. При ``sections`` текст делится на разделы патента
+    (``src/sections.py``) и чанки не пересекают их границ; разделы
+    видов ``section_order`` обрабатываются первыми, разделы
+    ``skip_sections`` не обрабатываются. При ``property_budget`` больше
+    0 чанки после набора этого числа свойств в LLM не отправляются.
+    """
+
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    overlap: int = DEFAULT_CHUNK_OVERLAP
+    token_chunking: bool = True
+    context_share: float = DEFAULT_CONTEXT_SHARE
+    prefix_cache: bool = True
+    relevance_threshold: float = DEFAULT_RELEVANCE_THRESHOLD
+    dedup_threshold: float = DEFAULT_DEDUP_THRESHOLD
+    fast_path: bool = True
+    structured_output: bool = False
+    sections: bool = True
+    section_order: Tuple[str, ...] = ()
+    skip_sections: Tuple[str, ...] = ()
+    property_budget: int = 0
+
+    def cache_options(self) -> Dict[str, Any]:
+        """Возвращает параметры, влияющие на результат (для ключа кэша)."""
+        options = asdict(self)
+        for name in _PERFORMANCE_OPTIONS:
+            options.pop(name)
+        return options
+
+
+def split_for_llm(
+    patent_text: str,
+    llm: Llama,
+    settings: ExtractionSettings,
+    report: Dict[str, Any]
+) -> List[str]:
+    """
+    Разбивает текст патента на чанки согласно настройкам.
+
+    Каждый раздел (см. ``_section_texts``) разбивается отдельно. В отчет
+    ``report`` записываются способ разбиения и число токенов каждого
+    чанка.
+    """
+    texts = _section_texts(patent_text, settings, report)
+    if not settings.token_chunking:
+        logger.info("[LLM] Разбиение текста на чанки "
+                    "(размер чанка: %d символов)...", settings.chunk_size)
+        report["chunking"] = "chars"
+        parts = [
+            split_text_into_chunks(text, settings.chunk_size, settings.overlap)
+            for text in texts
+        ]
+        _count_section_chunks(report, parts)
+        return [chunk for part in parts for chunk in part]
+
+    budget = chunk_token_budget(
+        llm,
+        prompt_templates(settings.structured_output)[0],
+        CHUNK_MAX_TOKENS,
+        settings.context_share
+    )
+    logger.info("[LLM] Разбиение текста на чанки "
+                "(бюджет чанка: %d токенов)...", budget)
+    token_parts = [
+        split_text_into_token_chunks(
+            text, lambda chunk: count_llm_tokens(llm, chunk), budget
+        )
+        for text in texts
+    ]
+    _count_section_chunks(report, token_parts)
+    token_chunks = [chunk for part in token_parts for chunk in part]
+    report["chunking"] = "tokens"
+    report["chunk_token_budget"] = budget
+    report["chunk_tokens"] = [tokens for _, tokens in token_chunks]
+    for i, (_, tokens) in enumerate(token_chunks, 1):
+        logger.debug("[LLM] Чанк %d/%d: %d токенов (%.0f%% бюджета)",
+                     i, len(token_chunks), tokens, 100 * tokens / budget)
+    return [chunk for chunk, _ in token_chunks]
+
+
+def _section_texts(
+    patent_text: str,
+    settings: ExtractionSettings,
+    report: Dict[str, Any]
+) -> List[str]:
+    """
+    Делит текст патента на разделы в порядке обработки.
+
+    Повторы предложений (``fold_duplicates``) удаляются после отбора
+    разделов: остается первое вхождение в обрабатываемых разделах, а
+    раздел из одних повторов не обрабатывается. Текст раздела
+    начинается со строки заголовка, чтобы модель видела, например, что
+    пример сравнительный. В отчет ``report["sections"]`` записываются
+    обрабатываемые разделы, в ``report["sections_skipped"]`` —
+    пропущенные.
+
+    :return: Тексты разделов (весь текст, если разделы отключены)
+    """
+    if not settings.sections:
+        return fold_duplicates([patent_text], settings, report)
+    kept, skipped = arrange_sections(
+        split_sections(patent_text),
+        settings.section_order,
+        settings.skip_sections
+    )
+    bodies = fold_duplicates(
+        [section.text for section in kept], settings, report
+    )
+    kept = [
+        replace(section, text=body.strip())
+        for section, body in zip(kept, bodies) if body.strip()
+    ]
+    report["sections"] = [
+        {"kind": section.kind, "title": section.title,
+         "chars": len(section.text)}
+        for section in kept
+    ]
+    report["sections_skipped"] = [
+        {"kind": section.kind, "title": section.title,
+         "chars": len(section.text)}
+        for section in skipped
+    ]
+    logger.info("[LLM] Разделов патента: %d (пропущено: %d)",
+                len(kept), len(skipped))
+    return [
+        f"{section.title}\n{section.text}" if section.title
+        else section.text
+        for section in kept
+    ]
+
+
+def _count_section_chunks(
+    report: Dict[str, Any],
+    parts: List[List[Any]]
+) -> None:
+    """Записывает в отчет число чанков каждого раздела."""
+    for section, part in zip(report.get("sections", []), parts):
+        section["chunks"] = len(part)
+
+
+def fold_duplicates(
+    texts: List[str],
+    settings: ExtractionSettings,
+    report: Dict[str, Any]
+) -> List[str]:
+    """
+    Удаляет повторы предложений из текстов перед разбиением на чанки.
+
+    Тексты — разделы патента в порядке обработки; из повторов остается
+    вхождение в первом из них. В отчет ``report["dedup"]``
+    записывается, какие предложения и в какие первые вхождения
+    объединены, чтобы результат оставался прослеживаемым.
+    """
+    folded_texts, folded = fold_duplicate_texts(
+        texts, settings.dedup_threshold
+    )
+    removed = sum(map(len, texts)) - sum(map(len, folded_texts))
+    report["dedup"] = {
+        "threshold": settings.dedup_threshold,
+        "passages_folded": len(folded),
+        "chars_removed": removed,
+        "folded": folded,
+    }
+    if folded:
+        logger.info("[LLM] Объединено повторов предложений: %d "
+                    "(%d символов)", len(folded), removed)
+    return folded_texts
+
+
+def _filter_chunks(
+    chunks: List[str],
+    settings: ExtractionSettings,
+    report: Dict[str, Any]
+) -> List[str]:
+    """
+    Отбрасывает чанки без признаков информации о сплавах.
+
+    В отчет ``report`` записываются оценки релевантности чанков и число
+    пропущенных чанков.
+    """
+    kept, scores = filter_relevant_chunks(
+        chunks, settings.relevance_threshold
+    )
+    skipped = len(chunks) - len(kept)
+    report["relevance_scores"] = [round(score, 1) for score in scores]
+    report["chunks_skipped"] = skipped
+    if skipped:
+        logger.info("[LLM] Пропущено чанков без информации о сплавах: "
+                    "%d из %d", skipped, len(chunks))
+    return [chunks[i] for i in kept]
+
+
+def _fast_path_chunks(
+    chunks: List[str],
+    settings: ExtractionSettings,
+    report: Dict[str, Any]
+) -> Tuple[List[str], List[str]]:
+    """
+    Отделяет чанки, полностью разобранные без LLM (``fast_path.covers``).
+
+    В отчет ``report["fast_path"]`` записываются число таких чанков и
+    найденных в них свойств.
+
+    :return: Кортеж (чанки для LLM, строки свойств разобранных чанков)
+    """
+    if not settings.fast_path:
+        return chunks, []
+    remaining: List[str] = []
+    lines: List[str] = []
+    for chunk in chunks:
+        items, covered = covers(chunk)
+        if not covered:
+            remaining.append(chunk)
+            continue
+        lines.extend(
+            item_to_line(item) if settings.structured_output
+            else f"{item['property']}: {item['value']} {item['unit']}".strip()
+            for item in items
+        )
+    report["fast_path"] = {
+        "chunks": len(chunks) - len(remaining),
+        "properties": len(lines),
+    }
+    if lines:
+        logger.info("[LLM] Разобрано без LLM чанков: %d из %d "
+                    "(свойств: %d)", len(chunks) - len(remaining),
+                    len(chunks), len(lines))
+    return remaining, lines
+
+
+def select_chunks(
+    chunks: List[str],
+    settings: ExtractionSettings,
+    report: Dict[str, Any]
+) -> Tuple[List[str], List[str]]:
+    """
+    Отбирает чанки для LLM: сначала быстрый путь, затем фильтр.
+
+    Короткие чанки со свойствами (например, "Hardness (A1): 350 HB")
+    набирают мало баллов релевантности, поэтому фильтр применяется
+    только к чанкам, которые не разобраны без LLM целиком.
+
+    :return: Кортеж (чанки для LLM, строки свойств разобранных чанков)
+    """
+    chunks, lines = _fast_path_chunks(chunks, settings, report)
+    return _filter_chunks(chunks, settings, report), lines
@@ -0,0 +1,245 @@
+"""Module for spooling uploaded PDF files to disk in fixed-size blocks."""
+import asyncio
+import hashlib
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from typing import IO, List, Optional, Tuple
+
+from fastapi import UploadFile
+
+# Размер блока, которым загрузка читается и записывается на диск
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+# Сигнатура PDF; по спецификации перед ней допускается до 1024 байт
+PDF_SIGNATURE = b"%PDF-"
+PDF_SIGNATURE_WINDOW = 1024
+
+# Сигнатура ZIP архива (локальный заголовок первого файла)
+ZIP_SIGNATURE = b"PK\x03\x04"
+
+
+class UploadError(Exception):
+    """Загрузка отклонена, с HTTP кодом для ответа клиенту."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class SpooledUpload:
+    """
+    Загруженный файл, сохраненный во временный файл.
+
+    :ivar path: Путь к уникальному временному файлу
+    :ivar doc_hash: SHA-256 содержимого
+    :ivar size: Размер в байтах
+    """
+
+    path: str
+    doc_hash: str
+    size: int
+
+    def remove(self) -> None:
+        """Удаляет временный файл, если он еще существует."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def is_zip_upload(file: UploadFile) -> bool:
+    """Проверяет по имени и типу содержимого, что загружен ZIP архив."""
+    return (
+        (file.filename or "").lower().endswith(".zip")
+        or file.content_type in ("application/zip",
+                                 "application/x-zip-compressed")
+    )
+
+
+def _check_signature(block: bytes, archive: bool) -> None:
+    """Проверяет сигнатуру PDF или ZIP в первом блоке файла."""
+    if archive and not block.startswith(ZIP_SIGNATURE):
+        raise UploadError("Файл не является ZIP архивом", status_code=400)
+    if not archive and PDF_SIGNATURE not in block[:PDF_SIGNATURE_WINDOW]:
+        raise UploadError("Файл не является PDF документом", status_code=400)
+
+
+async def spool_upload(
+    file: UploadFile,
+    max_bytes: int,
+    directory: Optional[str] = None,
+    block_size: int = UPLOAD_BLOCK_SIZE,
+    archive: bool = False
+) -> SpooledUpload:
+    """
+    Потоково сохраняет загрузку во временный файл с уникальным именем.
+
+    Файл читается блоками по ``block_size`` байт, SHA-256 считается в
+    том же проходе, поэтому память не растет с размером файла. Сигнатура
+    PDF проверяется по первому блоку, превышение ``max_bytes`` прерывает
+    чтение сразу; в обоих случаях временный файл удаляется.
+
+    :param file: Загруженный файл
+    :param max_bytes: Максимальный размер файла в байтах
+    :param directory: Каталог для временных файлов (по умолчанию
+        системный)
+    :param block_size: Размер блока чтения в байтах
+    :param archive: Ожидается ZIP архив, а не PDF
+    :return: Сохраненная загрузка
+    :raises UploadError: Если файл не PDF (не ZIP при ``archive``) (400)
+        или слишком большой (413)
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(
+        prefix="patent-", suffix=".zip" if archive else ".pdf", dir=directory
+    )
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            while True:
+                block = await file.read(block_size)
+                if not block:
+                    break
+                if size == 0:
+                    _check_signature(block, archive)
+                size += len(block)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                digest.update(block)
+                await asyncio.to_thread(spool.write, block)
+        if size == 0:
+            raise UploadError("Загружен пустой файл", status_code=400)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path=path, doc_hash=digest.hexdigest(), size=size)
+
+
+def unpack_pdfs(
+    archive_path: str,
+    max_bytes: int,
+    max_files: int,
+    directory: Optional[str] = None,
+    max_total_bytes: Optional[int] = None
+) -> List[Tuple[str, SpooledUpload]]:
+    """
+    Распаковывает PDF файлы ZIP архива во временные файлы.
+
+    Файлы распаковываются блоками с подсчетом SHA-256, как и обычные
+    загрузки; каталоги и файлы без расширения ``.pdf`` пропускаются.
+    Размер каждого файла и суммарный размер распакованных файлов
+    проверяются по мере распаковки, а не по заголовку архива, поэтому
+    сильно сжатый архив не заполнит диск. При ошибке уже распакованные
+    файлы удаляются.
+
+    :param archive_path: Путь к сохраненному архиву
+    :param max_bytes: Максимальный размер одного PDF в байтах
+    :param max_files: Максимальное число PDF в архиве
+    :param directory: Каталог для временных файлов (по умолчанию
+        системный)
+    :param max_total_bytes: Максимальный суммарный размер распакованных
+        PDF в байтах (по умолчанию не ограничен)
+    :return: Список пар (имя файла в архиве, сохраненный файл)
+    :raises UploadError: Если архив поврежден, содержит не PDF под
+        именем ``.pdf`` (400), слишком много файлов, слишком большой
+        файл или слишком большой суммарный размер (413)
+    """
+    unpacked: List[Tuple[str, SpooledUpload]] = []
+    total = 0
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir()
+                and info.filename.lower().endswith(".pdf")
+                and not info.filename.startswith("__MACOSX/")
+            ]
+            if len(members) > max_files:
+                raise UploadError(
+                    f"В архиве больше {max_files} PDF файлов",
+                    status_code=413
+                )
+            for info in members:
+                limit = _member_limit(max_bytes, max_total_bytes, total)
+                with archive.open(info) as member:
+                    upload = _unpack_member(member, limit, directory)
+                unpacked.append((info.filename, upload))
+                total += upload.size
+    except zipfile.BadZipFile as e:
+        _remove_all(unpacked)
+        raise UploadError(
+            f"Поврежденный ZIP архив: {e}", status_code=400
+        ) from e
+    except BaseException:
+        _remove_all(unpacked)
+        raise
+    return unpacked
+
+
+def _member_limit(
+    max_bytes: int,
+    max_total_bytes: Optional[int],
+    total: int
+) -> Tuple[int, UploadError]:
+    """
+    Возвращает допустимый размер следующего PDF архива и ошибку при
+    его превышении: лимит одного файла или остаток суммарного лимита.
+    """
+    if max_total_bytes is not None and max_total_bytes - total < max_bytes:
+        return max_total_bytes - total, UploadError(
+            f"Размер распакованных PDF превышает "
+            f"{max_total_bytes // 2 ** 20} МБ",
+            status_code=413
+        )
+    return max_bytes, _too_large(max_bytes)
+
+
+def _unpack_member(
+    member: IO[bytes],
+    limit: Tuple[int, UploadError],
+    directory: Optional[str]
+) -> SpooledUpload:
+    """
+    Распаковывает один PDF из архива во временный файл.
+
+    :param limit: Пара (максимальный размер в байтах, ошибка при его
+        превышении) из ``_member_limit``
+    """
+    max_bytes, too_large = limit
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix="patent-", suffix=".pdf", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            for block in iter(lambda: member.read(UPLOAD_BLOCK_SIZE), b""):
+                if size == 0:
+                    _check_signature(block, archive=False)
+                size += len(block)
+                if size > max_bytes:
+                    raise too_large
+                digest.update(block)
+                spool.write(block)
+        if size == 0:
+            raise UploadError("Загружен пустой файл", status_code=400)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path=path, doc_hash=digest.hexdigest(), size=size)
+
+
+def _remove_all(unpacked: List[Tuple[str, SpooledUpload]]) -> None:
+    """Удаляет временные файлы распакованных PDF."""
+    for _, upload in unpacked:
+        upload.remove()
+
+
+def _too_large(max_bytes: int) -> UploadError:
+    """Создает ошибку превышения максимального размера загрузки."""
+    return UploadError(
+        f"Размер файла превышает {max_bytes // 2 ** 20} МБ",
+        status_code=413
+    )
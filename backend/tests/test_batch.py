@@ -0,0 +1,90 @@
+import os
+import sys
+# Добавляем путь к backend для импорта модулей из пакета src
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+from src.batch import run_pipeline
+from src.jobs import JobError
+
+
+def test_run_pipeline_extracts_next_file_while_processing():
+    extracted = []
+    second_extracted = threading.Event()
+
+    def extract(index):
+        extracted.append(index)
+        if index == 1:
+            second_extracted.set()
+        return f"text {index}"
+
+    def process(index, text):
+        if index == 0:
+            # Текст второго файла готовится, пока обрабатывается первый
+            assert second_extracted.wait(5)
+        return {"filename": f"{index}.pdf", "status": "processed", "text": text}
+
+    results = run_pipeline(["0.pdf", "1.pdf", "2.pdf"], extract, process)
+
+    assert extracted == [0, 1, 2]
+    assert [result["text"] for result in results] == ["text 0", "text 1", "text 2"]
+
+
+def test_run_pipeline_isolates_failed_files_and_reports_each_result():
+    reported = []
+
+    def extract(index):
+        if index == 0:
+            raise JobError("Файл не является PDF документом", status_code=400)
+        return index
+
+    def process(index, data):
+        if index == 2:
+            raise RuntimeError("ошибка модели")
+        return {"filename": f"{index}.pdf", "status": "processed"}
+
+    results = run_pipeline(
+        ["0.pdf", "1.pdf", "2.pdf"], extract, process,
+        on_result=lambda index, result: reported.append(index), workers=2
+    )
+
+    assert [result["status"] for result in results] == ["failed", "processed", "failed"]
+    assert results[0]["error_code"] == 400
+    assert results[2] == {
+        "filename": "2.pdf", "status": "failed", "error": "ошибка модели", "error_code": 500
+    }
+    assert sorted(reported) == [0, 1, 2]
+
+
+def test_run_pipeline_stops_on_cancellation_without_failing_files():
+    reported = []
+
+    def extract(index):
+        if index == 1:
+            raise CancelledError("Задача отменена")
+        return index
+
+    def process(index, data):
+        return {"filename": f"{index}.pdf", "status": "processed"}
+
+    def cancelled_process(index, data):
+        raise CancelledError("Задача отменена")
+
+    with pytest.raises(CancelledError):
+        run_pipeline(
+            ["0.pdf", "1.pdf", "2.pdf"], extract, process,
+            on_result=lambda index, result: reported.append(result)
+        )
+    # Отмена при обработке LLM тоже не записывается ошибкой файла
+    with pytest.raises(CancelledError):
+        run_pipeline(
+            ["0.pdf"], lambda index: index, cancelled_process,
+            on_result=lambda index, result: reported.append(result)
+        )
+
+    # Файлы после отмены не получают результата "failed"
+    assert all(result["status"] == "processed" for result in reported)
@@ -0,0 +1,81 @@
+import os
+import sys
+# Добавляем путь к backend для импорта модулей из пакета src
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+import json
+
+import pdfplumber
+from benchmarks.run import main
+from benchmarks.stub_llama import StubLlama
+from benchmarks.synthetic_pdf import synthetic_pdf_bytes, write_synthetic_pdf
+
+
+def test_synthetic_pdf_is_deterministic_and_has_tables(tmp_path):
+    assert synthetic_pdf_bytes(3, seed=1) == synthetic_pdf_bytes(3, seed=1)
+    assert synthetic_pdf_bytes(3, seed=1) != synthetic_pdf_bytes(3, seed=2)
+
+    pdf_path = write_synthetic_pdf(
+        str(tmp_path / "synthetic.pdf"), 2, table_density=1.0
+    )
+    with pdfplumber.open(pdf_path) as pdf:
+        assert len(pdf.pages) == 2
+        tables = pdf.pages[0].extract_tables()
+    assert tables and tables[0][0][0] == "Alloy"
+
+
+def test_stub_llama_answers_from_prompt_text():
+    llm = StubLlama()
+    answer = llm(
+        "Extract\n\nText:\nThe steel contains Cr 12.5 wt% and has a "
+        "hardness of 300 HB.", max_tokens=100
+    )["choices"][0]["text"]
+
+    assert answer == "Cr content: 12.5 wt%\nHardness: 300 HB"
+    assert llm("Text:\nnothing", max_tokens=100)["choices"][0]["text"] == (
+        "No alloy information"
+    )
+    assert llm.detokenize(llm.tokenize(b"a, b\n")) == b"a, b\n"
+
+
+def test_benchmark_reports_stages_as_json(tmp_path):
+    output = tmp_path / "result.json"
+    result = main([
+        "--pages", "4", "--alloy-share", "0.5", "--no-fast-path",
+        "--output", str(output)
+    ])
+
+    assert json.loads(output.read_text(encoding="utf-8")) == result
+    assert result["model"] == "stub"
+    assert result["pages"] == 4
+    assert list(result["stages"]) == [
+        "extract_text", "chunking", "chunks", "merge"
+    ]
+    assert result["chunks"] > 0
+    assert result["properties"] > 0
+    assert result["peak_rss_mb"] > 0
+    assert all(stage["peak_rss_delta_mb"] >= 0 for stage in result["stages"].values())
+
+
+def test_benchmark_fast_path_skips_llm_for_parsed_chunks():
+    result = main(["--pages", "4", "--alloy-share", "0.5"])
+
+    assert result["fast_path"]["chunks"] > 0
+    assert result["fast_path"]["properties"] > 0
+    assert result["properties"] > 0
+
+
+def test_benchmark_skips_sections_and_stops_at_property_budget():
+    args = ["--pages", "8", "--alloy-share", "0.5", "--no-fast-path"]
+    full = main(args)
+    result = main(args + [
+        "--skip-sections", "background", "--section-order", "examples,claims",
+        "--property-budget", "5"
+    ])
+
+    assert [section["kind"] for section in result["sections_skipped"]] == ["background"]
+    assert result["sections"][0]["kind"] == "examples"
+    assert result["chunks"] < full["chunks"]
+    assert result["early_stop"]["chunks_skipped"] > 0
+    assert "early_stop" not in full
@@ -0,0 +1,85 @@
+import os
+import sys
+# Добавляем путь к backend для импорта модулей из пакета src
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from src.dedup import find_near_duplicates, fold_duplicate_passages, fold_duplicate_texts
+from src.text_preparation import ExtractionSettings, fold_duplicates
+
+BOILERPLATE = (
+    "The alloy according to any of the preceding claims wherein the "
+    "balance consists of aluminum and unavoidable impurities."
+)
+
+
+def test_fold_duplicate_passages_keeps_first_occurrence():
+    text = (
+        "Example 1 describes the casting of the ingot in a vacuum furnace "
+        "under argon. " + BOILERPLATE + "\n\n"
+        + BOILERPLATE.replace("wherein", "where") + " Nothing else here."
+    )
+
+    folded_text, folded = fold_duplicate_passages(text, 0.6)
+
+    assert folded_text.count("balance consists") == 1
+    assert "Example 1" in folded_text
+    assert "Nothing else here." in folded_text
+    assert len(folded) == 1
+    assert folded[0]["passage"] == 3
+    assert folded[0]["into"] == 2
+    assert folded[0]["similarity"] >= 0.6
+
+
+def test_fold_duplicate_passages_keeps_paragraph_separators():
+    text = (
+        "First paragraph about the ingot.\n \n" + BOILERPLATE
+        + "\n\n\n" + BOILERPLATE + "\n\t\nLast paragraph."
+    )
+
+    folded_text, folded = fold_duplicate_passages(text)
+
+    assert len(folded) == 1
+    assert folded_text == (
+        "First paragraph about the ingot.\n \n" + BOILERPLATE
+        + "\n\t\nLast paragraph."
+    )
+
+
+def test_passages_with_different_numbers_are_not_folded():
+    first = ("The alloy of example 2 contains 4.5 wt% Cu, 1.2 wt% Mg and "
+             "0.6 wt% Mn with the balance aluminum.")
+    second = first.replace("4.5", "3.9")
+
+    assert find_near_duplicates([first, second, first], 0.8) == [
+        None, None, (0, 1.0)
+    ]
+    assert fold_duplicate_passages(first + " " + second, 0.8) == (
+        first + " " + second, []
+    )
+
+
+def test_fold_duplicates_reports_folded_passages():
+    text = " ".join([BOILERPLATE] * 3)
+    report = {}
+
+    folded_texts = fold_duplicates([text], ExtractionSettings(), report)
+
+    assert folded_texts == [BOILERPLATE]
+    assert report["dedup"]["passages_folded"] == 2
+    assert report["dedup"]["chars_removed"] == len(text) - len(BOILERPLATE)
+
+    report = {}
+    assert fold_duplicates(
+        [text], ExtractionSettings(dedup_threshold=0), report
+    ) == [text]
+    assert report["dedup"]["passages_folded"] == 0
+
+
+def test_fold_duplicate_texts_keeps_first_occurrence_across_texts():
+    texts = ["Intro sentence without numbers.", BOILERPLATE, BOILERPLATE + " Tail."]
+
+    folded_texts, folded = fold_duplicate_texts(texts)
+
+    assert folded_texts == texts[:2] + ["Tail."]
+    assert [(item["passage"], item["into"]) for item in folded] == [(3, 2)]
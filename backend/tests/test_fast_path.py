@@ -0,0 +1,137 @@
+import os
+import sys
+# Добавляем путь к backend для импорта модулей из пакета src
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from src.fast_path import covers, extract_properties, table_lines
+from src.pdf_pages import extract_text_from_pdf
+from src.pdf_text_extractor import _with_fast_path
+from src.text_preparation import (
+    ExtractionSettings,
+    _fast_path_chunks,
+    select_chunks
+)
+
+
+def test_extract_properties_parses_compositions_and_properties():
+    text = (
+        "The steel contains Cr 18.5 wt%, Ni 9 wt% and Mo 2-3 wt%, the "
+        "balance being Fe. It is annealed at 1050 °C and has a hardness "
+        "of 350 HB and a tensile strength of at least 900 MPa.\n"
+        "Hardness (A2): 410 HV10"
+    )
+
+    items, rest = extract_properties(text)
+
+    assert items == [
+        {"property": "Alloy composition",
+         "value": "Cr 18.5 wt%, Ni 9 wt%, Mo 2-3 wt%, Fe bal.", "unit": ""},
+        {"property": "Annealing temperature", "value": "1050", "unit": "°C"},
+        {"property": "Hardness", "value": "350", "unit": "HB"},
+        {"property": "Tensile strength", "value": "at least 900",
+         "unit": "MPa"},
+        {"property": "Hardness (A2)", "value": "410", "unit": "HV10"},
+    ]
+    assert "350" not in rest and "Cr" not in rest
+    assert covers(text) == (items, True)
+
+
+def test_covers_requires_no_unparsed_values():
+    # Содержание одного элемента без перечисления не разбирается
+    assert covers("The alloy has a hardness of 350 HB; Cr 20 is added.")[1] \
+        is False
+    assert covers("The alloy is described below.") == ([], False)
+    # Номер примера значением не считается
+    assert covers("Example 2\nThe alloy has a hardness of 350 HB.")[1] is True
+
+
+def test_fast_path_sends_chunk_with_unknown_properties_to_llm():
+    chunk = (
+        "The alloy has a hardness of 350 HB. Its impact energy is 45 J, "
+        "the corrosion rate is 0.02 mm/year, the conductivity reaches "
+        "42 % IACS and the grain size is ASTM 8."
+    )
+
+    items, covered = covers(chunk)
+    remaining, lines = _fast_path_chunks([chunk], ExtractionSettings(), {})
+
+    assert items == [{"property": "Hardness", "value": "350", "unit": "HB"}]
+    assert covered is False
+    assert remaining == [chunk]
+    assert lines == []
+
+
+def test_table_lines_renders_composition_table():
+    rows = [
+        ["Table 1 (mass%)", None, None, None, None],
+        ["Alloy", "C", "Cr", "Fe", "Tensile strength\n(MPa)"],
+        ["A1", "0.05", "18.2", "Bal.", "850"],
+        ["A2", "<0.01", "-", "bal", "900-950"],
+    ]
+
+    assert table_lines(rows) == [
+        "Alloy composition (A1): C 0.05 mass%, Cr 18.2 mass%, Fe bal.",
+        "Tensile strength (A1): 850 MPa",
+        "Alloy composition (A2): C <0.01 mass%, Fe bal.",
+        "Tensile strength (A2): 900-950 MPa",
+    ]
+    # Таблица с неизвестным столбцом или текстом в ячейке остается LLM
+    assert table_lines([["Alloy", "Cr", "Ni", "Note"], ["A1", "1", "2", "x"]]) == []
+    assert table_lines([["Alloy", "Cr", "Ni"], ["A1", "1", "see text"]]) == []
+
+
+def test_extract_text_from_pdf_writes_tables_as_property_lines(tmp_path):
+    pdf_path = write_synthetic_pdf(
+        str(tmp_path / "synthetic.pdf"), 1, table_density=1.0
+    )
+
+    text, metadata = extract_text_from_pdf(pdf_path, tables=True)
+    plain_text, _ = extract_text_from_pdf(pdf_path)
+
+    assert metadata["tables"] is True
+    assert "Alloy composition (A1): C " in text
+    assert "Hardness (A1): " in text
+    assert "Hardness HB" in plain_text and "Hardness HB" not in text
+
+
+def test_fast_path_chunks_skip_llm_and_merge_into_result():
+    chunks = [
+        "Alloy composition (A1): Fe 70%, Cr 20%, Ni 10%\nHardness (A1): 350 HB",
+        "The alloy of example 3 has a hardness of about 300 HV in region S2.",
+    ]
+    report = {}
+
+    remaining, lines = _fast_path_chunks(chunks, ExtractionSettings(), report)
+
+    assert remaining == chunks[1:]
+    assert lines == [
+        "Alloy composition (A1): Fe 70%, Cr 20%, Ni 10%",
+        "Hardness (A1): 350 HB",
+    ]
+    assert report["fast_path"] == {"chunks": 1, "properties": 2}
+    assert _with_fast_path("Hardness (A1): 350 HB\nDensity: 7.9 g/cm3",
+                           lines, False).splitlines() == lines + [
+        "Density: 7.9 g/cm3"
+    ]
+    assert _fast_path_chunks(
+        chunks, ExtractionSettings(fast_path=False), {}
+    ) == (chunks, [])
+
+
+def test_select_chunks_runs_fast_path_before_relevance_filter():
+    chunks = [
+        "Melting temperature: 1600 °C",
+        "Hardness (A1): 350 HB",
+        "The furnace is cleaned before casting.",
+    ]
+    report = {}
+
+    remaining, lines = select_chunks(chunks, ExtractionSettings(), report)
+
+    # Оба чанка набирают меньше порога релевантности, но разобраны целиком
+    assert lines == ["Melting temperature: 1600 °C", "Hardness (A1): 350 HB"]
+    assert remaining == []
+    assert report["fast_path"]["chunks"] == 2
+    assert report["chunks_skipped"] == 1
@@ -0,0 +1,139 @@
+import os
+import sys
+# Добавляем путь к backend для импорта модулей из пакета src
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+import threading
+import time
+
+import pytest
+from src.jobs import Job, JobError, JobQueue, QueueFullError
+
+
+def wait_finished(job, timeout=5.0):
+    """Ожидает завершения задачи в очереди."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if job.status in ("done", "failed", "cancelled"):
+            return
+        time.sleep(0.01)
+    raise AssertionError("Задача не завершилась")
+
+
+def test_job_queue_runs_handler_and_records_timings():
+    def handler(job):
+        with job.stage_timer("extract_text"):
+            pass
+        return {"value": job.payload["value"] * 2}
+
+    job_queue = JobQueue(handler, workers=1, max_queued=4)
+    job = job_queue.submit("test.pdf", {"value": 21})
+    wait_finished(job)
+
+    assert job.status == "done"
+    assert job.result == {"value": 42}
+    assert "extract_text" in job.timings
+    assert job_queue.get(job.job_id) is job
+    job_queue.shutdown()
+
+
+def test_job_queue_records_handler_errors():
+    def handler(job):
+        raise JobError("неверный формат файла", status_code=400)
+
+    job_queue = JobQueue(handler)
+    job = job_queue.submit("test.txt")
+    wait_finished(job)
+
+    assert job.status == "failed"
+    assert job.error_code == 400
+    assert job.error == "неверный формат файла"
+    job_queue.shutdown()
+
+
+def test_job_queue_rejects_when_full():
+    release = threading.Event()
+    started = threading.Event()
+
+    def handler(job):
+        started.set()
+        release.wait(5)
+        return {}
+
+    job_queue = JobQueue(handler, workers=1, max_queued=1)
+    job_queue.submit("first.pdf")
+    started.wait(5)
+    job_queue.submit("second.pdf")
+    assert job_queue.depth == 1
+
+    with pytest.raises(QueueFullError):
+        job_queue.submit("third.pdf")
+
+    release.set()
+    job_queue.shutdown()
+
+
+def test_job_events_are_streamed_until_finished():
+    def handler(job):
+        with job.stage_timer("extract_text"):
+            job.emit("page", {"page": 1, "pages": 1})
+        return {"value": 1}
+
+    job_queue = JobQueue(handler)
+    job = job_queue.submit("test.pdf")
+    # Событие завершения — третье по счету
+    job.wait_events(2, timeout=5)
+
+    events = job.wait_events(0)
+    assert [event["event"] for event in events] == ["stage", "page", "done"]
+    assert [event["id"] for event in events] == [0, 1, 2]
+    assert events[-1]["data"] == {"result": {"value": 1}}
+    assert job.wait_events(3, timeout=0.01) == []
+    job_queue.shutdown()
+
+
+def test_job_listeners_are_notified_until_removed():
+    job = Job("test.pdf")
+    calls = []
+    listener = lambda: calls.append(len(job.events_after(0)))
+    job.add_listener(listener)
+
+    job.emit("page", {"page": 1})
+    job.remove_listener(listener)
+    job.emit("page", {"page": 2})
+
+    # Обработчик видит уже добавленное событие
+    assert calls == [1]
+    assert [event["data"] for event in job.events_after(1)] == [{"page": 2}]
+
+
+def test_job_cancel_skips_queued_job_and_stops_running_one():
+    started = threading.Event()
+    cancelled = threading.Event()
+
+    def handler(job):
+        job.on_cancel(cancelled.set)
+        started.set()
+        cancelled.wait(5)
+        job.check_cancelled()
+        return {}
+
+    job_queue = JobQueue(handler, workers=1, max_queued=4)
+    running = job_queue.submit("first.pdf", priority=2)
+    started.wait(5)
+    queued = job_queue.submit("second.pdf")
+
+    assert queued.cancel() is True
+    assert running.cancel() is True
+    wait_finished(running)
+    wait_finished(queued)
+
+    assert running.status == "cancelled"
+    assert queued.status == "cancelled"
+    assert running.to_dict()["priority"] == 2
+    assert [event["event"] for event in queued.wait_events(0)] == ["cancelled"]
+    # Завершенную задачу отменить нельзя
+    assert running.cancel() is False
+    job_queue.shutdown()
+
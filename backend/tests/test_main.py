@@ -4,13 +4,49 @@ import sys
 backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, backend_path)
 
+import asyncio
+import io
+import json
+import threading
+import time
+import zipfile
+
 import pytest
 from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
-from src.main import app 
+from src.jobs import Job, JobQueue, QueueFullError
+from src.main import (
+    _job_event_stream,
+    app,
+    discard_batch_job,
+    discard_patent_job,
+    process_batch_job
+)
+from src.result_cache import ResultCache
+from src.runtime_profile import RuntimeProfile
 
 client = TestClient(app)
 
+
+@pytest.fixture(autouse=True)
+def isolated_result_cache(tmp_path):
+    """Подменяет кэш результатов временной базой для каждого теста."""
+    cache = ResultCache(str(tmp_path / "results.sqlite3"))
+    with patch('src.main.result_cache', cache):
+        yield cache
+
+
+def wait_for_job(job_id, timeout=5.0):
+    """Опрашивает статус задачи, пока она не завершится."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = client.get(f"/jobs/{job_id}")
+        assert response.status_code == 200
+        if response.json()["status"] in ("done", "failed"):
+            return response.json()
+        time.sleep(0.05)
+    raise AssertionError(f"Задача {job_id} не завершилась за {timeout}с")
+
 @pytest.fixture(scope="module")
 def create_temp_pdf():
     """Создание временного PDF файла для тестирования."""
@@ -37,6 +73,69 @@ def test_root():
     assert response.status_code == 200
     assert response.json() == {"message": "Hello World"}
 
+def test_ready_returns_503_until_model_loaded():
+    """Тестирование эндпоинта готовности до загрузки модели."""
+    with patch('src.main.model_manager') as mock_manager:
+        mock_manager.is_ready = False
+        mock_manager.load_error = None
+        response = client.get("/ready")
+
+        assert response.status_code == 503
+        assert response.json()["status"] == "loading"
+
+        mock_manager.is_ready = True
+        mock_manager.model_path = "model.gguf"
+        mock_manager.n_gpu_layers = 0
+        mock_manager.load_time = 1.5
+        mock_manager.runtime.return_value = RuntimeProfile(6, 8, 512)
+        response = client.get("/ready")
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+        assert response.json()["runtime"] == {
+            "n_threads": 6, "n_threads_batch": 8, "n_batch": 512,
+            "use_mlock": False
+        }
+
+def test_cancel_job_endpoint():
+    """Тестирование отмены задачи."""
+    job = Job(filename="test.pdf")
+    with patch('src.main.job_queue.get', side_effect=lambda job_id: job if job_id == job.job_id else None):
+        assert client.delete("/jobs/missing").status_code == 404
+
+        response = client.delete(f"/jobs/{job.job_id}")
+        assert response.status_code == 200
+        assert response.json()["cancel_requested"] is True
+
+        job.status = "cancelled"
+        assert client.delete(f"/jobs/{job.job_id}").status_code == 409
+
+def test_queued_jobs_cancelled_before_start_remove_spooled_files(tmp_path):
+    """Тестирование удаления файлов задач, отмененных в очереди."""
+    release = threading.Event()
+    paths = [tmp_path / name for name in ("a.pdf", "b.pdf", "c.pdf")]
+    for path in paths:
+        path.write_bytes(b"%PDF-1.4")
+    job_queue = JobQueue(lambda job: release.wait(5) and {}, workers=1)
+    busy = job_queue.submit("busy.pdf")
+
+    single = job_queue.submit(
+        "a.pdf", {"file_location": str(paths[0])},
+        on_discard=discard_patent_job
+    )
+    batch = job_queue.submit(
+        "batch", {"files": [{"file_location": str(path)} for path in paths[1:]]},
+        handler=process_batch_job, on_discard=discard_batch_job
+    )
+    assert single.cancel() and batch.cancel()
+    release.set()
+    for job in (busy, single, batch):
+        job.wait_events(0, timeout=5)
+    job_queue.shutdown()
+
+    assert single.status == batch.status == "cancelled"
+    assert not any(path.exists() for path in paths)
+
 def test_upload_patent_valid_pdf(create_temp_pdf):
     """Тестирование загрузки корректного PDF файла."""
     # Мокируем функции извлечения текста и обработки сплавов
@@ -49,22 +148,207 @@ def test_upload_patent_valid_pdf(create_temp_pdf):
         with open(create_temp_pdf, "rb") as f:
             response = client.post("/patent", files={"file": ("test.pdf", f, "application/pdf")})
 
-        assert response.status_code == 200
-        assert response.json()["status"] == "processed"
-        assert "extracted_text" in response.json()
-        assert response.json()["extracted_text"] == mock_extracted_text
-        assert "metadata" in response.json()
-        assert response.json()["metadata"] == mock_metadata
-        assert "alloy_info" in response.json()
-        assert response.json()["alloy_info"] == mock_alloy_info
+        assert response.status_code == 202
+        assert "job_id" in response.json()
+        assert "queue_depth" in response.json()
+
+        job = wait_for_job(response.json()["job_id"])
+        assert job["status"] == "done"
+        assert "extract_text" in job["timings"]
+        assert "extract_alloy_info" in job["timings"]
+        result = job["result"]
+        assert result["status"] == "processed"
+        assert "extracted_text" in result
+        assert result["extracted_text"] == mock_extracted_text
+        assert "metadata" in result
+        assert result["metadata"] == mock_metadata
+        assert "alloy_info" in result
+        assert result["alloy_info"] == mock_alloy_info
+        assert result["alloy_properties"][0] == {
+            "property": "Alloy composition", "value": "Fe 70%, Cr 20%, Ni 10%", "unit": ""
+        }
+
+def test_upload_patent_repeat_upload_uses_cache(create_temp_pdf):
+    """Тестирование повторной загрузки того же PDF: результат из кэша."""
+    mock_alloy = MagicMock(return_value="Hardness: 350 HB")
+
+    def fake_extract_text(file_path, workers=1, on_page=None, tables=False, page_cache=None):
+        # Текст попадает в кэш по страницам, как при настоящем извлечении
+        page_cache.put(1, 1, "Sample patent text")
+        page_cache.flush()
+        return "Sample patent text", {"tables": tables, "pages": 1}
+
+    with patch('src.main.extract_text_from_pdf', side_effect=fake_extract_text), \
+         patch('src.main.extract_alloy_info_from_text', mock_alloy):
+        with open(create_temp_pdf, "rb") as f:
+            first = client.post("/patent", files={"file": ("test.pdf", f, "application/pdf")})
+        wait_for_job(first.json()["job_id"])
+
+        with open(create_temp_pdf, "rb") as f:
+            second = client.post("/patent", files={"file": ("copy.pdf", f, "application/pdf")})
+
+    assert first.json()["cached"] is False
+    assert second.json()["cached"] is True
+    assert second.json()["status"] == "done"
+    assert second.json()["result"]["alloy_info"] == "Hardness: 350 HB"
+    assert mock_alloy.call_count == 1
 
 def test_upload_patent_invalid_file(create_temp_text_file):
     """Тестирование загрузки некорректного файла (текстового)."""
-    # Мокируем extract_text_from_pdf чтобы он выбрасывал ValueError для невалидного файла
-    with patch('src.main.extract_text_from_pdf', side_effect=ValueError("неверный формат файла")):
+    with patch('src.main.job_queue.submit') as mock_submit:
         with open(create_temp_text_file, "rb") as f:
             response = client.post("/patent", files={"file": ("test.txt", f, "text/plain")})
 
-        assert response.status_code == 400
-        assert "detail" in response.json()
-        assert "неверный формат файла" in response.json()["detail"]
+    # Файл без сигнатуры PDF отклоняется до постановки в очередь
+    assert response.status_code == 400
+    assert "PDF" in response.json()["detail"]
+    mock_submit.assert_not_called()
+
+def test_upload_patent_unreadable_pdf(create_temp_pdf):
+    """Тестирование PDF, из которого не удается извлечь текст."""
+    # Мокируем extract_text_from_pdf чтобы он выбрасывал ValueError для невалидного файла
+    with patch('src.main.extract_text_from_pdf', side_effect=ValueError("неверный формат файла")):
+        with open(create_temp_pdf, "rb") as f:
+            response = client.post("/patent", files={"file": ("test.pdf", f, "application/pdf")})
+
+        assert response.status_code == 202
+        job = wait_for_job(response.json()["job_id"])
+        assert job["status"] == "failed"
+        assert job["error_code"] == 400
+        assert "неверный формат файла" in job["error"]
+
+def test_upload_patent_too_large(create_temp_pdf):
+    """Тестирование ответа 413 для файла больше допустимого размера."""
+    with patch('src.main.MAX_UPLOAD_BYTES', 4):
+        with open(create_temp_pdf, "rb") as f:
+            response = client.post("/patent", files={"file": ("test.pdf", f, "application/pdf")})
+
+    assert response.status_code == 413
+
+def test_upload_patent_queue_full(create_temp_pdf):
+    """Тестирование ответа 429 при заполненной очереди."""
+    with patch('src.main.job_queue.submit', side_effect=QueueFullError("Очередь обработки заполнена")):
+        with open(create_temp_pdf, "rb") as f:
+            response = client.post("/patent", files={"file": ("test.pdf", f, "application/pdf")})
+
+        assert response.status_code == 429
+        assert "заполнена" in response.json()["detail"]
+
+def read_events(job_id, headers=None):
+    """Читает поток событий задачи до его завершения."""
+    events = []
+    with client.stream("GET", f"/jobs/{job_id}/events", headers=headers) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        for block in response.read().decode("utf-8").split("\n\n"):
+            fields = dict(
+                line.split(": ", 1) for line in block.splitlines()
+                if not line.startswith(":")
+            )
+            if fields:
+                events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_job_events_stream_chunks_and_result(create_temp_pdf):
+    """Тестирование потока событий: страницы, чанки и итоговый результат."""
+    def fake_extract_text(file_path, workers=1, on_page=None, tables=False, page_cache=None):
+        on_page(1, 1)
+        return "Steel text", {"pages": 1}
+
+    def fake_extract_alloy(text, settings=None, report=None, on_event=None, cache=None, session=None):
+        on_event("chunk", {"chunk": 1, "properties": [{"property": "Hardness", "value": "350 HB"}]})
+        return "Hardness: 350 HB"
+
+    with patch('src.main.extract_text_from_pdf', side_effect=fake_extract_text), \
+         patch('src.main.extract_alloy_info_from_text', side_effect=fake_extract_alloy):
+        with open(create_temp_pdf, "rb") as f:
+            response = client.post("/patent", files={"file": ("test.pdf", f, "application/pdf")})
+        job_id = response.json()["job_id"]
+        events = read_events(job_id)
+
+    names = [name for name, _ in events]
+    assert names == ["stage", "page", "text", "stage", "chunk", "done"]
+    assert events[4][1]["properties"][0]["property"] == "Hardness"
+    assert events[-1][1]["result"]["alloy_info"] == "Hardness: 350 HB"
+
+    # Переподключение продолжает поток после последнего полученного события
+    resumed = read_events(job_id, headers={"Last-Event-ID": "4"})
+    assert [name for name, _ in resumed] == ["done"]
+
+def test_job_event_stream_waits_without_executor_threads():
+    """Поток событий ждет сигнала из потока задачи, а не поток пула."""
+    job = Job("test.pdf")
+
+    async def read_stream():
+        stream = _job_event_stream(job, 0)
+        parts = [await stream.__anext__()]
+        # Событие завершения добавляется из другого потока
+        threading.Timer(0.05, job.emit, ("done", {"result": {}})).start()
+        parts.append(await stream.__anext__())
+        with pytest.raises(StopAsyncIteration):
+            await stream.__anext__()
+        return parts
+
+    job.emit("stage", {"stage": "extract_text"})
+    with patch('src.main.EVENTS_KEEPALIVE', 5), \
+         patch('src.main.asyncio.to_thread', side_effect=AssertionError):
+        parts = asyncio.run(read_stream())
+
+    assert parts[0].startswith("id: 0\nevent: stage")
+    assert parts[1].startswith("id: 1\nevent: done")
+    assert job._listeners == []
+
+def test_job_events_unknown_job():
+    """Тестирование потока событий несуществующей задачи."""
+    response = client.get("/jobs/unknown/events")
+    assert response.status_code == 404
+
+def test_get_unknown_job():
+    """Тестирование запроса несуществующей задачи."""
+    response = client.get("/jobs/unknown")
+    assert response.status_code == 404
+
+
+def test_metrics_endpoint_exposes_pipeline_metrics(isolated_result_cache):
+    """Метрики в формате Prometheus: очередь, кэш и этапы обработки."""
+    isolated_result_cache.get_result("missing")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "patent_queue_depth 0.0" in body
+    assert 'patent_cache_lookups_total{kind="result",result="miss"}' in body
+    assert "patent_chunk_prompt_eval_seconds_bucket" in body
+    assert "patent_pdf_page_seconds_count" in body
+
+
+def test_upload_patent_batch_returns_results_per_file(create_temp_pdf, create_temp_text_file):
+    """Пакет: PDF файл, ZIP архив с PDF и отклоненный текстовый файл."""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("inner.pdf", b"%PDF-1.4\ninner")
+    with patch('src.main.extract_text_from_pdf', return_value=("Steel text", {"pages": 1})), \
+         patch('src.main.extract_alloy_info_from_text', return_value="Hardness: 350 HB"):
+        with open(create_temp_pdf, "rb") as pdf, open(create_temp_text_file, "rb") as text:
+            response = client.post("/patents/batch", files=[
+                ("files", ("test.pdf", pdf, "application/pdf")),
+                ("files", ("patents.zip", archive.getvalue(), "application/zip")),
+                ("files", ("test.txt", text, "text/plain")),
+            ])
+        assert response.status_code == 202
+        assert response.json()["files"] == 3
+        assert response.json()["rejected"] == 1
+        events = read_events(response.json()["job_id"])
+
+    file_events = [data for name, data in events if name == "file"]
+    assert sorted(event["index"] for event in file_events) == [0, 1, 2]
+    result = events[-1][1]["result"]
+    assert (result["processed"], result["failed"]) == (2, 1)
+    files = result["files"]
+    assert [item["filename"] for item in files] == [
+        "test.pdf", "patents.zip/inner.pdf", "test.txt"
+    ]
+    assert files[1]["alloy_properties"][0]["property"] == "Hardness"
+    assert files[2]["error_code"] == 400
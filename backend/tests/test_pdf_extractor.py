@@ -1,13 +1,54 @@
 import os 
 import sys
-# Добавляем путь к src для импорта модулей
+# Добавляем путь к backend для импорта модулей из пакета src
 backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-src_path = os.path.join(backend_path, "src")
-sys.path.insert(0, src_path)
+sys.path.insert(0, backend_path)
 
+import time
+
+import numpy as np
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, MagicMock
-from pdf_text_extractor import extract_text_from_pdf
+from src.chunking import chunk_token_budget, split_text_into_token_chunks
+from src.metrics import REGISTRY
+from src.llm_model import (
+    CountingPromptLookupDecoding,
+    LlamaModelManager,
+    PromptPrefixCache,
+    load_llm_model
+)
+from src.pdf_pages import extract_text_from_pdf, iter_pdf_pages
+from src.pdf_text_extractor import (
+    ChunkRun,
+    ExtractionSettings,
+    _build_final_summary,
+    _process_chunks_in_pool,
+    _process_single_chunk,
+    _run_chunks
+)
+from src.prompts import PROPERTIES_GBNF, properties_grammar
+from src.result_cache import ResultCache
+from src.runtime_profile import RuntimeProfile
+from src.scheduler import ChunkScheduler
+
+
+def count_words(text):
+    """Простой токенизатор для тестов: один токен на слово."""
+    return len(text.split())
+
+
+def make_mock_pdf(page_texts):
+    """Создает поддельный PDF с заданным текстом страниц."""
+    mock_pdf = MagicMock()
+    mock_pdf.pages = []
+    for text in page_texts:
+        mock_page = MagicMock()
+        mock_page.extract_text.return_value = text
+        mock_pdf.pages.append(mock_page)
+    mock_pdf.__enter__ = MagicMock(return_value=mock_pdf)
+    mock_pdf.__exit__ = MagicMock(return_value=False)
+    return mock_pdf
 
 def test_extract_text_from_pdf():
     # Создаем поддельный объект PDF
@@ -23,7 +64,7 @@ def test_extract_text_from_pdf():
     mock_pdf.__exit__ = MagicMock(return_value=False)
 
     # Настраиваем mock для pdfplumber.open
-    with patch('pdf_text_extractor.pdfplumber.open', return_value=mock_pdf):
+    with patch('src.pdf_pages.pdfplumber.open', return_value=mock_pdf):
         file_path = 'test.pdf'  # Путь к тестовому PDF (можно указать любой строковый путь)
 
         # Вызываем функцию
@@ -37,5 +78,520 @@ def test_extract_text_from_pdf():
         assert extracted_text == "Sample text from page 1"
         assert metadata['pages'] == 1
 
+def test_iter_pdf_pages_yields_pages_and_flushes_cache():
+    mock_pdf = make_mock_pdf(["Page one", None, "Page three"])
+
+    with patch('src.pdf_pages.pdfplumber.open', return_value=mock_pdf):
+        pages = list(iter_pdf_pages('test.pdf'))
+
+    assert pages == [(1, "Page one"), (2, ""), (3, "Page three")]
+    for mock_page in mock_pdf.pages:
+        mock_page.close.assert_called_once()
+
+
+def test_extract_text_from_pdf_parallel_keeps_page_order():
+    page_texts = [f"Page {i}" for i in range(1, 21)]
+
+    def fake_open(file_path, pages=None):
+        if pages is None:
+            return make_mock_pdf(page_texts)
+        return make_mock_pdf([page_texts[i - 1] for i in pages])
+
+    def thread_pool(max_workers, mp_context):
+        return ThreadPoolExecutor(max_workers=max_workers)
+
+    with patch('src.pdf_pages.pdfplumber.open', side_effect=fake_open), \
+         patch('src.pdf_pages.ProcessPoolExecutor', side_effect=thread_pool):
+        extracted_text, metadata = extract_text_from_pdf('test.pdf', workers=4)
+
+    assert metadata['pages'] == 20
+    assert extracted_text == "\n\n".join(page_texts)
+
+
+def test_extract_text_from_pdf_reuses_cached_pages(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"))
+    first_pdf = make_mock_pdf(["Page one", "Page two"])
+    with patch('src.pdf_pages.pdfplumber.open', return_value=first_pdf):
+        extracted_text, metadata = extract_text_from_pdf(
+            'test.pdf', page_cache=cache.pages("abc")
+        )
+
+    parsed = REGISTRY.get_sample_value("patent_pdf_page_seconds_count")
+    cached = REGISTRY.get_sample_value("patent_pdf_pages_cached_total")
+    second_pdf = make_mock_pdf(["Page one", "Page two"])
+    with patch('src.pdf_pages.pdfplumber.open', return_value=second_pdf):
+        assert extract_text_from_pdf(
+            'test.pdf', page_cache=cache.pages("abc")
+        ) == (extracted_text, metadata)
+    # Страницы из кэша не учитываются во времени разбора страниц
+    assert REGISTRY.get_sample_value("patent_pdf_page_seconds_count") == parsed
+    assert REGISTRY.get_sample_value("patent_pdf_pages_cached_total") == cached + 2
+
+    assert extracted_text == "Page one\n\nPage two"
+    for mock_page in second_pdf.pages:
+        mock_page.extract_text.assert_not_called()
+    assert cache.get_text("abc") == (extracted_text, metadata)
+    assert cache.stats()["lookups"]["page"] == {"hit": 2, "miss": 2}
+
+
+def test_split_text_into_token_chunks_packs_paragraphs():
+    paragraphs = [" ".join(f"w{p}_{i}" for i in range(4)) for p in range(6)]
+    text = "\n\n".join(paragraphs)
+
+    chunks = split_text_into_token_chunks(text, count_words, max_tokens=9)
+
+    # В каждый чанк помещается два абзаца по 4 слова
+    assert [chunk for chunk, _ in chunks] == [
+        "\n\n".join(paragraphs[i:i + 2]) for i in range(0, 6, 2)
+    ]
+    assert [tokens for _, tokens in chunks] == [8, 8, 8]
+
+
+def test_split_text_into_token_chunks_splits_long_paragraph_by_sentences():
+    sentences = [f"Sentence {i} has five words." for i in range(4)]
+    text = " ".join(sentences)
+
+    chunks = split_text_into_token_chunks(text, count_words, max_tokens=12)
+
+    assert all(tokens <= 12 for _, tokens in chunks)
+    # Текст не теряется и не разрывается посреди слова
+    assert " ".join(chunk for chunk, _ in chunks).split() == text.split()
+    assert chunks[0][0] == " ".join(sentences[:2])
+
+
+def test_chunk_token_budget_subtracts_prompt_and_answer():
+    mock_llm = MagicMock()
+    mock_llm.n_ctx.return_value = 4096
+    mock_llm.tokenize.return_value = list(range(100))
+
+    budget = chunk_token_budget(mock_llm, "Prompt", max_tokens=500, context_share=0.9)
+
+    assert budget == int(4096 * 0.9) - 100 - 500
+
+
+class FakeStatefulLlama:
+    """Минимальная модель с KV состоянием для тестов кэша префикса."""
+
+    def __init__(self):
+        self.input_ids = []
+        self.n_tokens = 0
+        self.loaded_states = 0
+
+    def tokenize(self, text, add_bos=True):
+        return [ord(c) for c in text.decode("utf-8")]
+
+    def reset(self):
+        self.input_ids, self.n_tokens = [], 0
+
+    def eval(self, tokens):
+        self.input_ids = self.input_ids[:self.n_tokens] + list(tokens)
+        self.n_tokens = len(self.input_ids)
+
+    def save_state(self):
+        return list(self.input_ids)
+
+    def load_state(self, state):
+        self.loaded_states += 1
+        self.input_ids, self.n_tokens = list(state), len(state)
+
+
+def test_prompt_prefix_cache_is_evaluated_once_per_model():
+    llm = FakeStatefulLlama()
+
+    cache = PromptPrefixCache.for_model(llm, "Prefix:")
+
+    assert PromptPrefixCache.for_model(llm, "Prefix:") is cache
+    assert cache.tokens == [ord(c) for c in "Prefix:"]
+
+
+def test_prompt_prefix_cache_restores_state_only_when_needed():
+    llm = FakeStatefulLlama()
+    cache = PromptPrefixCache(llm, "Prefix:")
+
+    # KV кэш модели начинается с префикса — восстанавливать не нужно
+    llm.eval([ord(c) for c in " chunk one"])
+    restored, _ = cache.prepare(llm)
+    assert restored is False
+    assert llm.loaded_states == 0
+
+    # Другой промпт вытеснил префикс — состояние восстанавливается
+    llm.reset()
+    llm.eval([ord(c) for c in "Summaries:"])
+    restored, _ = cache.prepare(llm)
+    assert restored is True
+    assert llm.loaded_states == 1
+    assert llm.input_ids == cache.tokens
+
+
+def test_process_single_chunk_streams_lines_as_they_are_generated():
+    llm = MagicMock()
+    llm.tokenize.side_effect = lambda text, add_bos=True: list(text)
+    llm.n_ctx.return_value = 4096
+    parts = ["Hardness: 3", "50 HB\nDensity", ": 7.9 g/cm3"]
+    llm.side_effect = lambda prompt, stream=False, **kwargs: iter(
+        {"choices": [{"text": part}]} for part in parts
+    )
+    events = []
+    run = ChunkRun(on_event=lambda event, data: events.append((event, data)))
+
+    output = _process_single_chunk("Steel text", llm, 0, 2, run=run)
+
+    assert output == "Hardness: 350 HB\nDensity: 7.9 g/cm3"
+    assert llm.call_args.kwargs["stream"] is True
+    assert events[:2] == [
+        ("chunk_line", {"chunk": 1, "line": "Hardness: 350 HB"}),
+        ("chunk_line", {"chunk": 1, "line": "Density: 7.9 g/cm3"}),
+    ]
+    event, data = events[2]
+    assert event == "chunk"
+    assert data["total"] == 2
+    assert data["properties"] == [
+        {"property": "Hardness", "value": "350 HB", "unit": ""},
+        {"property": "Density", "value": "7.9 g/cm3", "unit": ""},
+    ]
+
+
+def test_process_single_chunk_structured_output_uses_grammar():
+    llm = MagicMock()
+    llm.tokenize.side_effect = lambda text, add_bos=True: list(text)
+    llm.n_ctx.return_value = 4096
+    llm.return_value = {"choices": [{"text": '[{"property":"Hardness","value":"350","unit":"HB"}]'}]}
+
+    output = _process_single_chunk("Steel text", llm, 0, 1, run=ChunkRun(structured=True))
+
+    kwargs = llm.call_args.kwargs
+    assert kwargs["grammar"] is not None
+    assert "stop" not in kwargs
+    # Ответ переводится в строки-объекты для дедупликации и сборки
+    assert output == '{"property":"Hardness","value":"350","unit":"HB"}'
+
+
+def test_structured_output_keeps_long_values_and_warns_on_truncation(caplog):
+    composition = ", ".join(f"El{i} {i}.5 wt%" for i in range(30))
+    assert len(composition) > 120
+    # Грамматика не ограничивает длину строк и число объектов
+    assert "{0," not in PROPERTIES_GBNF
+    properties_grammar()
+
+    llm = MagicMock()
+    llm.tokenize.side_effect = lambda text, add_bos=True: list(text)
+    llm.n_ctx.return_value = 8192
+    llm.return_value = {"choices": [{"text": (
+        '[{"property":"Alloy composition","value":"' + composition
+        + '","unit":""},{"property":"Hardn'
+    )}]}
+
+    output = _process_single_chunk("Steel text", llm, 0, 1, run=ChunkRun(structured=True))
+
+    assert composition in output
+    assert "оборван" in caplog.text
+
+
+class WordTokenizerLlama:
+    """Модель-заглушка, у которой один токен соответствует одному слову."""
+
+    def tokenize(self, text, add_bos=True):
+        return text.decode("utf-8").split()
+
+
+def test_process_single_chunk_records_token_metrics():
+    llm = MagicMock()
+    llm.tokenize.side_effect = lambda text, add_bos=True: list(text)
+    llm.n_ctx.return_value = 4096
+    llm.return_value = {"choices": [{"text": "Hardness: 350 HB"}]}
+    def tokens_out():
+        return REGISTRY.get_sample_value(
+            "patent_chunk_tokens_sum", {"direction": "out"}
+        ) or 0
+
+    observed = tokens_out()
+    run = ChunkRun()
+
+    _process_single_chunk("Steel text", llm, 0, 1, run=run)
+
+    stats = run.chunk_stats[0]
+    assert stats["completion_tokens"] == len(b"Hardness: 350 HB")
+    # Время вычисления промпта есть только у модели llama-cpp
+    assert "prompt_eval_time" not in stats
+    assert tokens_out() - observed == stats["completion_tokens"]
+
+
+def test_run_chunks_calls_llm_only_for_changed_chunks(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"))
+    llm = MagicMock()
+    llm.model_path = "/models/model.gguf"
+    llm.tokenize.side_effect = lambda text, add_bos=True: list(text)
+    llm.n_ctx.return_value = 4096
+    answer = {"choices": [{"text": "Hardness: 350 HB"}]}
+    # С обработчиком событий ответ читается потоково
+    llm.side_effect = lambda prompt, stream=False, **kwargs: (
+        iter([answer]) if stream else answer
+    )
+    settings = ExtractionSettings(prefix_cache=False)
+
+    first = _run_chunks(["Steel one", "Steel two"], llm, ChunkRun(cache=cache), settings)
+    events = []
+    run = ChunkRun(cache=cache, on_event=lambda event, data: events.append((event, data)))
+    second = _run_chunks(["Steel one", "Steel three"], llm, run, settings)
+
+    assert first == second == ["Hardness: 350 HB", "Hardness: 350 HB"]
+    assert llm.call_count == 3
+    assert [stats["chunk"] for stats in run.chunk_stats] == [2]
+    assert run.summary()["chunk_cache"] == {"hits": 1, "misses": 1}
+    assert events[0][1]["chunk"] == 1 and events[0][1]["cached"] is True
+
+
+def test_run_chunks_stops_when_property_budget_is_reached():
+    llm = MagicMock()
+    llm.tokenize.side_effect = lambda text, add_bos=True: list(text)
+    llm.n_ctx.return_value = 4096
+    answers = iter(["Hardness: 350 HB", "Density: 7.9 g/cm3", "Hardness: 360 HB"])
+    llm.side_effect = lambda prompt, **kwargs: {"choices": [{"text": next(answers)}]}
+    run = ChunkRun(property_budget=3, found_lines=["Cr content: 18 wt%"])
+    settings = ExtractionSettings(prefix_cache=False)
+
+    summaries = _run_chunks(["Steel one", "Steel two", "Steel three"], llm, run, settings)
+
+    assert summaries == ["Hardness: 350 HB", "Density: 7.9 g/cm3"]
+    assert llm.call_count == 2
+    assert run.summary()["early_stop"] == {"after_chunk": 2, "chunks_skipped": 1}
+
+
+def test_build_final_summary_merges_hierarchically_without_truncation():
+    summaries = [
+        "Hardness: 350 HB\nDensity: 7.9 g/cm3",
+        "hardness: 350 HB\nMelting temperature: 1450 °C",
+        "Melting temperature: 1450°C\nTensile strength: 620 MPa",
+    ]
+    merged_groups = []
+
+    def fake_merge(lines, llm, structured=False):
+        merged_groups.append(list(lines))
+        names = [line.split(":")[0] for line in lines]
+        return "Merged: " + ", ".join(names)
+
+    report = {}
+    with patch('src.pdf_text_extractor.chunk_token_budget', return_value=12), \
+         patch('src.pdf_text_extractor._merge_group', side_effect=fake_merge):
+        result = _build_final_summary(summaries, WordTokenizerLlama(), report=report)
+
+    # Дубликаты отброшены до LLM, все свойства дошли до финальной сборки
+    assert report["merge"]["unique_lines"] == 4
+    assert report["merge"]["levels"] == 1
+    assert report["merge"]["llm_merges"] == 3
+    assert merged_groups[0] == ["Hardness: 350 HB", "Density: 7.9 g/cm3"]
+    assert merged_groups[1] == ["Melting temperature: 1450 °C", "Tensile strength: 620 MPa"]
+    assert "Merged" in result
+
+
+def test_load_llm_model_falls_back_to_fewer_gpu_layers():
+    # Первая попытка (32 слоя) падает, вторая (16 слоев) успешна
+    mock_llm = MagicMock()
+    with patch('src.llm_model._gpu_offload_supported', return_value=True), \
+         patch('src.llm_model.Llama', side_effect=[RuntimeError("no GPU"), mock_llm]) as mock_cls:
+        llm, layers = load_llm_model('model.gguf', RuntimeProfile.default(4))
+
+    assert llm is mock_llm
+    assert layers == 16
+    assert mock_cls.call_count == 2
+
+
+def test_load_llm_model_enables_prompt_lookup_decoding():
+    with patch('src.llm_model._gpu_offload_supported', return_value=False), \
+         patch('src.llm_model.Llama') as mock_cls:
+        load_llm_model('model.gguf', RuntimeProfile.default(4), draft_tokens=8)
+
+    kwargs = mock_cls.call_args.kwargs
+    assert isinstance(kwargs["draft_model"], CountingPromptLookupDecoding)
+    assert kwargs["draft_model"].num_pred_tokens == 8
+    assert kwargs["logits_all"] is True
+
+
+def test_load_llm_model_vocab_only_skips_gpu_and_draft_model():
+    with patch('src.llm_model._gpu_offload_supported', return_value=True), \
+         patch('src.llm_model.Llama') as mock_cls:
+        _, layers = load_llm_model('model.gguf', RuntimeProfile.default(4),
+                                   draft_tokens=8, vocab_only=True)
+
+    kwargs = mock_cls.call_args.kwargs
+    assert mock_cls.call_count == 1
+    assert layers == 0
+    assert kwargs["vocab_only"] is True
+    assert kwargs["n_gpu_layers"] == 0
+    assert kwargs["draft_model"] is None
+
+
+def test_prompt_lookup_decoding_counts_accepted_tokens():
+    draft_model = CountingPromptLookupDecoding(max_ngram_size=2, num_pred_tokens=3)
+    prompt = np.array([1, 2, 3, 4, 1, 2], dtype=np.intc)
+
+    draft = draft_model(prompt)
+    assert list(draft) == [3, 4, 1]
+
+    # Модель приняла два черновых токена и сгенерировала свой третий
+    draft_model(np.concatenate([prompt, np.array([3, 4, 9], dtype=np.intc)]))
+
+    assert draft_model.stats()["accepted_tokens"] == 2
+    assert draft_model.stats()["draft_tokens"] >= 3
+    draft_model.reset_stats()
+    assert draft_model.stats() == {"draft_tokens": 0, "accepted_tokens": 0}
+
+
+def test_model_manager_loads_model_once(tmp_path):
+    model_file = tmp_path / "model.gguf"
+    model_file.write_bytes(b"")
+    manager = LlamaModelManager(model_path=str(model_file), cpu_count=2)
+    mock_llm = MagicMock()
+
+    with patch('src.llm_model.load_llm_model', return_value=(mock_llm, 0)) as mock_load:
+        assert not manager.is_ready
+        with manager.acquire() as first:
+            pass
+        with manager.acquire() as second:
+            pass
+
+    assert manager.is_ready
+    assert first is second is mock_llm
+    mock_load.assert_called_once()
+
+
+def test_model_manager_remembers_working_gpu_layers(tmp_path):
+    model_file = tmp_path / "model.gguf"
+    model_file.write_bytes(b"")
+    manager = LlamaModelManager(model_path=str(model_file), cpu_count=2)
+
+    with patch('src.llm_model.load_llm_model', return_value=(MagicMock(), 16)) as mock_load:
+        manager.load()
+        manager.unload()
+        manager.load()
+
+    # При повторной загрузке сразу используется рабочее значение
+    assert mock_load.call_args_list[0].args[2] is None
+    assert mock_load.call_args_list[1].args[2] == 16
+
+
+def test_model_manager_starts_worker_pool_with_split_threads(tmp_path):
+    model_file = tmp_path / "model.gguf"
+    model_file.write_bytes(b"")
+    manager = LlamaModelManager(model_path=str(model_file), cpu_count=64, workers=4)
+
+    with patch('src.llm_model.load_llm_model', return_value=(MagicMock(), 0)) as mock_load, \
+         patch('src.llm_model.LlmWorkerPool') as mock_pool_cls:
+        mock_pool_cls.return_value.warm_up.return_value = 4
+        manager.load()
+        manager.unload()
+
+    # Процессу приложения нужен только словарь для токенизации
+    assert mock_load.call_args.kwargs["vocab_only"] is True
+
+    mock_pool_cls.assert_called_once_with(
+        str(model_file), 4, RuntimeProfile.default(64, 4), 0
+    )
+    mock_pool_cls.return_value.shutdown.assert_called_once()
+    assert manager.pool is None
+
+
+def test_model_manager_uses_runtime_profile(tmp_path):
+    model_file = tmp_path / "model.gguf"
+    model_file.write_bytes(b"")
+    # Профиль подобран для одного экземпляра на 8 CPU
+    profile = RuntimeProfile(n_threads=6, n_threads_batch=8, n_batch=512, use_mlock=True)
+    manager = LlamaModelManager(model_path=str(model_file), cpu_count=8, profile=profile)
+
+    with patch('src.llm_model._gpu_offload_supported', return_value=False), \
+         patch('src.llm_model.Llama') as mock_cls:
+        manager.load()
+
+    kwargs = mock_cls.call_args.kwargs
+    assert kwargs["n_threads"] == 6
+    assert kwargs["n_threads_batch"] == 8
+    assert kwargs["n_batch"] == 512
+    assert kwargs["use_mlock"] is True
+    # Для пула из двух процессов потоки делятся между ними
+    assert manager.runtime(2).n_threads == 3
+    assert manager.runtime(2).n_threads_batch == 4
+    assert manager.runtime(2).n_batch == 512
+
+
+class ThreadLlmPool:
+    """Пул-заглушка: выполняет задачи в потоках вместо процессов."""
+
+    def __init__(self, workers):
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def submit(self, fn, *args):
+        return self._executor.submit(fn, *args)
+
+
+def test_process_chunks_in_pool_keeps_chunk_order():
+    def fake_completion(prompt, **kwargs):
+        number = int("".join(prompt).rsplit(" ", 1)[-1])
+        # Первые чанки обрабатываются дольше последних
+        time.sleep(0.02 * (4 - number))
+        return {"choices": [{"text": f"Hardness: {number}00 HB"}]}
+
+    llm = MagicMock()
+    llm.tokenize.side_effect = lambda text, add_bos=True: list(text.decode("utf-8"))
+    llm.n_ctx.return_value = 4096
+    llm.side_effect = fake_completion
+    events = []
+    run = ChunkRun(on_event=lambda event, data: events.append(data["chunk"]))
+
+    with patch('src.pdf_text_extractor.worker_llm', return_value=llm):
+        summaries = _process_chunks_in_pool(
+            ["chunk 1", "chunk 2", "chunk 3"], ThreadLlmPool(3), run,
+            ExtractionSettings(prefix_cache=False)
+        )
+
+    assert summaries == ["Hardness: 100 HB", "Hardness: 200 HB", "Hardness: 300 HB"]
+    # События приходят по мере готовности, статистика — по порядку чанков
+    assert events == [3, 2, 1]
+    assert [stats["chunk"] for stats in run.chunk_stats] == [1, 2, 3]
+
+
+def test_pool_chunks_of_two_documents_are_interleaved():
+    started = []
+
+    def fake_completion(prompt, **kwargs):
+        text = "".join(prompt)
+        started.append(text.rsplit("\n", 1)[-1].strip())
+        time.sleep(0.01)
+        return {"choices": [{"text": "Hardness: 100 HB"}]}
+
+    llm = MagicMock()
+    llm.tokenize.side_effect = lambda text, add_bos=True: list(text.decode("utf-8"))
+    llm.n_ctx.return_value = 4096
+    llm.side_effect = fake_completion
+    scheduler = ChunkScheduler(slots=1)
+    pool = ThreadLlmPool(1)
+    settings = ExtractionSettings(prefix_cache=False)
+
+    def document(name, count):
+        with scheduler.session(name) as session:
+            run = ChunkRun(session=session)
+            _process_chunks_in_pool(
+                [f"{name} {i}" for i in range(count)], pool, run, settings
+            )
+
+    with patch('src.pdf_text_extractor.worker_llm', return_value=llm):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            large = executor.submit(document, "large", 6)
+            time.sleep(0.005)
+            small = executor.submit(document, "small", 2)
+            large.result()
+            small.result()
+
+    # Короткий документ не ждет окончания длинного
+    assert started.index("small 1") < started.index("large 5")
+    assert len(started) == 8
+
+
+def test_model_manager_try_load_records_missing_model(tmp_path):
+    manager = LlamaModelManager(model_path=str(tmp_path / "missing.gguf"))
+
+    assert manager.try_load() is False
+    assert not manager.is_ready
+    assert "missing.gguf" in manager.load_error
+
 if __name__ == '__main__':
     pytest.main()
@@ -0,0 +1,68 @@
+import os
+import sys
+# Добавляем путь к backend для импорта модулей из пакета src
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from src.properties import (
+    dedup_property_lines,
+    item_to_line,
+    parse_properties,
+    parse_property_line,
+    property_key
+)
+
+
+def test_parse_property_line():
+    assert parse_property_line("Hardness: 350 HB") == ("Hardness", "350 HB")
+    assert parse_property_line("- Melting temperature: 1600 °C") == ("Melting temperature", "1600 °C")
+    assert parse_property_line("The alloy is described below") is None
+
+
+def test_property_key_normalizes_units_and_case():
+    assert property_key("Melting temperature: 1600 °C") == property_key("melting  temperature: 1600°C")
+    assert property_key("Carbon: 0,05 %") == property_key("Carbon: 0.05%")
+    assert property_key("Hardness: 350 HB") != property_key("Hardness: 360 HB")
+
+
+def test_dedup_property_lines_keeps_first_occurrence():
+    summaries = [
+        "Hardness: 350 HB\nAlloy composition: Fe 70%, Cr 20%, Ni 10%",
+        "No alloy information",
+        "hardness: 350 HB.\nMelting temperature: 1600 ℃",
+        "Melting temperature: 1600 °C",
+    ]
+
+    assert dedup_property_lines(summaries) == [
+        "Hardness: 350 HB",
+        "Alloy composition: Fe 70%, Cr 20%, Ni 10%",
+        "Melting temperature: 1600 ℃",
+    ]
+
+
+def test_parse_properties_reads_json_and_text_answers():
+    expected = [
+        {"property": "Hardness", "value": "350", "unit": "HB"},
+        {"property": "Carbon", "value": "0.05", "unit": "%"},
+    ]
+    json_answer = '[{"property":"Hardness","value":"350","unit":"HB"},{"property":"Carbon","value":"0.05","unit":"%"}]'
+
+    assert parse_properties(json_answer) == expected
+    assert parse_properties("\n".join(item_to_line(item) for item in expected)) == expected
+    assert parse_properties("Hardness: 350 HB\nNo alloy information") == [
+        {"property": "Hardness", "value": "350 HB", "unit": ""}
+    ]
+
+
+def test_parse_properties_salvages_truncated_json_array():
+    truncated = '[{"property":"Hardness","value":"350","unit":"HB"},{"property":"Dens'
+
+    assert parse_properties(truncated) == [
+        {"property": "Hardness", "value": "350", "unit": "HB"}
+    ]
+
+
+def test_property_key_matches_json_and_text_lines():
+    json_line = item_to_line({"property": "Melting temperature", "value": "1600", "unit": "°C"})
+
+    assert property_key(json_line) == property_key("melting temperature: 1600°C")
@@ -0,0 +1,47 @@
+import os
+import sys
+# Добавляем путь к backend для импорта модулей из пакета src
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from src.relevance import (
+    DEFAULT_RELEVANCE_THRESHOLD,
+    filter_relevant_chunks,
+    score_chunk
+)
+
+BOILERPLATE = (
+    "The foregoing description of the embodiments has been provided for "
+    "purposes of illustration. It is not intended to be exhaustive or to "
+    "limit the disclosure. FIG. 3 is a schematic view of the apparatus."
+)
+
+COMPOSITION = (
+    "The alloy contains Cr 18-20 wt%, Ni 8-10 wt%, C 0.05 wt%, balance Fe. "
+    "After annealing at 1050 °C the hardness was 210 HV and the tensile "
+    "strength 620 MPa."
+)
+
+RUSSIAN_COMPOSITION = (
+    "Сплав содержит, масс.%: хром 20, никель 10, железо остальное. "
+    "Температура плавления 1450 °C, твердость 350 HB."
+)
+
+
+def test_score_chunk_separates_boilerplate_from_composition():
+    assert score_chunk(BOILERPLATE) < DEFAULT_RELEVANCE_THRESHOLD
+    assert score_chunk(COMPOSITION) >= DEFAULT_RELEVANCE_THRESHOLD
+    assert score_chunk(RUSSIAN_COMPOSITION) >= DEFAULT_RELEVANCE_THRESHOLD
+
+
+def test_filter_relevant_chunks_skips_irrelevant():
+    kept, scores = filter_relevant_chunks([BOILERPLATE, COMPOSITION, BOILERPLATE])
+
+    assert kept == [1]
+    assert len(scores) == 3
+
+
+def test_filter_relevant_chunks_disabled_with_zero_threshold():
+    kept, _ = filter_relevant_chunks([BOILERPLATE, COMPOSITION], threshold=0)
+
+    assert kept == [0, 1]
@@ -0,0 +1,83 @@
+import os
+import sys
+# Добавляем путь к backend для импорта модулей из пакета src
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+from src.result_cache import ResultCache, chunk_key, result_key
+
+
+def test_result_cache_roundtrip(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"))
+    key = result_key("abc", "/models/model.gguf", "1", {"chunk_size": 2000})
+
+    assert cache.lookup("abc", key) is None
+
+    cache.put_pages("abc", False, 2, [(1, "Sample"), (2, "text")])
+    cache.put_result(key, "abc", "Hardness: 350 HB")
+
+    metadata = {"tables": False, "pages": 2}
+    assert cache.get_text("abc") == ("Sample\n\ntext", metadata)
+    assert cache.get_text("abc", tables=True) is None
+    assert cache.lookup("abc", key) == ("Sample\n\ntext", metadata, "Hardness: 350 HB")
+    assert cache.stats()["hits"] > 0
+
+
+def test_result_cache_text_needs_all_pages(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"))
+
+    cache.put_pages("abc", False, 3, [(1, "Sample"), (3, "text")])
+
+    assert cache.get_text("abc") is None
+    assert cache.stats()["lookups"]["text"] == {"hit": 0, "miss": 1}
+
+
+def test_result_key_depends_on_settings():
+    options = {"chunk_size": 2000, "overlap": 0}
+    base = result_key("abc", "model.gguf", "1", options)
+
+    assert result_key("abc", "model.gguf", "2", options) != base
+    assert result_key("abc", "model.gguf", "1", {"chunk_size": 1000, "overlap": 0}) != base
+    assert result_key("abc", "model.gguf", "1", {"chunk_size": 2000, "overlap": 100}) != base
+    assert result_key("abc", "other.gguf", "1", options) != base
+    # Порядок параметров не влияет на ключ
+    assert result_key("abc", "model.gguf", "1", {"overlap": 0, "chunk_size": 2000}) == base
+
+
+def test_chunk_key_depends_on_prompt_model_and_options():
+    options = {"temperature": 0.1, "max_tokens": 512}
+    base = chunk_key("/models/model.gguf", "Prompt: steel", options)
+
+    assert chunk_key("/other/model.gguf", "Prompt: steel", options) == base
+    assert chunk_key("/models/other.gguf", "Prompt: steel", options) != base
+    assert chunk_key("/models/model.gguf", "Prompt: nickel", options) != base
+    assert chunk_key("/models/model.gguf", "Prompt: steel", {**options, "temperature": 0.2}) != base
+
+
+def test_result_cache_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), max_bytes=250)
+
+    cache.put_result("first", "doc1", "a" * 100)
+    cache.put_result("second", "doc2", "b" * 100)
+    # Обращение к первой записи делает вторую самой старой
+    assert cache.get_result("first") is not None
+    cache.put_result("third", "doc3", "c" * 100)
+
+    assert cache.get_result("first") is not None
+    assert cache.get_result("second") is None
+    assert cache.get_result("third") is not None
+    assert cache.stats()["size_bytes"] <= 250
+
+
+def test_result_cache_evicts_pages_and_chunks_by_size(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), max_bytes=250)
+
+    cache.put_pages("abc", False, 2, [(1, "a" * 100), (2, "b" * 100)])
+    cache.put_chunk("chunk", "c" * 100)
+
+    # Вытесняется одна самая старая страница, а не весь документ
+    assert cache.get_pages("abc") == (2, {2: "b" * 100})
+    assert cache.get_chunk("chunk") == "c" * 100
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["lookups"]["chunk"] == {"hit": 1, "miss": 0}
@@ -0,0 +1,132 @@
+import os
+import sys
+# Добавляем путь к backend для импорта модулей из пакета src
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+import json
+from unittest.mock import patch
+
+from benchmarks.calibrate import calibrate, main, measure_runtime, thread_candidates
+from benchmarks.stub_llama import StubLlama
+from src.runtime_profile import (
+    RuntimeProfile,
+    available_cpus,
+    cgroup_cpu_limit,
+    load_profile,
+    save_profile
+)
+
+
+def test_cgroup_cpu_limit_reads_v2_and_v1_quota(tmp_path):
+    cpu_max = tmp_path / "cpu.max"
+    missing = str(tmp_path / "missing")
+    cpu_max.write_text("250000 100000\n")
+    with patch('src.runtime_profile._CGROUP_V2_CPU_MAX', str(cpu_max)):
+        assert cgroup_cpu_limit() == 3
+        with patch('src.runtime_profile.os.sched_getaffinity', return_value=set(range(64))):
+            assert available_cpus() == 3
+
+    cpu_max.write_text("max 100000\n")
+    with patch('src.runtime_profile._CGROUP_V2_CPU_MAX', str(cpu_max)):
+        assert cgroup_cpu_limit() is None
+
+    quota = tmp_path / "cpu.cfs_quota_us"
+    period = tmp_path / "cpu.cfs_period_us"
+    quota.write_text("400000\n")
+    period.write_text("100000\n")
+    with patch('src.runtime_profile._CGROUP_V2_CPU_MAX', missing), \
+         patch('src.runtime_profile._CGROUP_V1_QUOTA', str(quota)), \
+         patch('src.runtime_profile._CGROUP_V1_PERIOD', str(period)):
+        assert cgroup_cpu_limit() == 4
+
+
+def test_profile_scales_threads_to_workers():
+    profile = RuntimeProfile(n_threads=12, n_threads_batch=16, n_batch=512)
+
+    scaled = profile.scaled(4, 16)
+    assert (scaled.n_threads, scaled.n_threads_batch) == (3, 4)
+    assert scaled.n_batch == 512
+    assert profile.scaled(1, 16) is profile
+    # Потоков не больше, чем доступно CPU
+    assert RuntimeProfile(8, 8, workers=2).scaled(1, 8).n_threads == 8
+
+
+def test_profile_roundtrip_and_invalid_file(tmp_path):
+    path = str(tmp_path / "profile" / "runtime_profile.json")
+    profile = RuntimeProfile(
+        6, 8, 512, use_mlock=True, model_path="model.Q4.gguf",
+        measurements={"prompt_tps": 120.5}
+    )
+
+    assert load_profile(path) is None
+    save_profile(profile, path)
+    assert load_profile(path) == profile
+
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"n_threads": 4, "unknown": 1}, file)
+    assert load_profile(path) is None
+
+
+def fake_measure(path, runtime):
+    """Генерация быстрее всего на 6 потоках, промпт — на всех 8."""
+    generation = 10.0 - abs(runtime.n_threads - 6)
+    prompt = 100.0 + 10 * runtime.n_threads_batch + runtime.n_batch / 100
+    if runtime.use_mlock:
+        generation += 1
+    if "Q5" in path:
+        generation /= 2
+    return {"prompt_tps": prompt, "generation_tps": generation}
+
+
+def test_calibrate_picks_threads_batch_and_variant():
+    assert thread_candidates(8) == [2, 4, 6, 7, 8]
+
+    result = calibrate(
+        ["model.Q4.gguf", "model.Q5.gguf"], 8,
+        prompt_tokens=1024, mlock=True, measure=fake_measure
+    )
+
+    profile = result["profile"]
+    assert (profile.n_threads, profile.n_threads_batch) == (6, 8)
+    assert profile.n_batch == 1024
+    assert profile.use_mlock is True
+    assert profile.model_path == "model.Q4.gguf"
+    assert profile.measurements["cpus"] == 8
+    assert profile.measurements["chunk_seconds"] > 0
+    # Размеры пакета больше промпта замера не проверяются
+    assert max(trial["n_batch"] for trial in result["trials"]) == 1024
+    assert {trial["model_path"] for trial in result["trials"]} == {
+        "model.Q4.gguf", "model.Q5.gguf"
+    }
+
+
+def test_calibrate_splits_cpus_between_workers():
+    result = calibrate(["model.gguf"], 8, 2, measure=fake_measure)
+
+    profile = result["profile"]
+    assert max(trial["n_threads"] for trial in result["trials"]) == 4
+    # Промпт замера по умолчанию длиной с чанк: проверяются все пакеты
+    assert max(trial["n_batch"] for trial in result["trials"]) == 2048
+    assert profile.n_batch == 2048
+    assert profile.workers == 2
+    assert profile.model_path == ""
+    assert profile.use_mlock is False
+
+
+def test_measure_runtime_and_main_write_profile(tmp_path, capsys):
+    llm = StubLlama()
+    llm.close = lambda: None
+    with patch('benchmarks.calibrate.load_llm_model', return_value=(llm, 0)):
+        measurement = measure_runtime("model.gguf", RuntimeProfile(2, 2), 64, 8)
+    assert measurement["prompt_tps"] > 0
+    assert measurement["generation_tps"] > 0
+
+    output = str(tmp_path / "runtime_profile.json")
+    with patch('benchmarks.calibrate.measure_runtime', side_effect=lambda path, runtime, tokens: fake_measure(path, runtime)):
+        main(["--model", "model.gguf", "--cpus", "4", "--workers", "1",
+              "--output", output, "--log-level", "WARNING"])
+
+    printed = json.loads(capsys.readouterr().out)
+    assert printed["profile"]["n_threads"] == 4
+    assert load_profile(output).n_threads == 4
@@ -0,0 +1,135 @@
+import os
+import sys
+# Добавляем путь к backend для импорта модулей из пакета src
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+import threading
+from concurrent.futures import CancelledError, Future
+
+import pytest
+from src.scheduler import ChunkScheduler
+
+
+class ManualModel:
+    """Модель-заглушка: задачи завершаются вызовом ``finish``."""
+
+    def __init__(self):
+        self.started = []
+        self._tasks = []
+
+    def start(self, name):
+        def start():
+            task = Future()
+            self.started.append(name)
+            self._tasks.append(task)
+            return task
+        return start
+
+    def finish_all(self):
+        """Завершает запущенные задачи, пока они появляются."""
+        while self._tasks:
+            self._tasks.pop(0).set_result(None)
+
+
+def submit_all(session, model, prefix, count):
+    return [
+        session.submit(model.start(f"{prefix}{i}")) for i in range(1, count + 1)
+    ]
+
+
+def test_fair_policy_interleaves_documents():
+    scheduler = ChunkScheduler(slots=1)
+    model = ManualModel()
+    large = scheduler.session("large")
+    small = scheduler.session("small")
+
+    tickets = submit_all(large, model, "L", 4) + submit_all(small, model, "S", 2)
+    model.finish_all()
+
+    assert model.started == ["L1", "S1", "L2", "S2", "L3", "L4"]
+    assert all(ticket.done() for ticket in tickets)
+    assert scheduler.stats()["running"] == 0
+
+
+def test_shortest_policy_and_priority():
+    scheduler = ChunkScheduler(slots=1, policy="shortest")
+    model = ManualModel()
+    large = scheduler.session("large")
+    small = scheduler.session("small")
+    urgent = scheduler.session("urgent", priority=1)
+
+    submit_all(large, model, "L", 3)
+    submit_all(small, model, "S", 2)
+    submit_all(urgent, model, "U", 1)
+    model.finish_all()
+
+    # Первый чанк L1 запущен сразу, затем приоритетная задача и
+    # документ с меньшим остатком
+    assert model.started == ["L1", "U1", "S1", "S2", "L2", "L3"]
+
+    with pytest.raises(ValueError):
+        ChunkScheduler(policy="random")
+
+
+def test_session_limit_leaves_slots_to_other_documents():
+    scheduler = ChunkScheduler(slots=3)
+    model = ManualModel()
+    limited = scheduler.session("limited", limit=1)
+    other = scheduler.session("other")
+
+    submit_all(limited, model, "A", 3)
+    submit_all(other, model, "B", 3)
+
+    assert model.started == ["A1", "B1", "B2"]
+    model.finish_all()
+    assert sorted(model.started) == ["A1", "A2", "A3", "B1", "B2", "B3"]
+
+
+def test_cancel_drops_pending_tasks_and_turns():
+    scheduler = ChunkScheduler(slots=1)
+    model = ManualModel()
+    session = scheduler.session("doc")
+    tickets = submit_all(session, model, "C", 3)
+
+    session.cancel()
+    model.finish_all()
+
+    assert model.started == ["C1"]
+    assert tickets[0].result() is None
+    assert tickets[1].cancelled() and tickets[2].cancelled()
+    assert session.submit(model.start("C4")).cancelled()
+    with pytest.raises(CancelledError):
+        with session.turn():
+            pass
+    session.close()
+    assert scheduler.stats()["documents"] == 0
+
+
+def test_turns_share_one_slot_between_threads():
+    scheduler = ChunkScheduler(slots=1)
+    active = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def document(name):
+        with scheduler.session(name) as session:
+            for _ in range(20):
+                with session.turn():
+                    with lock:
+                        active.append(name)
+                        overlaps.append(len(active))
+                    with lock:
+                        active.remove(name)
+
+    threads = [threading.Thread(target=document, args=(f"doc{i}",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(overlaps) == 60
+    assert max(overlaps) == 1
+    assert scheduler.stats() == {
+        "policy": "fair", "slots": 1, "running": 0, "documents": 0, "pending": 0
+    }
@@ -0,0 +1,124 @@
+import os
+import sys
+# Добавляем путь к backend для импорта модулей из пакета src
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+import pytest
+
+from src.text_preparation import ExtractionSettings, split_for_llm
+from src.sections import arrange_sections, heading_kind, section_kinds, split_sections
+
+PATENT_TEXT = (
+    "US 2020/0000001 A1\n\n"
+    "BACKGROUND OF THE INVENTION\n"
+    "Known steels are brittle and the prior art describes an\n"
+    "example.\n\n"
+    "DETAILED DESCRIPTION\n"
+    "The steel is cast and rolled.\n\n"
+    "Example 1\n"
+    "The steel contains Cr 18 wt% and has a hardness of 350 HB.\n"
+    "Comparative Example 2\n"
+    "The steel contains Cr 5 wt%.\n\n"
+    "What is claimed is:\n"
+    "1. An alloy comprising Cr 18 wt%.\n"
+    "2. The alloy according to claim 1, having a hardness of 350 HB."
+)
+
+
+def test_split_sections_finds_headings_and_merges_examples():
+    sections = split_sections(PATENT_TEXT)
+
+    assert [section.kind for section in sections] == [
+        "front", "background", "description", "examples", "claims"
+    ]
+    examples = sections[3]
+    assert examples.title == "Example 1"
+    # Заголовок следующего примера остается в тексте раздела
+    assert "Comparative Example 2" in examples.text
+    assert sections[1].text.endswith("example.")
+
+
+def test_split_sections_finds_claims_by_numbering():
+    text = (
+        "Example 1\nThe steel has a hardness of 350 HB.\n\n"
+        "1. An alloy comprising Cr 18 wt%.\n"
+        "2. The alloy of claim 1, wherein Ni is 9 wt%."
+    )
+
+    sections = split_sections(text)
+
+    assert [section.kind for section in sections] == ["examples", "claims"]
+    assert sections[1].text.startswith("1. An alloy")
+
+
+def test_heading_kind_rejects_sentences_and_wrapped_words():
+    assert heading_kind("II. SUMMARY OF THE INVENTION") == "summary"
+    assert heading_kind("Examples 1 to 3:") == "examples"
+    assert heading_kind("Example 1 shows that the alloy is hard.") == ""
+    assert heading_kind("example.") == ""
+    assert heading_kind("Example.", "the steel of the") == ""
+
+
+def test_arrange_sections_orders_and_skips_by_kind():
+    kept, skipped = arrange_sections(
+        split_sections(PATENT_TEXT), ("examples", "claims"), ("background",)
+    )
+
+    assert [section.kind for section in kept] == [
+        "examples", "claims", "front", "description"
+    ]
+    assert [section.kind for section in skipped] == ["background"]
+
+
+def test_section_kinds_rejects_unknown_kinds():
+    assert section_kinds(" Examples, claims ,") == ("examples", "claims")
+    with pytest.raises(ValueError):
+        section_kinds("examples,appendix")
+
+
+def test_split_for_llm_keeps_chunks_within_sections():
+    settings = ExtractionSettings(
+        token_chunking=False, chunk_size=2000, overlap=0,
+        skip_sections=("background", "front")
+    )
+    report = {}
+
+    chunks = split_for_llm(PATENT_TEXT, None, settings, report)
+
+    assert [chunk.split("\n")[0] for chunk in chunks] == [
+        "DETAILED DESCRIPTION", "Example 1", "What is claimed is:"
+    ]
+    assert [section["chunks"] for section in report["sections"]] == [1, 1, 1]
+    assert [section["kind"] for section in report["sections_skipped"]] == [
+        "front", "background"
+    ]
+
+
+def test_split_for_llm_folds_duplicates_after_skipping_sections():
+    composition = "The alloy contains 18 wt% Cr, 9 wt% Ni and 0.05 wt% C with the balance iron."
+    text = (
+        "BACKGROUND OF THE INVENTION\n" + composition + "\n\n"
+        "Example 1\n" + composition + " The hardness is 350 HB."
+    )
+    settings = ExtractionSettings(token_chunking=False, chunk_size=2000, overlap=0)
+
+    report = {}
+    chunks = split_for_llm(text, None, settings, report)
+    assert chunks[1] == "Example 1\nThe hardness is 350 HB."
+    assert report["dedup"]["passages_folded"] == 1
+
+    # Повтор в пропускаемом разделе не удаляет предложение из примеров
+    report = {}
+    settings.skip_sections = ("background",)
+    chunks = split_for_llm(text, None, settings, report)
+    assert chunks == ["Example 1\n" + composition + " The hardness is 350 HB."]
+    assert report["dedup"]["passages_folded"] == 0
+
+    # Раздел из одних повторов не обрабатывается
+    report = {}
+    settings.skip_sections = ()
+    settings.section_order = ("examples",)
+    chunks = split_for_llm(text.replace(" The hardness is 350 HB.", ""), None, settings, report)
+    assert chunks == ["Example 1\n" + composition]
+    assert [section["kind"] for section in report["sections"]] == ["examples"]
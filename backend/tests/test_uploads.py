@@ -0,0 +1,116 @@
+import os
+import sys
+# Добавляем путь к backend для импорта модулей из пакета src
+backend_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_path)
+
+import asyncio
+import hashlib
+import io
+import zipfile
+
+import pytest
+from fastapi import UploadFile
+from src.uploads import UploadError, spool_upload, unpack_pdfs
+
+
+def make_upload(content, filename="test.pdf"):
+    """Создает загруженный файл с заданным содержимым."""
+    return UploadFile(io.BytesIO(content), filename=filename)
+
+
+def test_spool_upload_hashes_content_in_blocks(tmp_path):
+    content = b"%PDF-1.4\n" + b"x" * 100
+
+    upload = asyncio.run(
+        spool_upload(make_upload(content), 1024, str(tmp_path), block_size=16)
+    )
+
+    assert upload.doc_hash == hashlib.sha256(content).hexdigest()
+    assert upload.size == len(content)
+    with open(upload.path, "rb") as f:
+        assert f.read() == content
+    upload.remove()
+    assert not os.path.exists(upload.path)
+
+
+def test_spool_upload_uses_unique_files_for_same_filename(tmp_path):
+    first = asyncio.run(spool_upload(make_upload(b"%PDF-1"), 1024, str(tmp_path)))
+    second = asyncio.run(spool_upload(make_upload(b"%PDF-2"), 1024, str(tmp_path)))
+
+    assert first.path != second.path
+    assert os.path.exists(first.path) and os.path.exists(second.path)
+
+
+def test_spool_upload_rejects_non_pdf_and_oversized(tmp_path):
+    with pytest.raises(UploadError) as not_pdf:
+        asyncio.run(spool_upload(make_upload(b"plain text"), 1024, str(tmp_path)))
+    with pytest.raises(UploadError) as too_large:
+        asyncio.run(spool_upload(
+            make_upload(b"%PDF-1.4" + b"x" * 100), 64, str(tmp_path), block_size=16
+        ))
+
+    assert not_pdf.value.status_code == 400
+    assert too_large.value.status_code == 413
+    # Временные файлы отклоненных загрузок удалены
+    assert os.listdir(tmp_path) == []
+
+
+def test_unpack_pdfs_extracts_only_pdf_members(tmp_path):
+    archive_path = tmp_path / "patents.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("a.pdf", b"%PDF-1.4 first")
+        archive.writestr("docs/b.PDF", b"%PDF-1.4 second")
+        archive.writestr("readme.txt", b"not a patent")
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+
+    unpacked = unpack_pdfs(str(archive_path), 1024, 10, str(spool_dir))
+
+    assert [name for name, _ in unpacked] == ["a.pdf", "docs/b.PDF"]
+    assert unpacked[1][1].doc_hash == hashlib.sha256(b"%PDF-1.4 second").hexdigest()
+    with pytest.raises(UploadError) as too_many:
+        unpack_pdfs(str(archive_path), 1024, 1, str(spool_dir))
+    assert too_many.value.status_code == 413
+    for _, upload in unpacked:
+        upload.remove()
+    assert os.listdir(spool_dir) == []
+
+
+def test_unpack_pdfs_limits_total_unpacked_size(tmp_path):
+    archive_path = tmp_path / "patents.zip"
+    # Нули сжимаются почти до нуля: архив мал, распакованные файлы нет
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name in ("a.pdf", "b.pdf", "c.pdf"):
+            archive.writestr(name, b"%PDF-1.4 " + bytes(600))
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+
+    unpacked = unpack_pdfs(str(archive_path), 1024, 10, str(spool_dir), 3 * 1024)
+    with pytest.raises(UploadError) as too_large:
+        unpack_pdfs(str(archive_path), 1024, 10, str(spool_dir), 1500)
+
+    assert len(unpacked) == 3
+    assert os.path.getsize(archive_path) < 1500
+    assert too_large.value.status_code == 413
+    for _, upload in unpacked:
+        upload.remove()
+    assert os.listdir(spool_dir) == []
+
+
+def test_unpack_pdfs_removes_files_when_member_is_not_pdf(tmp_path):
+    archive_path = tmp_path / "patents.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("a.pdf", b"%PDF-1.4 first")
+        archive.writestr("b.pdf", b"plain text")
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+
+    with pytest.raises(UploadError) as not_pdf:
+        unpack_pdfs(str(archive_path), 1024, 10, str(spool_dir))
+    with pytest.raises(UploadError) as broken:
+        unpack_pdfs(__file__, 1024, 10, str(spool_dir))
+
+    assert not_pdf.value.status_code == 400
+    assert broken.value.status_code == 400
+    assert os.listdir(spool_dir) == []
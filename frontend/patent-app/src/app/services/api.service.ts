@@ -1,7 +1,7 @@
 import { Injectable } from '@angular/core';
 import { HttpClient, HttpErrorResponse } from '@angular/common/http';
-import { Observable, throwError } from 'rxjs';
-import { catchError } from 'rxjs/operators';
+import { Observable, throwError, timer } from 'rxjs';
+import { catchError, filter, map, switchMap, take } from 'rxjs/operators';
 
 export interface PatentUploadResponse {
   message: string;
@@ -9,17 +9,72 @@ export interface PatentUploadResponse {
   extracted_text?: string;
   metadata?: any;
   alloy_info?: string;
+  alloy_properties?: AlloyProperty[];
+}
+
+export interface AlloyProperty {
+  property: string;
+  value: string;
+  unit: string;
 }
 
 export interface PatentUploadError {
   error: string;
 }
 
+export interface PatentJobSubmitted {
+  message: string;
+  job_id: string;
+  status: string;
+  queue_depth: number;
+}
+
+export interface PatentBatchSubmitted extends PatentJobSubmitted {
+  files: number;
+  rejected: number;
+}
+
+export interface PatentBatchFileResult extends Partial<PatentUploadResponse> {
+  index?: number;
+  filename: string;
+  status: string;
+  cached?: boolean;
+  error?: string;
+  error_code?: number;
+}
+
+export interface PatentJob {
+  job_id: string;
+  filename: string;
+  status: 'queued' | 'running' | 'done' | 'failed' | 'cancelled';
+  stage: string | null;
+  timings: Record<string, number>;
+  result: PatentUploadResponse | null;
+  error: string | null;
+  error_code: number | null;
+  queue_depth: number;
+}
+
+export interface PatentJobEvent {
+  id: number;
+  event: string;
+  data: any;
+}
+
+const JOB_EVENT_TYPES = [
+  'stage', 'page', 'text', 'chunks', 'chunk_line', 'chunk', 'merge', 'files', 'file',
+  'done', 'failed', 'cancelled'
+];
+
+const FINAL_JOB_EVENTS = ['done', 'failed', 'cancelled'];
+const FINAL_JOB_STATUSES: PatentJob['status'][] = ['done', 'failed', 'cancelled'];
+
 @Injectable({
   providedIn: 'root'
 })
 export class ApiService {
   private readonly apiUrl = 'http://localhost:8000';
+  private readonly pollIntervalMs = 2000;
 
   constructor(private http: HttpClient) {}
 
@@ -27,15 +82,79 @@ export class ApiService {
     const formData = new FormData();
     formData.append('file', file);
 
-    return this.http.post<PatentUploadResponse>(
+    return this.http.post<PatentJobSubmitted>(
       `${this.apiUrl}/patent`,
       formData
     ).pipe(
-      catchError((error: HttpErrorResponse) => {
-        const errorMessage = error.error?.detail || error.error?.error || error.message || 'Upload failed';
+      switchMap(submitted => this.waitForJob(submitted.job_id)),
+      map(job => {
+        if (job.status === 'cancelled') {
+          throw new Error(job.error || 'Processing cancelled');
+        }
+        if (job.status === 'failed' || !job.result) {
+          throw new Error(job.error || 'Processing failed');
+        }
+        return job.result;
+      }),
+      catchError((error: HttpErrorResponse | Error) => {
+        const errorMessage = error instanceof HttpErrorResponse
+          ? error.error?.detail || error.error?.error || error.message || 'Upload failed'
+          : error.message;
         return throwError(() => new Error(errorMessage));
       })
     );
   }
-}
 
+  uploadPatentBatch(files: File[]): Observable<PatentBatchSubmitted> {
+    const formData = new FormData();
+    files.forEach(file => formData.append('files', file));
+    return this.http.post<PatentBatchSubmitted>(
+      `${this.apiUrl}/patents/batch`,
+      formData
+    );
+  }
+
+  batchResults(jobId: string): Observable<PatentBatchFileResult> {
+    return this.jobEvents(jobId).pipe(
+      filter(event => event.event === 'file'),
+      map(event => event.data as PatentBatchFileResult)
+    );
+  }
+
+  getJob(jobId: string): Observable<PatentJob> {
+    return this.http.get<PatentJob>(`${this.apiUrl}/jobs/${jobId}`);
+  }
+
+  jobEvents(jobId: string): Observable<PatentJobEvent> {
+    return new Observable<PatentJobEvent>(subscriber => {
+      const source = new EventSource(`${this.apiUrl}/jobs/${jobId}/events`);
+      const listener = (message: MessageEvent) => {
+        const event: PatentJobEvent = {
+          id: Number(message.lastEventId),
+          event: message.type,
+          data: JSON.parse(message.data)
+        };
+        subscriber.next(event);
+        if (FINAL_JOB_EVENTS.includes(event.event)) {
+          source.close();
+          subscriber.complete();
+        }
+      };
+      JOB_EVENT_TYPES.forEach(type => source.addEventListener(type, listener));
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+          subscriber.error(new Error('Event stream closed'));
+        }
+      };
+      return () => source.close();
+    });
+  }
+
+  private waitForJob(jobId: string): Observable<PatentJob> {
+    return timer(0, this.pollIntervalMs).pipe(
+      switchMap(() => this.getJob(jobId)),
+      filter(job => FINAL_JOB_STATUSES.includes(job.status)),
+      take(1)
+    );
+  }
+}